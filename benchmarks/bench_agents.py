@@ -0,0 +1,58 @@
+"""分析师注册表基准：建索引耗时、按话题挑 12 名辩手的耗时，对比原来的线性过滤 + random.sample。
+
+用法：
+    python benchmarks/bench_agents.py
+    python benchmarks/bench_agents.py --sizes 50 1000 50000 --prompt-len 200
+有 NumPy 时走向量化打分，没有时走纯 Python（结果一致，只是慢）。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forum import config
+from forum.agents import AgentRegistry
+
+JOBS = ["首席策略师", "资深产业研究员", "私募投资总监", "量化交易主管", "消费行业分析师", "新能源研究员"]
+VOCAB = "半导体光刻机晶圆白酒家电光伏锂电储能利率汇率流动性因子模型择时消费复苏券商银行地产医药创新药军工低空经济机器人算力"
+TOPIC = "光刻机国产替代加速，半导体设备订单饱满，晶圆厂扩产带动上游材料需求"
+
+
+def make_rows(n, prompt_len):
+    return [(i, f"分析师{i}", random.choice(JOBS), "📈", "".join(random.choice(VOCAB) for _ in range(prompt_len)), 1) for i in range(n)]
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 1000, 10_000, 30_000])
+    parser.add_argument("--prompt-len", type=int, default=120)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"numpy: {'是' if config.HAS_NUMPY else '否（纯 Python）'}")
+    print(f"{'agents':>8} | {'build ms':>9} | {'pick ms':>8} | {'linear ms':>9} | {'leaders ms':>10}")
+    for n in args.sizes:
+        rows = make_rows(n, args.prompt_len)
+        t0 = time.perf_counter()
+        registry = AgentRegistry(rows, config.LEADER_JOB_KEYWORDS)
+        build_ms = (time.perf_counter() - t0) * 1000
+        pick_ms = timed(lambda: registry.relevant(TOPIC, args.k, exclude_name="分析师0", jitter=config.REPLIER_JITTER, spread_jobs=True), args.repeat)
+        # 原实现：每场辩论都线性过滤一遍再随机抽样
+        agents = [{"name": r[1], "job": r[2]} for r in rows]
+        linear_ms = timed(lambda: random.sample([a for a in agents if a["name"] != "分析师0"], min(n - 1, args.k)), args.repeat)
+        leaders_ms = timed(lambda: random.choice(registry.leaders or registry), args.repeat)
+        print(f"{n:>8,} | {build_ms:9.1f} | {pick_ms:8.3f} | {linear_ms:9.3f} | {leaders_ms:10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""只读接口基准：轮询客户端对 /api/threads、单帖、/rss.xml 的吞吐，带与不带 If-None-Match 对比。
+
+在临时库里灌合成数据，起 forum.bootstrap（后台任务照常运行，话题用 fixture，配图离线），再用
+keep-alive 连接并发轮询。写入线程按 --write-rate 持续加评论，观察缓存失效后 200/304 的比例。
+
+用法：
+    python benchmarks/bench_feed.py
+    python benchmarks/bench_feed.py --clients 16 --seconds 5 --write-rate 2
+和 bench_forum 一样只用到 forum 核心包（需要 openai、httpx），不导入 streamlit。
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def poll(port, paths, conditional, gzip, deadline, counts):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    etags, n200, n304, nbytes = {}, 0, 0, 0
+    while time.perf_counter() < deadline:
+        for path in paths:
+            headers = {"Accept-Encoding": "gzip"} if gzip else {}
+            if conditional and path in etags: headers["If-None-Match"] = etags[path]
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            etags[path] = resp.getheader("ETag")
+            if resp.status == 304: n304 += 1
+            else: n200 += 1
+            nbytes += len(body)
+    conn.close()
+    counts.append((n200, n304, nbytes))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=2000, help="库里的合成帖子数")
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--write-rate", type=float, default=1.0, help="轮询期间每秒新增评论数，0 表示只读")
+    args = parser.parse_args()
+
+    from forum import bootstrap, config
+    from forum.dataio import seed_synthetic
+    from forum.schema import migrate
+    from forum.storage import get_storage
+    from forum.store import Comment
+
+    workdir = tempfile.mkdtemp(prefix="forum_feed_")
+    fixture = os.path.join(workdir, "topics.jsonl")
+    with open(fixture, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"title": "桩新闻标题"}, ensure_ascii=False) + "\n")
+    config.DB_FILE, config.TOPIC_FIXTURE_FILE = os.path.join(workdir, "bench.db"), fixture
+    config.IMAGE_FETCH, config.IMAGE_CACHE_DIR = False, os.path.join(workdir, "image_cache")
+    config.FEED_PORT = free_port()
+    db = get_storage(config.DB_FILE)
+    migrate(db)
+    seed_synthetic(db, threads=args.threads, comments=args.comments)
+    store = bootstrap.start("sk-bench")
+
+    with store.lock: ids = [t.id for t in store.threads][:5]
+    paths = ["/api/threads", "/rss.xml"] + [f"/api/threads/{t_id}" for t_id in ids]
+
+    print(f"{'mode':>16} | {'req/s':>8} | {'304 %':>6} | {'MB/s':>6}")
+    for conditional, gzip in ((False, False), (False, True), (True, True)):
+        stop = threading.Event()
+        def writer():
+            i = 0
+            while args.write_rate and not stop.wait(1 / args.write_rate):
+                store.add_comment(ids[i % len(ids)], Comment("基准", "🧪", "压测", "轮询期间的新评论", "09:30"))
+                i += 1
+        threading.Thread(target=writer, daemon=True).start()
+        counts, deadline = [], time.perf_counter() + args.seconds
+        clients = [threading.Thread(target=poll, args=(config.FEED_PORT, paths, conditional, gzip, deadline, counts)) for _ in range(args.clients)]
+        t0 = time.perf_counter()
+        for c in clients: c.start()
+        for c in clients: c.join()
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        n200, n304, nbytes = (sum(col) for col in zip(*counts))
+        total = n200 + n304
+        mode = ("etag" if conditional else "plain") + ("+gzip" if gzip else "")
+        print(f"{mode:>16} | {total / elapsed:8.0f} | {n304 / total * 100 if total else 0:6.1f} | {nbytes / elapsed / 1e6:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""离线端到端基准：本地桩 LLM + fixture 搜索后端，不需要 DeepSeek key，也不需要网络。
+
+每个场景在独立子进程里跑（GlobalStore 是进程级单例），依次测量：
+    - bootstrap.start() 的冷启动（建库、加载历史、起后台线程）、load_full_history、parse_thread_content
+    - publish_post + trigger_delayed_replies 的辩论吞吐（场/小时）与单轮延迟 p50/p99
+    - check_and_run_reviews 的复盘速率与调用次数（--review-batch 1 对比逐篇复盘）
+    - 辩论期间的 SQLite 写入速率（操作数/秒、提交次数/秒）与进程内存
+
+用法：
+    python benchmarks/bench_forum.py                                   # 默认网格
+    python benchmarks/bench_forum.py --populations 50 500 --histories 0 10000 --debates 8 --latency 0.05
+    python benchmarks/bench_forum.py --rate 0.5 --burst 3              # 按线上限流配置跑
+    python benchmarks/bench_forum.py --llm-cache runs.db --llm-cache-mode record   # 录下每次 LLM 结果
+    python benchmarks/bench_forum.py --llm-cache runs.db --llm-cache-mode replay   # 完全离线回放（不走桩服务）
+只用到 forum 核心包（需要 openai、httpx），不导入 streamlit。
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+COMMENTS_PER_THREAD = 12
+SAMPLE_OUTPUTS = [
+    "标题：半导体放量突破\n内容：北向资金净流入，关注设备材料。",
+    "Title: 低空经济\n\n内容：政策催化密集，短线情绪高涨。\n风险：估值偏高。",
+    "今日暂无重大相关消息",
+    "",
+]
+
+
+# ------------------------------------------
+# 子进程：单个场景
+# ------------------------------------------
+def rss_mb():
+    """(当前 RSS, 峰值 RSS)，单位 MB。"""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return peak, peak
+
+
+def percentile(values, q):
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_scenario(args):
+    import stub_llm
+    from forum import bootstrap, config, engine
+    from forum.dataio import seed_synthetic
+    from forum.storage import get_storage
+    from forum.schema import migrate
+    from forum.ratelimit import TokenBucket
+    from forum.storage import _BATCH_SIZE
+
+    workdir = tempfile.mkdtemp(prefix="forum_bench_")
+    db_path = os.path.join(workdir, "bench.db")
+    fixture = os.path.join(workdir, "topics.jsonl")
+    with open(fixture, "w", encoding="utf-8") as f:
+        for i in range(50): f.write(json.dumps({"title": f"桩新闻标题 {i}"}, ensure_ascii=False) + "\n")
+
+    _, base_url = stub_llm.start(config=stub_llm.StubConfig(args.latency, args.token_delay, args.chunks))
+    config.LLM_BASE_URL, config.DB_FILE, config.TOPIC_FIXTURE_FILE = base_url, db_path, fixture
+    config.REVIEW_GAP = 0
+    config.REVIEW_BATCH_SIZE = args.review_batch
+    config.DEBATE_TURNS = args.turns
+    # 离线：配图只生成本地占位图，不访问 picsum
+    config.IMAGE_FETCH, config.IMAGE_CACHE_DIR = False, os.path.join(workdir, "image_cache")
+    if args.llm_cache: config.LLM_CACHE_FILE, config.LLM_CACHE_MODE = os.path.abspath(args.llm_cache), args.llm_cache_mode
+    random.seed(args.seed)
+    os.chdir(workdir)
+
+    db = get_storage(db_path)
+    migrate(db)
+    # 历史帖子都已复盘，避免后台复盘任务干扰测量
+    history_ids = seed_synthetic(db, args.population, args.history // COMMENTS_PER_THREAD, args.history, content_len=120)
+    result = {"population": args.population, "history": args.history}
+
+    t0 = time.perf_counter()
+    store = bootstrap.start("sk-stub")
+    result["startup_ms"] = (time.perf_counter() - t0) * 1000
+    for _ in range(100):
+        if store.scheduler is not None: break
+        time.sleep(0.05)
+    if store.scheduler is not None: store.scheduler.stop()
+    store.auto_run = False
+    store.llm_limiter = TokenBucket(args.rate, args.burst) if args.rate else TokenBucket(1e9, 1e9)
+
+    # --- 纯 CPU 热点 ---
+    timings = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        engine.load_full_history()
+        timings.append(time.perf_counter() - t0)
+    result["history_ms"] = min(timings) * 1000
+    t0 = time.perf_counter()
+    n_parse = 20000
+    for i in range(n_parse): engine.parse_thread_content(SAMPLE_OUTPUTS[i % len(SAMPLE_OUTPUTS)])
+    result["parse_us"] = (time.perf_counter() - t0) / n_parse * 1e6
+
+    # --- 辩论吞吐：记录每一轮 execute 的耗时 ---
+    turn_latencies = []
+    submit = store.debates.submit
+
+    def timed_submit(thread_id, title, turns, prepare, execute):
+        def _execute(prepared, debate):
+            t = time.perf_counter()
+            try:
+                return execute(prepared, debate)
+            finally:
+                turn_latencies.append(time.perf_counter() - t)
+        return submit(thread_id, title, turns, prepare, _execute)
+    store.debates.submit = timed_submit
+
+    ops0, commits0 = _BATCH_SIZE.sum, _BATCH_SIZE.count
+    t0 = time.perf_counter()
+    debates = []
+    for i in range(args.debates):
+        agent = random.choice(store.agents)
+        thread = engine.publish_post(agent, f"桩话题 {i}", "特别研讨", style_key="早盘策略")
+        if thread is None: continue
+        debates += [d for d in store.debates.snapshot() if d.thread_id == thread.id]
+    while any(not d.finished for d in debates): time.sleep(0.05)
+    elapsed = time.perf_counter() - t0
+    ops, commits = _BATCH_SIZE.sum - ops0, _BATCH_SIZE.count - commits0
+    finished = [d for d in debates if d.state == "done"]
+    result.update({
+        "debates_done": len(finished),
+        "debates_per_hour": len(finished) / elapsed * 3600 if elapsed else 0.0,
+        "turn_p50_ms": percentile(turn_latencies, 0.5) * 1000,
+        "turn_p99_ms": percentile(turn_latencies, 0.99) * 1000,
+        "writes_per_s": ops / elapsed if elapsed else 0.0,
+        "commits_per_s": commits / elapsed if elapsed else 0.0,
+    })
+
+    # --- 复盘：把一批历史帖子改回未复盘并立即到期 ---
+    review_ids = history_ids[:args.reviews]
+    if review_ids:
+        db.executemany("UPDATE threads SET reviewed_at = NULL WHERE id = ?", [(t,) for t in review_ids])
+        for t_id in review_ids: store.reviews.push(t_id, 0)
+        calls, t0 = store.llm.stats["calls"], time.perf_counter()
+        engine.check_and_run_reviews()
+        result["reviews_per_s"] = len(review_ids) / (time.perf_counter() - t0)
+        result["review_calls"] = store.llm.stats["calls"] - calls
+    else:
+        result["reviews_per_s"], result["review_calls"] = 0.0, 0
+
+    result["rss_mb"], result["peak_rss_mb"] = rss_mb()
+    result["llm_calls"] = store.llm.stats["calls"]
+    if store.llm_cache is not None: result["llm_cache"] = store.llm_cache.usage()
+    print(json.dumps(result, ensure_ascii=False))
+
+
+# ------------------------------------------
+# 主进程：按网格逐个起子进程
+# ------------------------------------------
+COLUMNS = [  # (字段, 表头, 格式)
+    ("population", "pop", "d"), ("history", "history", "d"), ("startup_ms", "startup ms", ".0f"),
+    ("history_ms", "hist ms", ".1f"), ("parse_us", "parse µs", ".1f"), ("debates_per_hour", "debates/h", ".0f"),
+    ("turn_p50_ms", "turn p50 ms", ".0f"), ("turn_p99_ms", "turn p99 ms", ".0f"), ("reviews_per_s", "reviews/s", ".1f"),
+    ("review_calls", "rev calls", "d"),
+    ("writes_per_s", "writes/s", ".1f"), ("commits_per_s", "commits/s", ".1f"), ("rss_mb", "RSS MB", ".0f"),
+    ("peak_rss_mb", "peak MB", ".0f"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--populations", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--histories", type=int, nargs="+", default=[0, 10_000, 100_000])
+    parser.add_argument("--debates", type=int, default=6)
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--reviews", type=int, default=20)
+    parser.add_argument("--review-batch", type=int, default=8, help="每次复盘调用合并的帖子数，1 表示逐篇")
+    parser.add_argument("--latency", type=float, default=0.05, help="桩 LLM 首字节延迟(秒)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="流式分片间隔(秒)")
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=0.0, help="LLM 限流(次/秒)，0 表示不限流")
+    parser.add_argument("--burst", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，录制与回放用同一个")
+    parser.add_argument("--llm-cache", help="LLM 响应缓存文件")
+    parser.add_argument("--llm-cache-mode", choices=("on", "record", "replay"), default="record")
+    parser.add_argument("--json", action="store_true", help="每个场景输出一行 JSON 而不是表格")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--population", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--history", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_scenario(args)
+        return
+
+    if not args.json:
+        print(" | ".join(f"{title:>{max(9, len(title))}}" for _, title, _ in COLUMNS))
+    common = ["--debates", str(args.debates), "--turns", str(args.turns), "--reviews", str(args.reviews), "--review-batch", str(args.review_batch),
+              "--latency", str(args.latency), "--token-delay", str(args.token_delay), "--chunks", str(args.chunks),
+              "--rate", str(args.rate), "--burst", str(args.burst), "--seed", str(args.seed), "--llm-cache-mode", args.llm_cache_mode]
+    if args.llm_cache: common += ["--llm-cache", os.path.abspath(args.llm_cache)]
+    for population in args.populations:
+        for history in args.histories:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--population", str(population), "--history", str(history)] + common
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+            if proc.returncode != 0 or not lines:
+                print(f"场景 pop={population} history={history} 失败：\n{proc.stderr[-2000:]}", file=sys.stderr)
+                continue
+            row = json.loads(lines[-1])
+            if args.json:
+                print(json.dumps(row, ensure_ascii=False))
+            else:
+                print(" | ".join(f"{format(row[key], fmt):>{max(9, len(title))}}" for key, title, fmt in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
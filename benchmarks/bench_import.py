@@ -0,0 +1,102 @@
+"""导入与 rerun 开销基准：冷启动导入 forum 核心包要多久、会不会顺带加载重依赖。
+
+每次测量都在全新子进程里做，互不影响：
+    - core：import forum.engine / forum.background / forum.bootstrap 的冷导入耗时
+    - heavy：导入后 sys.modules 里不应出现 openai / httpx / duckduckgo_search / feedparser
+    - rerun：web_forum.py 脚本本身的执行耗时（Streamlit 每次交互都会重跑它），
+      需要安装 streamlit；main() 换成空函数，只测脚本与模块缓存的开销
+
+用法：
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget-core-ms 150 --budget-rerun-ms 5   # 超预算时退出码非 0
+    python benchmarks/bench_import.py --importtime                              # 额外打印 -X importtime 最慢的 15 个模块
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["openai", "httpx", "duckduckgo_search", "feedparser", "streamlit"]
+
+CORE_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import forum.engine, forum.background, forum.bootstrap
+elapsed = time.perf_counter() - t0
+print(json.dumps({"core_ms": elapsed * 1000, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+RERUN_PROBE = """
+import json, sys, time
+import forum.ui
+forum.ui.main = lambda: None
+code = compile(open("web_forum.py", encoding="utf-8").read(), "web_forum.py", "exec")
+n = %d
+t0 = time.perf_counter()
+for _ in range(n): exec(code, {"__name__": "__main__"})
+print(json.dumps({"rerun_ms": (time.perf_counter() - t0) / n * 1000}))
+"""
+
+
+def probe(source, *flags):
+    proc = subprocess.run([sys.executable, *flags, "-c", source], cwd=ROOT, capture_output=True, text=True)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not lines: return None, proc.stderr
+    return json.loads(lines[-1]), proc.stderr
+
+
+def slowest_imports(stderr, limit=15):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        # 格式："import time:     self |  cumulative | name"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="冷导入重复次数，取中位数")
+    parser.add_argument("--reruns", type=int, default=200, help="rerun 测量的循环次数")
+    parser.add_argument("--budget-core-ms", type=float, default=0.0, help="核心包冷导入预算，0 表示不检查")
+    parser.add_argument("--budget-rerun-ms", type=float, default=0.0, help="单次 rerun 脚本开销预算，0 表示不检查")
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    failures = []
+    samples, loaded = [], set()
+    for _ in range(args.repeat):
+        row, err = probe(CORE_PROBE % HEAVY_MODULES)
+        if row is None:
+            print(f"导入 forum 核心包失败：\n{err[-2000:]}", file=sys.stderr)
+            sys.exit(2)
+        samples.append(row["core_ms"])
+        loaded.update(row["loaded"])
+    core_ms = sorted(samples)[len(samples) // 2]
+    print(f"core import     {core_ms:8.1f} ms  (中位数，{args.repeat} 次冷启动)")
+    print(f"heavy modules   {', '.join(sorted(loaded)) or '无'}")
+    if loaded: failures.append(f"导入核心包时加载了重依赖：{', '.join(sorted(loaded))}")
+    if args.budget_core_ms and core_ms > args.budget_core_ms: failures.append(f"核心包导入 {core_ms:.1f}ms 超过预算 {args.budget_core_ms}ms")
+
+    row, err = probe(RERUN_PROBE % args.reruns)
+    if row is None:
+        print("rerun           跳过（需要 streamlit）")
+    else:
+        print(f"rerun script    {row['rerun_ms']:8.3f} ms  (每次)")
+        if args.budget_rerun_ms and row["rerun_ms"] > args.budget_rerun_ms: failures.append(f"rerun 开销 {row['rerun_ms']:.3f}ms 超过预算 {args.budget_rerun_ms}ms")
+
+    if args.importtime:
+        _, err = probe(CORE_PROBE % HEAVY_MODULES, "-X", "importtime")
+        print("\n最慢的导入（累计 µs / 自身 µs）：")
+        for cumulative, self_us, name in slowest_imports(err): print(f"  {cumulative:>9} {self_us:>9}  {name}")
+
+    for msg in failures: print(f"❌ {msg}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
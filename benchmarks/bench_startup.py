@@ -0,0 +1,97 @@
+"""冷启动基准：对比旧的 N+1 历史加载（无索引）与迁移后的单次 JOIN 加载。
+
+用法：
+    python benchmarks/bench_startup.py                       # 10k / 100k / 1M 条评论
+    python benchmarks/bench_startup.py --sizes 10000 100000 --content-len 300
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forum.storage import Storage
+from forum.schema import MIGRATIONS, migrate
+from forum import queries
+
+COMMENTS_PER_THREAD = 12
+
+
+def populate(db, n_comments, content_len):
+    n_threads = max(1, n_comments // COMMENTS_PER_THREAD)
+    body = ("板块轮动资金流向估值修复" * (content_len // 12 + 1))[:content_len]
+    now = time.time()
+    thread_ids = [str(uuid.uuid4()) for _ in range(n_threads)]
+
+    def _fill(conn):
+        # 只建 v1 的表，模拟升级前的老库
+        MIGRATIONS[0](conn)
+        conn.execute("PRAGMA user_version = 1")
+        conn.executemany(
+            "INSERT INTO threads (id, title, content, image_url, author_name, author_avatar, author_job, created_at, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((tid, f"标题{i}", body, None, "策略首席", "📈", "首席策略师", "09:15", now - i * 60) for i, tid in enumerate(thread_ids)))
+        conn.executemany(
+            "INSERT INTO comments (thread_id, author_name, author_avatar, author_job, content, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ((random.choice(thread_ids), "量化猎手", "📊", "量化交易主管", body, "09:20") for _ in range(n_comments)))
+    db.transaction(_fill)
+
+
+def legacy_load(db, limit=queries.HISTORY_LIMIT):
+    # 原 load_full_history：每个帖子一条 SELECT
+    with db.read() as conn:
+        rows = conn.execute("SELECT * FROM threads ORDER BY timestamp DESC LIMIT ?", (limit,)).fetchall()
+        for r in rows:
+            conn.execute("SELECT * FROM comments WHERE thread_id = ?", (r[0],)).fetchall()
+    return len(rows)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - t0) * 1000
+
+
+def run(n_comments, content_len, workdir):
+    path = os.path.join(workdir, f"bench_{n_comments}.db")
+    db = Storage(path)
+    t_fill = timed(populate, db, n_comments, content_len)
+    db.close()
+
+    # 每次测量都用新的 Storage，模拟进程冷启动
+    db = Storage(path)
+    t_legacy = timed(legacy_load, db)
+    db.close()
+
+    db = Storage(path)
+    t_migrate = timed(migrate, db)
+    db.close()
+
+    db = Storage(path)
+    t_start = time.perf_counter()
+    migrate(db)
+    threads = queries.load_history(db)
+    t_cold = (time.perf_counter() - t_start) * 1000
+    db.close()
+
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"{n_comments:>10,} | {size_mb:8.1f} | {t_fill:9.0f} | {t_legacy:10.1f} | {t_migrate:10.1f} | {t_cold:9.1f} | {sum(len(t.comments) for t in threads):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--content-len", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'comments':>10} | {'db MB':>8} | {'fill ms':>9} | {'N+1 ms':>10} | {'migrate ms':>10} | {'cold ms':>9} | loaded")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            run(n, args.content_len, workdir)
+
+
+if __name__ == "__main__":
+    main()
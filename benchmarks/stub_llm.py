@@ -0,0 +1,141 @@
+"""本地 OpenAI 兼容桩服务：POST /chat/completions（或 /v1/chat/completions），支持 stream=True。
+
+延迟可调，用来在没有 DeepSeek key、没有网络的情况下压测整条链路。
+
+用法：
+    python benchmarks/stub_llm.py --port 8999 --latency 0.3 --token-delay 0.02
+    FORUM_LLM_BASE_URL=http://127.0.0.1:8999 DEEPSEEK_API_KEY=sk-stub streamlit run web_forum.py
+"""
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BODY = "北向资金今日净流入，半导体板块放量走强，短线关注量能能否持续。" * 3
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, token_delay=0.0, chunks=20, error_rate=0.0):
+        self.latency = latency          # 首字节前的等待（秒）
+        self.token_delay = token_delay  # 流式时每个分片之间的等待
+        self.chunks = chunks            # 回复切成多少片
+        self.error_rate = error_rate    # 按比例返回 503，用来压测重试
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            self.requests += 1
+            return next(self._ids)
+
+
+def _reply(n):
+    return f"标题：桩回复 {n} 号\n内容：{BODY}"
+
+
+def _batch_reply(messages):
+    # 要求 JSON 输出的批量复盘：按提示词里的 [T1]、[T2]… 逐篇给出报告
+    prompt = "".join(m.get("content") or "" for m in messages)
+    keys = dict.fromkeys(re.findall(r"\[(T\d+)\]", prompt))
+    return json.dumps({"reviews": [{"id": key, "report": f"[T+5 复盘报告] {key}：{BODY[:40]}"} for key in keys]}, ensure_ascii=False)
+
+
+def _usage(messages, text):
+    prompt = sum(len(m.get("content") or "") for m in messages)
+    return {"prompt_tokens": prompt, "completion_tokens": len(text), "total_tokens": prompt + len(text)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive，与网关的连接池行为一致
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        cfg = self.config
+        n = cfg.next_id()
+        if cfg.latency: time.sleep(cfg.latency)
+        if cfg.error_rate and (n * 7919 % 1000) / 1000 < cfg.error_rate:
+            self._json(503, {"error": {"message": "stub overloaded", "type": "server_error"}})
+            return
+
+        wants_json = (req.get("response_format") or {}).get("type") == "json_object"
+        text = _batch_reply(req.get("messages", [])) if wants_json else _reply(n)
+        usage = _usage(req.get("messages", []), text)
+        model = req.get("model", "stub")
+        if not req.get("stream"):
+            self._json(200, {"id": f"stub-{n}", "object": "chat.completion", "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                             "usage": usage})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = max(1, len(text) // cfg.chunks)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        base = {"id": f"stub-{n}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for i, piece in enumerate(pieces):
+            if i and cfg.token_delay: time.sleep(cfg.token_delay)
+            self._event(dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+        self._event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (req.get("stream_options") or {}).get("include_usage"):
+            self._event(dict(base, choices=[], usage=usage))
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _event(self, payload):
+        self._chunk(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start(port=0, host="127.0.0.1", config=None):
+    """后台线程启动桩服务，返回 (server, base_url)。port=0 时随机分配端口。"""
+    config = config or StubConfig()
+    handler = type("StubHandler", (_Handler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="Stub_LLM", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start(args.port, config=StubConfig(args.latency, args.token_delay, args.chunks, args.error_rate))
+    print(f"stub LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# AI 投研论坛 —— 后端组件（存储 / 调度 / LLM 等），web_forum.py 负责 UI
@@ -0,0 +1,164 @@
+import heapq
+import math
+import random
+import re
+from collections import Counter
+from itertools import repeat
+
+from forum import config
+
+# ==========================================
+# 分析师注册表：紧凑记录 + 预建索引 + 按话题相关度挑选辩手
+# ==========================================
+# - 每个分析师只留 (db_id, name, job, avatar, is_custom)，人设 prompt 建完 TF-IDF 就丢掉
+# - 名字、职位、发帖角色（LEADER_JOB_KEYWORDS）预先建好索引，不再每次线性过滤
+# - 人设按“职位 + prompt”做 TF-IDF（中文按字二元组切分），存成按词排序的倒排表；
+#   话题打分只累加话题里出现的词的倒排项，再用 argpartition 取前 k 个
+# 有 NumPy 时建表与打分都是整批数组运算（bincount / argsort）；没有时走纯 Python，排序结果一致。
+
+_ASCII_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile(r"[\u4e00-\u9fff]+")
+
+
+def terms(text):
+    text = (text or "").lower()
+    out = _ASCII_WORD.findall(text)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1: out.append(run)
+        else: out.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return out
+
+
+class Agent:
+    """分析师记录。保留下标访问，agent['name'] 的老写法与临时拼的 dict 分析师都能用。"""
+    __slots__ = ("db_id", "name", "job", "avatar", "is_custom")
+
+    def __init__(self, db_id, name, job, avatar, is_custom=False):
+        self.db_id = db_id
+        self.name = name
+        self.job = job
+        self.avatar = avatar
+        self.is_custom = bool(is_custom)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"Agent({self.name}, {self.job})"
+
+
+class AgentRegistry:
+    """rows: (id, name, job, avatar, prompt, is_custom)，可以是流式游标。"""
+
+    def __init__(self, rows=(), leader_keywords=("首席", "总监")):
+        self.agents = []
+        self.by_name = {}   # name -> [下标]，随机生成的名字可能重名
+        self.by_job = {}    # job -> [下标]
+        self.vocab = {}     # 词 -> 词号
+        # 稀疏的 (文档, 词, 词频) 三元组，整批算权重
+        doc_ids, term_ids, counts = [], [], []
+        vocab = self.vocab
+        for r in rows:
+            i = len(self.agents)
+            self.agents.append(Agent(r[0], r[1], r[2], r[3], r[5]))
+            self.by_name.setdefault(r[1], []).append(i)
+            self.by_job.setdefault(r[2], []).append(i)
+            tf = Counter(terms(f"{r[2]} {r[4]}"))
+            term_ids.extend([vocab.setdefault(t, len(vocab)) for t in tf])
+            counts.extend(tf.values())
+            doc_ids.extend(repeat(i, len(tf)))
+        self.leaders = [a for a in self.agents if any(k in (a.job or "") for k in leader_keywords)]
+        self._build_index(doc_ids, term_ids, counts)
+
+    # --- TF-IDF 倒排表：词号 -> [offsets[t], offsets[t+1]) 区间内的 (下标, 归一化权重) ---
+    def _build_index(self, doc_ids, term_ids, counts):
+        n, v = len(self.agents), len(self.vocab)
+        if config.HAS_NUMPY:
+            import numpy as np
+            doc = np.array(doc_ids, dtype=np.int32)
+            term = np.array(term_ids, dtype=np.int32)
+            df = np.bincount(term, minlength=v)
+            self.idf = np.log((1 + n) / (1 + df)) + 1
+            w = (1 + np.log(np.array(counts, dtype=np.float64))) * self.idf[term]
+            norm = np.sqrt(np.bincount(doc, weights=w * w, minlength=n))
+            norm[norm == 0] = 1.0
+            w /= norm[doc]
+            order = np.argsort(term, kind="stable")
+            self._idx, self._wts = doc[order], w[order].astype(np.float32)
+            self._offsets = np.concatenate(([0], np.cumsum(df))).tolist()
+            return
+        df = [0] * v
+        for t in term_ids: df[t] += 1
+        self.idf = [math.log((1 + n) / (1 + d)) + 1 for d in df]
+        w = [(1 + math.log(c)) * self.idf[t] for t, c in zip(term_ids, counts)]
+        norm = [0.0] * n
+        for d, x in zip(doc_ids, w): norm[d] += x * x
+        norm = [math.sqrt(x) or 1.0 for x in norm]
+        self._postings = [([], []) for _ in range(v)]
+        for d, t, x in zip(doc_ids, term_ids, w):
+            ix, ws = self._postings[t]
+            ix.append(d)
+            ws.append(x / norm[d])
+
+    def _query(self, text):
+        tf = Counter(self.vocab[t] for t in terms(text) if t in self.vocab)
+        weights = {t: (1 + math.log(c)) * float(self.idf[t]) for t, c in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {t: w / norm for t, w in weights.items()}
+
+    def relevant(self, text, k, exclude_name=None, jitter=0.0, spread_jobs=False):
+        """与 text 最相关的 k 个分析师，按相关度从高到低；jitter 为叠加的均匀随机扰动上限。
+        spread_jobs 时按职业轮流挑：第一轮每个职业出最相关的一位，不够再出第二位，同一轮内按相关度排。"""
+        n = len(self.agents)
+        excluded = self.by_name.get(exclude_name, []) if exclude_name else []
+        k = min(k, n - len(excluded))
+        if k <= 0: return []
+        query = self._query(text)
+        if not config.HAS_NUMPY: return self._relevant_py(query, k, excluded, jitter, spread_jobs)
+        import numpy as np
+        scores = np.zeros(n, dtype=np.float64)
+        spans = [(self._offsets[t], self._offsets[t + 1], w) for t, w in query.items()]
+        if spans:
+            idx = np.concatenate([self._idx[a:b] for a, b, _ in spans])
+            wts = np.concatenate([self._wts[a:b] * w for a, b, w in spans])
+            scores += np.bincount(idx, weights=wts, minlength=n)
+        if jitter: scores += np.random.random(n) * jitter
+        if excluded: scores[excluded] = -np.inf
+        if spread_jobs: return self._round_robin(scores.tolist(), k)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.agents[i] for i in top.tolist()]
+
+    def _relevant_py(self, query, k, excluded, jitter, spread_jobs):
+        scores = [random.random() * jitter for _ in self.agents] if jitter else [0.0] * len(self.agents)
+        for t, w in query.items():
+            ix, ws = self._postings[t]
+            for i, pw in zip(ix, ws): scores[i] += pw * w
+        for i in excluded: scores[i] = float("-inf")
+        if spread_jobs: return self._round_robin(scores, k)
+        return [self.agents[i] for i in heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)]
+
+    def _round_robin(self, scores, k):
+        # 默认人设共用一套提示词，相关度只差在职业名的几个字上，直接取前 k 会整场都是同一两个职业
+        picks = []
+        for bucket in self.by_job.values():
+            best = heapq.nlargest(k, bucket, key=scores.__getitem__)
+            picks.extend((rank, -scores[i], i) for rank, i in enumerate(best) if scores[i] != float("-inf"))
+        picks.sort()
+        return [self.agents[i] for _, _, i in picks[:k]]
+
+    # --- 列表接口：random.choice(registry) / for a in registry 照旧可用 ---
+    def __len__(self):
+        return len(self.agents)
+
+    def __getitem__(self, i):
+        return self.agents[i]
+
+    def __iter__(self):
+        return iter(self.agents)
+
+    def __bool__(self):
+        return bool(self.agents)
@@ -0,0 +1,70 @@
+import atexit
+import threading
+import time
+
+from forum import config, engine, queries
+from forum.metrics import REGISTRY
+from forum.scheduler import Scheduler
+
+# ==========================================
+# 后台任务编排：定时发帖、T+5 复盘、话题预取、冷数据归档、选主与增量同步
+# ==========================================
+# 只由 forum.bootstrap 在 "Cyber_V16" 线程里启动一次。
+# 多进程时续约与增量同步另起 "Cyber_Lease" 线程跑自己的调度器：发帖、复盘会阻塞在 LLM 调用上
+# 几十秒到几分钟，和它们挤在一个线程里，租约会在任务中途过期被别的进程抢走。
+
+LEADER_JOBS = [name for name, _, _ in config.POST_SCHEDULE] + ["reviews", "topics", "archive"]
+
+
+def register_leader_jobs(scheduler, store):
+    for name, expr, period in config.POST_SCHEDULE:
+        scheduler.add_cron(name, expr, lambda period=period: engine.run_scheduled_post(period), catchup=config.POST_CATCHUP, grace=config.POST_GRACE)
+    scheduler.add_dynamic("reviews", lambda now: store.reviews.next_due(), engine.check_and_run_reviews)
+
+    # 话题预取：每个发帖时刻前 TOPIC_PREFETCH_LEAD 秒跑一次
+    post_names = {name for name, _, _ in config.POST_SCHEDULE}
+    def _next_post_fire():
+        fires = [j.next_fire for j in list(scheduler.jobs.values()) if j.name in post_names and j.next_fire is not None]
+        return min(fires) if fires else None
+    def _next_prefetch(now):
+        fire = _next_post_fire()
+        if fire is None or store.topics.prefetched_for == fire: return None
+        return fire - config.TOPIC_PREFETCH_LEAD
+    scheduler.add_dynamic("topics", _next_prefetch, lambda: store.topics.prefetch(for_fire=_next_post_fire()))
+    if config.ARCHIVE_AFTER_DAYS: scheduler.add_interval("archive", config.ARCHIVE_INTERVAL, engine.compact_archive)
+
+
+def renew_lease(scheduler, store, db):
+    was_leader = store.is_leader
+    is_leader = store.lease.try_acquire()
+    store.is_leader = is_leader
+    if is_leader and not was_leader:
+        store.log(f"👑 成为后台 leader：{store.lease.holder}")
+        # 前任 leader 期间入库的帖子也要排进复盘队列
+        for t_id, ts in queries.load_unreviewed(db, config.THREAD_CACHE_SIZE): store.reviews.push(t_id, ts or time.time())
+        queries.clear_drafts(db)
+        store.meter.refresh()
+        register_leader_jobs(scheduler, store)
+    elif was_leader and not is_leader:
+        store.log("⚠️ 租约已被其他进程接管，停止后台任务")
+        for name in LEADER_JOBS: scheduler.remove(name)
+        for d in store.debates.active(): d.cancel()
+
+
+def background_loop(store, db):
+    store.log("🚀 V20.6 (强制时间戳版) 启动...")
+
+    # 不再每 10 秒轮询：调度线程直接睡到下一个发帖时刻或下一条复盘到期
+    scheduler = Scheduler(db, config.BJ_TZ, log=store.log)
+    if config.MULTI_PROCESS:
+        # 每个进程都同步库里的增量；只有抢到租约的进程注册发帖/复盘/预取任务
+        control = Scheduler(db, config.BJ_TZ, log=store.log)
+        control.add_interval("sync", config.FOLLOWER_SYNC_INTERVAL, store.sync_from_db)
+        control.add_interval("lease", config.LEASE_RENEW, lambda: renew_lease(scheduler, store, db))
+        atexit.register(store.lease.release)
+        threading.Thread(target=control.run_forever, name="Cyber_Lease", daemon=True).start()
+    else:
+        register_leader_jobs(scheduler, store)
+    if config.METRICS_FILE: scheduler.add_interval("metrics", config.METRICS_DUMP_INTERVAL, lambda: REGISTRY.dump(config.METRICS_FILE))
+    store.scheduler = scheduler
+    scheduler.run_forever()
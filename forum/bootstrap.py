@@ -0,0 +1,59 @@
+import threading
+
+from forum import config, engine
+from forum.images import ImageCache
+from forum.schema import migrate
+from forum.storage import get_storage
+
+# ==========================================
+# 一次性启动：建库迁移 → 配图缓存 → 构建 GlobalStore → 起后台线程、指标端口与只读接口
+# ==========================================
+# Streamlit 每次 rerun 都会重新执行 web_forum.py，但 start() 只有进程内第一次调用真正干活，
+# 之后直接返回同一个 STORE，rerun 的开销只剩界面渲染。
+
+BACKGROUND_THREAD = "Cyber_V16"
+
+_lock = threading.Lock()
+
+
+def start(api_key=None):
+    """幂等；返回进程内唯一的 GlobalStore。"""
+    if engine.STORE is not None: return engine.STORE
+    with _lock:
+        if engine.STORE is not None: return engine.STORE
+        db = get_storage(config.DB_FILE)
+        migrate(db)
+        engine.DB = db
+        engine.IMAGES = ImageCache(config.IMAGE_CACHE_DIR, config.IMAGE_CACHE_BYTES, fetch=config.IMAGE_FETCH,
+                                   timeout=config.IMAGE_FETCH_TIMEOUT, retry_after=config.IMAGE_RETRY_AFTER)
+        store = engine.GlobalStore(api_key or config.API_KEY)
+        engine.IMAGES.log = store.log
+        engine.STORE = store
+
+        if not any(t.name == BACKGROUND_THREAD for t in threading.enumerate()):
+            from forum.background import background_loop
+            threading.Thread(target=background_loop, args=(store, db), name=BACKGROUND_THREAD, daemon=True).start()
+        start_metrics_server(store)
+        start_feed_server(store, db)
+        return store
+
+
+def start_metrics_server(store):
+    if not config.METRICS_PORT: return None
+    from forum.metrics import serve
+    try:
+        return serve(config.METRICS_PORT)
+    except OSError as e:
+        # 多进程部署时端口可能已被其他进程占用
+        store.log(f"⚠️ 指标端口 {config.METRICS_PORT} 不可用：{e}")
+        return None
+
+
+def start_feed_server(store, db):
+    if not config.FEED_PORT: return None
+    from forum.feed import serve
+    try:
+        return serve(config.FEED_PORT, store, db)
+    except OSError as e:
+        store.log(f"⚠️ 只读接口端口 {config.FEED_PORT} 不可用：{e}")
+        return None
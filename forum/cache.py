@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# 进程内 LRU 缓存（可选 TTL / 按内存上限淘汰）
+# ==========================================
+
+
+class TTLCache:
+    """按访问顺序淘汰的 LRU，超过 maxsize 丢最久未用的；ttl=None 表示永不过期。"""
+
+    def __init__(self, maxsize=32, ttl=6 * 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None: return None
+            if item[0] is not None and item[0] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl if self.ttl is not None else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SizedLRU:
+    """按占用字节数淘汰的 LRU：put 时由调用方给出 nbytes，总量超过 max_bytes 丢最久未用的。"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()   # key -> (nbytes, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None: self.nbytes -= old[0]
+            # 单个条目比上限还大就不缓存，否则会把其他条目全部挤掉
+            if nbytes > self.max_bytes: return
+            self._data[key] = (nbytes, value)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (size, _) = self._data.popitem(last=False)
+                self.nbytes -= size
+
+    def discard(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None: self.nbytes -= old[0]
+
+    def stats(self):
+        return {"entries": len(self._data), "bytes": self.nbytes, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,138 @@
+import importlib.util
+import os
+from datetime import timedelta, timezone
+
+from forum.scheduler import CATCHUP_SKIP
+
+# ==========================================
+# 运行参数（不依赖 streamlit，导入无副作用）
+# ==========================================
+# 其他模块一律以 config.XXX 的形式读取，压测/脚本可以在 bootstrap 之前直接改这里的值。
+
+BJ_TZ = timezone(timedelta(hours=8))
+
+# 环境变量优先；界面层还会再看 st.secrets，便于离线压测（benchmarks/）指向本地桩服务
+API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
+LLM_BASE_URL = os.environ.get("FORUM_LLM_BASE_URL", "https://api.deepseek.com")
+LLM_MODEL = os.environ.get("FORUM_LLM_MODEL", "deepseek-chat")
+
+# 只探测是否安装，不真正导入；DDGS 在第一次搜索时才加载
+HAS_SEARCH_TOOL = importlib.util.find_spec("duckduckgo_search") is not None
+HAS_PIL = importlib.util.find_spec("PIL") is not None   # 配图缩放用；streamlit 自带，没有时按尺寸分别下载
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None   # 辩手相关度打分向量化；没有时退回纯 Python，结果相同
+
+# --- 运行参数 ---
+DAILY_BUDGET = 50.0
+DB_FILE = os.environ.get("FORUM_DB_FILE", "cyber_citizens.db")
+WARMUP_LIMIT = 50
+REFRESH_INTERVAL_HOME = 20000
+REFRESH_INTERVAL_DIALOG = 10000
+HOME_PAGE_SIZE = 10          # 首页每页帖子数
+CARD_CACHE_SIZE = 500        # 帖子卡片 HTML 缓存条数
+SEARCH_PAGE_SIZE = 5         # 侧边栏检索每页命中数
+SEARCH_CACHE_TTL = 30        # 同一检索词+页码的结果缓存秒数（rerun 时不重复查库）
+
+# --- 配图缓存 ---
+IMAGE_CACHE_DIR = os.environ.get("FORUM_IMAGE_CACHE", "image_cache")
+IMAGE_CACHE_BYTES = 64 * 1024 * 1024   # 磁盘缓存上限，超出按最近使用时间淘汰
+IMAGE_FETCH = os.environ.get("FORUM_IMAGE_OFFLINE") != "1"  # 关闭后不访问网络，一律用本地生成的占位图
+IMAGE_FETCH_TIMEOUT = 10
+IMAGE_RETRY_AFTER = 10 * 60    # 下载失败后多久再试，期间显示占位图
+IMAGE_SEEDS_PER_STYLE = 8      # 每个风格轮换的固定种子数：同风格同一天用同一张图
+IMAGE_FULL_SIZE = (800, 450)
+IMAGE_THUMB_SIZE = (240, 135)  # 卡片缩略图（CSS 显示 160x90，留 1.5 倍给高分屏）
+# 默认把缩略图以 data URI 内嵌进卡片；开启 Streamlit 静态服务（server.enableStaticServing）并把
+# IMAGE_CACHE_DIR 放在 ./static 下时，设为 "app/static/<子目录>" 让浏览器按 URL 取图并缓存
+IMAGE_STATIC_PREFIX = os.environ.get("FORUM_IMAGE_STATIC_PREFIX")
+
+# --- LLM 响应缓存（默认关闭，见 forum/llmcache.py） ---
+LLM_CACHE_FILE = os.environ.get("FORUM_LLM_CACHE")               # 设置后启用，独立的 SQLite 文件
+LLM_CACHE_MODE = os.environ.get("FORUM_LLM_CACHE_MODE", "on")    # on / record / replay
+LLM_CACHE_BYTES = 256 * 1024 * 1024
+LLM_CACHE_TTL = {             # 按任务类型的缓存秒数，0 表示不缓存
+    "review": 7 * 86400,      # 同一帖子的复盘 prompt 固定，失败重试、重跑复盘直接复用
+    "review_batch": 7 * 86400,
+    "create_post": 0,         # 高温采样：手动重发同一话题应写出新帖，而且命中缓存不花钱会绕过预算闸门；录制/回放模式照常缓存
+    "reply": 0,               # 辩论发言是高温采样，本来就该每次不同
+    "summary": 0,
+}
+
+# --- 辩论调度 ---
+DEBATE_TURNS = 12
+LEADER_JOB_KEYWORDS = ("首席", "总监")   # 职位含这些词的分析师负责定时发帖
+REPLIER_JITTER = 0.05    # 辩手相关度打分上叠加的随机扰动（余弦相似度 0~1），人设相近时轮换出场
+DEBATE_WORKERS = 2       # 同时进行的辩论上限，多出的排队
+DEBATE_TURN_GAP = 0      # 每轮之间额外停顿(秒)，节奏主要靠下面的限流控制
+LLM_RATE_PER_SEC = 0.5   # DeepSeek 调用限流：每秒令牌数
+LLM_BURST = 3
+LLM_CONCURRENCY = 4      # 同时在途的 API 请求上限
+LLM_TIMEOUT = 60
+LLM_MAX_RETRIES = 3
+LLM_MAX_TOKENS = 1000
+LLM_TEMPERATURE = 0.9
+LLM_TASK_PARAMS = {          # 按任务类型覆盖的调用参数
+    # 批量复盘要求返回 JSON：低温、JSON 模式、输出上限按一批的篇数放大
+    "review_batch": {"temperature": 0.3, "max_tokens": 4000, "response_format": {"type": "json_object"}},
+}
+LLM_PRICE_INPUT = 2.0    # 每百万输入 token 价格(元)，与 DAILY_BUDGET 同单位
+LLM_PRICE_OUTPUT = 8.0   # 每百万输出 token 价格(元)
+THREAD_CACHE_SIZE = 100     # 内存里保留的最近帖子数
+HOT_THREADS = 20            # 其中带评论正文的最新帖子数，更早的只留帖子头和评论条数
+COMMENT_CACHE_BYTES = 8 * 1024 * 1024  # 冷帖按需加载的评论 LRU 内存上限
+CONTEXT_KEEP_LAST = 4      # 辩论 prompt 里保留原文的最近楼层数
+CONTEXT_TOKEN_BUDGET = 1500  # 原文区 token 上限，更早的楼层只保留摘要
+LIVE_FLUSH_INTERVAL = 1.0    # 流式回复写入 drafts 表的最小间隔(秒)
+LIVE_REFRESH_INTERVAL = 0.5  # 对话框里实时楼层的刷新间隔(秒)
+
+# --- 定时发帖（cron: 分 时 日 月 周，北京时间） ---
+POST_SCHEDULE = [
+    ("morning", "15 9 * * *", "早盘策略"),
+    ("noon", "30 12 * * *", "午盘点评"),
+    ("evening", "0 20 * * *", "收盘复盘"),
+]
+POST_CATCHUP = CATCHUP_SKIP  # 重启错过发帖时刻：skip 只补 POST_GRACE 内的，latest 补最近一次，all 全补
+POST_GRACE = 15 * 60
+REVIEW_GAP = 5                  # 两次复盘调用之间的停顿(秒)
+REVIEW_BATCH_SIZE = 8           # 同一天发布的到期帖子合并成一次调用审计的篇数上限，1 表示逐篇复盘
+REVIEW_SUMMARY_CHARS = 400      # 批量复盘时每篇“当时结论”截取的字数
+REVIEW_CLAIM_TTL = 15 * 60      # 复盘认领的有效期(秒)，要盖过一次调用的最长耗时；认领者崩溃后过期由新 leader 重做
+TOPIC_PREFETCH_LEAD = 10 * 60   # 每个发帖时刻前多久预取新闻标题
+TOPIC_FIXTURE_FILE = os.environ.get("FORUM_TOPIC_FIXTURE")  # 本地话题文件，设置后代替 DuckDuckGo
+ARCHIVE_AFTER_DAYS = 30         # 早于这么多天的帖子连同评论压缩进 archive 表，0 表示不归档
+ARCHIVE_INTERVAL = 6 * 3600     # 归档任务的运行间隔(秒)
+ARCHIVE_BATCH = 200             # 每个写事务归档的帖子数，避免长时间占住写线程
+
+# --- 多进程部署（多个 Streamlit 进程共用一个库） ---
+MULTI_PROCESS = os.environ.get("FORUM_MULTI_PROCESS") == "1"  # 开启后靠租约选出唯一的后台 leader
+LEASE_TTL = 30               # 租约有效期(秒)，leader 挂掉后最多这么久被接管
+LEASE_RENEW = 10             # 续约/抢占间隔
+FOLLOWER_SYNC_INTERVAL = 5   # 从库里同步其他进程写入的帖子与评论的间隔
+
+# --- 观测 ---
+METRICS_PORT = int(os.environ.get("FORUM_METRICS_PORT", "0"))  # >0 时在本机该端口提供 /metrics 与 /metrics.json
+METRICS_FILE = os.environ.get("FORUM_METRICS_FILE")            # 定期把指标写到该文件（.json 为 JSON，否则 Prometheus 文本）
+METRICS_DUMP_INTERVAL = 15
+PROFILE_FILE = os.environ.get("FORUM_PROFILE")                 # 设置后对页面渲染做 cProfile，累加写入该 .prof
+
+# --- 只读接口（JSON / RSS，见 forum.feed） ---
+FEED_PORT = int(os.environ.get("FORUM_FEED_PORT", "0"))       # >0 时在该端口提供 /api/threads 与 /rss.xml
+FEED_HOST = os.environ.get("FORUM_FEED_HOST", "127.0.0.1")    # 需要对外提供时改成 0.0.0.0
+FEED_PUBLIC_URL = os.environ.get("FORUM_FEED_URL", f"http://{FEED_HOST}:{FEED_PORT}")  # RSS 里链接的前缀
+FEED_TITLE = "AI 闭环投研"
+FEED_PAGE_SIZE = 20            # /api/threads 默认每页条数
+FEED_PAGE_MAX = 100            # limit 上限
+FEED_MAX_PAGES = 64            # 同一版本下缓存的列表页数上限
+FEED_RSS_ITEMS = 50
+FEED_CACHE_BYTES = 16 * 1024 * 1024   # 单帖响应缓存的内存上限
+FEED_DB_TTL = 60               # 内存里没有、回库读取的老帖/归档帖响应缓存多久(秒)
+FEED_GZIP_MIN = 512            # 小于该字节数的响应不压缩
+FEED_MAX_AGE = 5               # Cache-Control max-age(秒)，过期后客户端带 If-None-Match 来问，多半拿 304
+
+# --- 动态图源映射表 ---
+STYLE_TO_KEYWORD = {
+    "早盘策略": "sunrise, coffee, stock market",
+    "午盘点评": "lunch, business chart",
+    "收盘复盘": "sunset, city skyline, finance",
+    "复盘回测": "magnifying glass, check mark, data",
+    "随想": "abstract technology"
+}
@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+
+# ==========================================
+# 每个帖子的滚动辩论上下文
+# ==========================================
+# 以前每一轮都把全部楼层重新拼成字符串塞进 prompt（字符串与 token 都是平方级增长）。
+# 现在每条评论只 append 一次：
+#   - 最近 keep_last 条原文保留（且总量不超过 recent_budget 个 token）
+#   - 更早的楼层压缩成一行摘要（发言人 + 开头几十个字），摘要总量不超过 digest_budget
+#   - history() 作为 prompt 里【前序发言】的预计算文本缓存起来，只有新评论进来才重建
+
+
+def estimate_tokens(text):
+    # 粗略估算：中文约 0.6 token/字，ASCII 约 4 字符/token
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return int((len(text) - ascii_chars) * 0.6 + ascii_chars / 4) + 1
+
+
+class ThreadContext:
+    def __init__(self, title, content, keep_last=4, recent_budget=1500, digest_budget=400, digest_chars=60):
+        self.title = title
+        self.content = content
+        self.keep_last = keep_last
+        self.recent_budget = recent_budget
+        self.digest_budget = digest_budget
+        self.digest_chars = digest_chars
+
+        self.count = 0
+        self._recent = deque()         # (line, tokens)
+        self._recent_tokens = 0
+        self._digest = deque()         # (line, tokens)
+        self._digest_tokens = 0
+        self._dropped = 0
+        self._history = ""
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_comments(cls, thread, comments, **kwargs):
+        ctx = cls(thread.title, thread.content, **kwargs)
+        for c in comments: ctx.append(c.name, c.content)
+        return ctx
+
+    def append(self, name, content):
+        line = f"[{name}]: {content}\n"
+        with self._lock:
+            self.count += 1
+            tokens = estimate_tokens(line)
+            self._recent.append((line, tokens))
+            self._recent_tokens += tokens
+            # 最早的原文挪进摘要区（至少保留最新一条原文）
+            while len(self._recent) > 1 and (len(self._recent) > self.keep_last or self._recent_tokens > self.recent_budget):
+                old_line, old_tokens = self._recent.popleft()
+                self._recent_tokens -= old_tokens
+                self._push_digest(old_line)
+            self._history = None
+
+    def _push_digest(self, line):
+        name, _, body = line.partition("]: ")
+        body = body.strip().replace("\n", " ")
+        if len(body) > self.digest_chars: body = body[:self.digest_chars] + "…"
+        digest_line = f"{name}] 摘要: {body}\n"
+        tokens = estimate_tokens(digest_line)
+        self._digest.append((digest_line, tokens))
+        self._digest_tokens += tokens
+        while len(self._digest) > 1 and self._digest_tokens > self.digest_budget:
+            _, old_tokens = self._digest.popleft()
+            self._digest_tokens -= old_tokens
+            self._dropped += 1
+
+    def history(self):
+        with self._lock:
+            if self._history is None:
+                parts = []
+                if self._dropped: parts.append(f"（前 {self._dropped} 位发言已省略）\n")
+                parts.extend(line for line, _ in self._digest)
+                parts.extend(line for line, _ in self._recent)
+                self._history = "".join(parts)
+            return self._history
+
+    @property
+    def tokens(self):
+        return self._digest_tokens + self._recent_tokens
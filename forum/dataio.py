@@ -0,0 +1,155 @@
+"""论坛数据的批量导入/导出，以及快速生成测试数据。
+
+一个目录对应一份归档，每张表一个文件：citizens / threads / comments，
+格式为 .jsonl（每行一个对象）或 .csv（首行列名，按列存放，不依赖 Parquet）。
+每张表的导入是一次 executemany、一个事务；默认先删二级索引和全文索引触发器，插完再重建索引、
+一次性把新行补进全文索引，比逐行维护快数倍。全文索引的分词是大头，已有大库里追加少量数据时用 --keep-indexes。
+
+用法：
+    python -m forum.dataio export backup/ --format csv
+    python -m forum.dataio import backup/ --db test.db
+    python -m forum.dataio seed --db test.db --threads 100000 --comments 1000000
+导入请在论坛进程停止时进行（或开启多进程模式，由增量同步拾取新行）。
+评论 id 不导出，导入时重新分配；帖子按 id 去重，公民与评论重复导入会重复追加。
+archive 表里压缩归档的老帖子导出时还原成普通的帖子/评论行，导入后回到 threads/comments，由归档任务重新压缩。
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+from forum import config, queries
+from forum.schema import migrate
+from forum.storage import get_storage
+
+FORMATS = ("jsonl", "csv")
+TABLES = ("citizens", "threads", "comments")   # 导入顺序：评论引用帖子
+BULK_WRITERS = {"citizens": queries.bulk_add_citizens, "threads": queries.bulk_save_threads, "comments": queries.bulk_save_comments}
+
+# CSV 里一切都是字符串，这些列需要还原类型；空串视为 NULL
+_FLOAT_COLUMNS = {"timestamp", "reviewed_at"}
+_INT_COLUMNS = {"is_custom"}
+
+
+def _coerce(column, value):
+    if value is None or value == "": return None
+    if column in _FLOAT_COLUMNS: return float(value)
+    if column in _INT_COLUMNS: return int(value)
+    return value
+
+
+def table_path(directory, table, fmt):
+    return os.path.join(directory, f"{table}.{fmt}")
+
+
+# ------------------------------------------
+# 导出
+# ------------------------------------------
+def export_table(db, table, path, fmt):
+    columns = queries.TABLE_COLUMNS[table]
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in queries.iter_rows(db, table):
+                writer.writerow(["" if v is None else v for v in row])
+                count += 1
+        else:
+            for row in queries.iter_rows(db, table):
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def export_all(db, directory, fmt="jsonl"):
+    os.makedirs(directory, exist_ok=True)
+    return {table: export_table(db, table, table_path(directory, table, fmt), fmt) for table in TABLES}
+
+
+# ------------------------------------------
+# 导入
+# ------------------------------------------
+def read_table(table, path, fmt):
+    """按 TABLE_COLUMNS 的列顺序产出元组；缺失的列补 NULL。"""
+    columns = queries.TABLE_COLUMNS[table]
+    with open(path, encoding="utf-8", newline="") as f:
+        records = csv.DictReader(f) if fmt == "csv" else (json.loads(line) for line in f if line.strip())
+        for record in records:
+            yield tuple(_coerce(c, record.get(c)) for c in columns)
+
+
+def import_table(db, table, path, fmt, rebuild_indexes=True):
+    # 生成器直接交给写线程，读文件与插入同在一个事务里流式进行
+    return BULK_WRITERS[table](db, read_table(table, path, fmt), rebuild_indexes=rebuild_indexes)
+
+
+def import_all(db, directory, fmt=None, rebuild_indexes=True):
+    counts = {}
+    for table in TABLES:
+        for candidate in ([fmt] if fmt else FORMATS):
+            path = table_path(directory, table, candidate)
+            if os.path.exists(path):
+                counts[table] = import_table(db, table, path, candidate, rebuild_indexes)
+                break
+    return counts
+
+
+# ------------------------------------------
+# 合成数据：直接生成元组，不经过文件
+# ------------------------------------------
+def seed_synthetic(db, citizens=50, threads=1000, comments=12000, content_len=120, reviewed=True, rebuild_indexes=True):
+    body = ("板块轮动资金流向估值修复" * (content_len // 12 + 1))[:content_len]
+    now = time.time()
+    thread_ids = [str(uuid.uuid4()) for _ in range(threads)]
+    queries.bulk_add_citizens(db, ((f"分析师{i}", "首席策略师", "📈", "你是一名A股分析师。", 0) for i in range(citizens)), rebuild_indexes)
+    # 历史帖子默认都已复盘，避免启动后台任务时触发大批复盘
+    queries.bulk_save_threads(db, ((tid, f"历史帖{i}", body, None, "分析师0", "📈", "首席策略师", "09:15", now - 86400 * 10 - i * 60, now if reviewed else None)
+                                   for i, tid in enumerate(thread_ids)), rebuild_indexes)
+    if thread_ids:
+        queries.bulk_save_comments(db, ((random.choice(thread_ids), "分析师1", "📊", "量化交易主管", body, "09:20") for _ in range(comments)), rebuild_indexes)
+    return thread_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m forum.dataio", description="论坛数据批量导入/导出")
+    parser.add_argument("--db", default=config.DB_FILE)
+    parser.add_argument("--keep-indexes", action="store_true", help="逐行维护索引而不是导入后重建")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="导出到目录")
+    p_export.add_argument("directory")
+    p_export.add_argument("--format", choices=FORMATS, default="jsonl")
+    p_import = sub.add_parser("import", help="从目录导入")
+    p_import.add_argument("directory")
+    p_import.add_argument("--format", choices=FORMATS, help="默认按文件扩展名自动识别")
+    p_seed = sub.add_parser("seed", help="生成合成测试数据")
+    p_seed.add_argument("--citizens", type=int, default=50)
+    p_seed.add_argument("--threads", type=int, default=1000)
+    p_seed.add_argument("--comments", type=int, default=12000)
+    p_seed.add_argument("--content-len", type=int, default=120)
+    args = parser.parse_args(argv)
+
+    db = get_storage(args.db)
+    migrate(db)
+    t0 = time.perf_counter()
+    if args.command == "export":
+        counts = export_all(db, args.directory, args.format)
+    elif args.command == "import":
+        counts = import_all(db, args.directory, args.format, not args.keep_indexes)
+        if not counts:
+            print(f"{args.directory} 下没有找到 citizens/threads/comments 文件", file=sys.stderr)
+            sys.exit(1)
+    else:
+        seed_synthetic(db, args.citizens, args.threads, args.comments, args.content_len, rebuild_indexes=not args.keep_indexes)
+        counts = {"citizens": args.citizens, "threads": args.threads, "comments": args.comments if args.threads else 0}
+    elapsed = time.perf_counter() - t0
+    total = sum(counts.values())
+    print(", ".join(f"{table} {n:,}" for table, n in counts.items()) + f" · {elapsed:.2f}s · {total / elapsed if elapsed else 0:,.0f} 行/秒")
+
+
+if __name__ == "__main__":
+    main()
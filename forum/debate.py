@@ -0,0 +1,134 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from forum.metrics import REGISTRY
+
+# ==========================================
+# 辩论调度器：共享有界线程池 + 流水线预取
+# ==========================================
+# - 所有辩论共用 max_workers 个线程，同时手动发帖再多也不会无限开线程，多出的排队
+# - 每一轮的 prepare（限流取令牌、组装上下文）提前在预取池里跑，与上一轮的 LLM 调用重叠
+# - execute 严格按轮次顺序执行，保证楼层顺序
+# - 每场辩论有进度与取消
+
+MAX_FINISHED_KEPT = 20
+
+_TURN_SECONDS = REGISTRY.histogram("debate_turn_seconds", "辩论单轮 execute 耗时（含 LLM 调用与写库）")
+
+
+class Debate:
+    def __init__(self, thread_id, title, total):
+        self.id = uuid.uuid4().hex[:8]
+        self.thread_id = thread_id
+        self.title = title
+        self.total = total
+        self.done = 0
+        self.state = "queued"        # queued / running / done / stopped / cancelled / failed
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class DebateScheduler:
+    def __init__(self, max_workers=2, turn_gap=0.0, log=None):
+        self.turn_gap = turn_gap
+        self.log = log or (lambda msg: None)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Debate")
+        self._prefetch = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="DebatePrefetch")
+        self._lock = threading.Lock()
+        self._debates = OrderedDict()
+
+    def submit(self, thread_id, title, turns, prepare, execute):
+        """prepare(turn, debate) -> prepared；execute(prepared, debate) -> False 表示提前结束（如预算耗尽）。"""
+        debate = Debate(thread_id, title, len(turns))
+        with self._lock:
+            self._debates[debate.id] = debate
+            self._trim()
+        self._pool.submit(self._run, debate, list(turns), prepare, execute)
+        return debate
+
+    def _run(self, debate, turns, prepare, execute):
+        if debate.cancelled:
+            self._finish(debate, "cancelled")
+            return
+        debate.state = "running"
+        pending = self._prefetch.submit(prepare, turns[0], debate) if turns else None
+        try:
+            for i in range(len(turns)):
+                prepared = pending.result()
+                if debate.cancelled: break
+                pending = self._prefetch.submit(prepare, turns[i + 1], debate) if i + 1 < len(turns) else None
+                t0 = time.perf_counter()
+                ok = execute(prepared, debate)
+                _TURN_SECONDS.observe(time.perf_counter() - t0)
+                if ok is False:
+                    self._finish(debate, "stopped")
+                    return
+                debate.done += 1
+                if self.turn_gap and i + 1 < len(turns) and debate.cancel_event.wait(self.turn_gap): break
+        except CancelledError:
+            pass
+        except Exception as e:
+            debate.error = str(e)
+            self.log(f"❌ 辩论《{debate.title}》中断：{e}")
+            self._finish(debate, "failed")
+            return
+        finally:
+            if pending is not None:
+                debate.cancel()  # 让还在等令牌的预取尽快退出
+                pending.cancel()
+        self._finish(debate, "cancelled" if debate.cancelled and debate.done < debate.total else "done")
+
+    def _finish(self, debate, state):
+        if debate.finished: return
+        debate.state = state
+        debate.finished_at = time.time()
+        REGISTRY.histogram("debate_seconds", "整场辩论耗时（从提交算起）", state=state).observe(debate.finished_at - debate.created_at)
+
+    def _trim(self):
+        finished = [d.id for d in self._debates.values() if d.finished]
+        for d_id in finished[:max(0, len(finished) - MAX_FINISHED_KEPT)]:
+            del self._debates[d_id]
+
+    def get(self, debate_id):
+        with self._lock:
+            return self._debates.get(debate_id)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._debates.values())
+
+    def active(self):
+        return [d for d in self.snapshot() if not d.finished]
+
+    def cancel(self, debate_id):
+        debate = self.get(debate_id)
+        if debate: debate.cancel()
+        return debate is not None
+
+    def queued(self):
+        return sum(1 for d in self.snapshot() if d.state == "queued")
+
+    def shutdown(self):
+        for d in self.active(): d.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._prefetch.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,690 @@
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from forum import config, images, queries
+from forum.agents import AgentRegistry
+from forum.cache import TTLCache, SizedLRU
+from forum.context import ThreadContext
+from forum.debate import DebateScheduler
+from forum.leader import LeaderLease
+from forum.llm import LLMGateway
+from forum.llmcache import ResponseCache
+from forum.metering import Meter
+from forum.metrics import REGISTRY
+from forum.ratelimit import TokenBucket
+from forum.reviews import ReviewQueue
+from forum.storage import get_storage
+from forum.store import Thread, Comment, LiveComment, ThreadStore, TimedLock, comments_nbytes
+from forum.topics import TopicProvider, DDGSBackend, FixtureBackend
+
+# ==========================================
+# 论坛引擎：状态、发帖、辩论、复盘（不依赖 streamlit）
+# ==========================================
+# DB、STORE 与 IMAGES 由 forum.bootstrap.start() 一次性创建并挂到本模块上；
+# 导入本模块本身没有任何副作用，也不会加载 openai / duckduckgo_search。
+
+DB = None
+STORE = None
+IMAGES = None
+
+def get_dynamic_image(style_key):
+    # 按风格取确定性种子，发帖时就在后台把图下载进本地缓存
+    img_url = images.image_url(style_key)
+    if IMAGES is not None: IMAGES.prefetch(img_url)
+    return img_url
+
+# ==========================================
+# 数据库辅助函数
+# ==========================================
+@REGISTRY.timed("db_helper_seconds", "数据库辅助函数耗时", op="add_citizen")
+def add_citizen_to_db(name, job, avatar, prompt, is_custom=False):
+    queries.add_citizen(DB, name, job, avatar, prompt, is_custom)
+
+@REGISTRY.timed("db_helper_seconds", op="add_citizens")
+def add_citizens_to_db(rows):
+    """rows: (name, job, avatar, prompt, is_custom)，一个事务写完。"""
+    return queries.bulk_add_citizens(DB, rows)
+
+@REGISTRY.timed("db_helper_seconds", op="get_all_citizens")
+def get_all_citizens():
+    return queries.get_all_citizens(DB)
+
+@REGISTRY.timed("db_helper_seconds", op="save_thread")
+def save_thread_to_db(thread_data):
+    return queries.save_thread(DB, thread_data)
+
+@REGISTRY.timed("db_helper_seconds", op="save_comment")
+def save_comment_to_db(thread_id, comment_data):
+    return queries.save_comment(DB, thread_id, comment_data)
+
+@REGISTRY.timed("db_helper_seconds", op="load_full_history")
+def load_full_history():
+    return queries.load_history(DB)
+
+@REGISTRY.timed("db_helper_seconds", op="load_thread")
+def load_thread_from_db(thread_id):
+    """不在内存缓存里的老帖子（检索命中）按需从库里取。"""
+    return queries.load_thread(DB, thread_id)
+
+_SEARCH_CACHE = TTLCache(maxsize=256, ttl=config.SEARCH_CACHE_TTL)
+
+@REGISTRY.timed("db_helper_seconds", op="search")
+def search_history(text, page=0):
+    """(本页命中, 是否还有下一页)。"""
+    key = (text.strip(), page)
+    result = _SEARCH_CACHE.get(key)
+    if result is None:
+        size = config.SEARCH_PAGE_SIZE
+        hits = queries.search(DB, key[0], limit=size + 1, offset=page * size)
+        result = (hits[:size], len(hits) > size)
+        _SEARCH_CACHE.put(key, result)
+    return result
+
+@REGISTRY.timed("db_helper_seconds", op="mark_reviewed")
+def mark_reviewed_in_db(thread_id):
+    queries.mark_reviewed(DB, thread_id)
+
+# ==========================================
+# 全局状态
+# ==========================================
+class GlobalStore:
+    def __init__(self, api_key):
+        self.lock = TimedLock()
+        self.auto_run = True 
+        self.logs = []
+        
+        self.scheduler = None
+        self.topics = TopicProvider(self.make_topic_backend(), config.BJ_TZ, used_titles=self.recent_titles, log=self.log)
+
+        self.llm_limiter = TokenBucket(config.LLM_RATE_PER_SEC, config.LLM_BURST)
+        self.llm = LLMGateway(api_key, config.LLM_BASE_URL, model=config.LLM_MODEL, concurrency=config.LLM_CONCURRENCY, timeout=config.LLM_TIMEOUT, max_retries=config.LLM_MAX_RETRIES)
+        self.llm_cache = ResponseCache(get_storage(config.LLM_CACHE_FILE), config.LLM_CACHE_BYTES, config.LLM_CACHE_TTL, config.LLM_CACHE_MODE) if config.LLM_CACHE_FILE else None
+        self.debates = DebateScheduler(max_workers=config.DEBATE_WORKERS, turn_gap=config.DEBATE_TURN_GAP, log=self.log)
+        self.meter = Meter(DB, config.BJ_TZ, config.DAILY_BUDGET, config.LLM_PRICE_INPUT, config.LLM_PRICE_OUTPUT, log=self.log)
+
+        self.contexts = {}  # thread_id -> ThreadContext
+
+        # 变更版本号：任何帖子/评论变化都 +1，各会话据此判断要不要重跑
+        self.version = 0
+        self.thread_versions = {}  # thread_id -> 该帖最后一次变化时的全局版本号
+        self.live = {}  # thread_id -> 正在流式生成的 LiveComment
+
+        # 多进程：只有 leader 跑定时发帖、复盘和辩论；单进程时自己就是 leader
+        self.is_leader = not config.MULTI_PROCESS
+        self.lease = LeaderLease(DB, ttl=config.LEASE_TTL) if config.MULTI_PROCESS else None
+        self._sync_lock = threading.Lock()
+        self._own_comment_ids = set()  # 本进程写入的评论 id，增量同步时跳过
+        if self.is_leader: queries.clear_drafts(DB)
+
+        self.agents = self.reload_population()
+        with REGISTRY.histogram("db_helper_seconds", op="load_history_snapshot").time():
+            history, (self._synced_thread_rowid, self._synced_comment_id) = queries.load_history_snapshot(DB, config.THREAD_CACHE_SIZE, config.HOT_THREADS)
+        self.threads = ThreadStore(config.THREAD_CACHE_SIZE, history, hot=config.HOT_THREADS)
+        self.comment_cache = SizedLRU(config.COMMENT_CACHE_BYTES)  # 冷帖 id -> 按需加载的评论列表
+        self.reviews = ReviewQueue()
+        for t_id, ts in queries.load_unreviewed(DB, config.THREAD_CACHE_SIZE): self.reviews.push(t_id, ts or time.time())
+        self.check_genesis_block()
+        self.register_gauges()
+
+    def register_gauges(self):
+        # 回调型 gauge：导出时才取值
+        REGISTRY.gauge("store_lock", self.lock.stats, "STORE.lock 争用统计(ms)")
+        REGISTRY.gauge("review_queue_depth", lambda: len(self.reviews), "待复盘帖子数")
+        REGISTRY.gauge("debates_active", lambda: len(self.debates.active()), "进行中/排队的辩论数")
+        REGISTRY.gauge("debates_queued", self.debates.queued, "排队等待线程的辩论数")
+        REGISTRY.gauge("threads_cached", lambda: len(self.threads), "内存中的帖子数")
+        REGISTRY.gauge("comment_cache", self.comment_cache.stats, "冷帖评论 LRU（条目数/字节/命中/未命中）")
+        REGISTRY.gauge("image_cache", lambda: IMAGES.usage() if IMAGES else {}, "配图磁盘缓存（文件数/字节/命中/下载/失败/淘汰）")
+        REGISTRY.gauge("live_streams", lambda: len(self.live), "正在流式生成的楼层数")
+        REGISTRY.gauge("llm_gateway", lambda: dict(self.llm.stats), "LLM 网关累计计数")
+        if self.llm_cache is not None: REGISTRY.gauge("llm_cache", self.llm_cache.usage, "LLM 响应缓存（命中/未命中/写入/过期/淘汰/字节）")
+        REGISTRY.gauge("llm_spent_today", lambda: self.meter.today()["spent"], "当日 LLM 花费(元)")
+        REGISTRY.gauge("is_leader", lambda: int(self.is_leader), "本进程是否为后台 leader")
+
+    def reload_population(self):
+        with REGISTRY.histogram("db_helper_seconds", op="load_agents").time():
+            registry = AgentRegistry(queries.iter_citizens(DB), config.LEADER_JOB_KEYWORDS)
+        if not registry:
+            name_prefixes = ["策略", "宏观", "产业", "量化", "基本面"]
+            name_suffixes = ["首席", "研究员", "分析师", "猎手"]
+            jobs = ["首席策略师", "资深产业研究员", "私募投资总监", "量化交易主管"]
+            avatars = ["📈","📉","📊","💴","🏦","🏢","💡","🔭"]
+            prompt = "你是一名顶尖的A股分析师，擅长自上而下的基本面选股。"
+            add_citizens_to_db([(f"{random.choice(name_prefixes)}{random.choice(name_suffixes)}", random.choice(jobs), random.choice(avatars), prompt, False)
+                                for _ in range(50)])
+            self.log("✅ 50名金牌分析师已就位！")
+            registry = AgentRegistry(queries.iter_citizens(DB), config.LEADER_JOB_KEYWORDS)
+        return registry
+
+    def make_topic_backend(self):
+        if config.TOPIC_FIXTURE_FILE: return FixtureBackend(config.TOPIC_FIXTURE_FILE)
+        if config.HAS_SEARCH_TOOL: return DDGSBackend()
+        return None
+
+    def recent_titles(self):
+        with self.lock:
+            return [t.title for t in self.threads]
+
+    def check_genesis_block(self):
+        if not self.threads:
+            img = get_dynamic_image("随想")
+            genesis_thread = Thread(
+                id=str(uuid.uuid4()),
+                title="公告：V20.6 时间戳锁定版启动",
+                content="系统升级：\n1. 搜索关键词强制加入当天日期。\n2. AI必须验证新闻时效性。\n3. 5分钟极速研讨+自动刷新。",
+                image_url=img,
+                author="System_Core", avatar="📅", job="主控",
+                comments=[], time=datetime.now(config.BJ_TZ).strftime("%H:%M"),
+                timestamp=time.time()
+            )
+            self.add_thread(genesis_thread)
+
+    def log(self, msg):
+        t = datetime.now(config.BJ_TZ).strftime("%H:%M:%S")
+        with self.lock:
+            self.logs.append(f"[{t}] {msg}")
+            if len(self.logs) > 20: self.logs.pop(0)
+
+    def add_thread(self, thread_data):
+        self._apply_thread(thread_data)
+        save_thread_to_db(thread_data)
+
+    def add_comment(self, thread_id, comment_data):
+        if not config.MULTI_PROCESS:
+            self._apply_comment(thread_id, comment_data)
+            save_comment_to_db(thread_id, comment_data)
+            return
+        # 写库与登记 id 之间不能插入同步，否则自己的评论会被当成别人的再加一次
+        with self._sync_lock:
+            self._apply_comment(thread_id, comment_data)
+            self._own_comment_ids.add(save_comment_to_db(thread_id, comment_data))
+
+    def _apply_thread(self, thread_data):
+        # 只改内存，不写库
+        with self.lock:
+            evicted = self.threads.add(thread_data)
+            if evicted:
+                self.contexts.pop(evicted.id, None)
+                self.thread_versions.pop(evicted.id, None)
+            self._bump(thread_data.id)
+        self.reviews.push(thread_data.id, thread_data.timestamp)
+
+    def _apply_comment(self, thread_id, comment_data):
+        with self.lock:
+            t = self.threads.get(thread_id)
+            if t:
+                t.add_comment(comment_data)
+                self._bump(thread_id)
+            ctx = self.contexts.get(thread_id)
+        # 冷帖的评论缓存已过时，下次打开重新读库
+        if t is None or t.is_cold: self.comment_cache.discard(thread_id)
+        if ctx: ctx.append(comment_data.name, comment_data.content)
+
+    def thread_comments(self, thread):
+        """热帖直接返回内存里的评论；冷帖先查 LRU，未命中再回库（已归档的从压缩包里解）。"""
+        comments = thread.comments
+        if comments is not None: return comments
+        comments = self.comment_cache.get(thread.id)
+        if comments is None:
+            with REGISTRY.histogram("db_helper_seconds", op="load_comments").time():
+                comments = queries.load_comments(DB, thread.id)
+            self.comment_cache.put(thread.id, comments, comments_nbytes(comments))
+        return comments
+
+    def sync_from_db(self):
+        """把其他进程在水位之后写入的帖子/评论并入内存，并 bump 版本号让各会话刷新。"""
+        with self._sync_lock:
+            new_threads, new_comments = queries.load_changes(DB, self._synced_thread_rowid, self._synced_comment_id)
+            for rowid, t in new_threads:
+                self._synced_thread_rowid = rowid
+                with self.lock: known = t.id in self.threads
+                if not known: self._apply_thread(t)
+            for comment_id, thread_id, c in new_comments:
+                self._synced_comment_id = comment_id
+                if comment_id in self._own_comment_ids:
+                    self._own_comment_ids.discard(comment_id)
+                    continue
+                self._apply_comment(thread_id, c)
+        # 其他进程的调用也记在同一本台账上，跟着同步重新汇总，侧栏花费与预算闸门才不会一直停在启动时
+        self.meter.refresh()
+        return len(new_threads) + len(new_comments)
+
+    def start_live(self, thread_id, agent):
+        live = LiveComment(agent['name'], agent['avatar'], agent['job'], datetime.now(config.BJ_TZ).strftime("%H:%M"))
+        with self.lock: self.live[thread_id] = live
+        return live
+
+    def on_live_delta(self, thread_id, live, delta):
+        # 在 LLM 事件循环线程里被调用：只改内存，草稿写库异步排队且限频，不能阻塞
+        live.append(delta)
+        now = time.time()
+        if now - live.flushed_at >= config.LIVE_FLUSH_INTERVAL:
+            live.flushed_at = now
+            queries.save_draft(DB, thread_id, live, wait=False)
+
+    def end_live(self, thread_id):
+        with self.lock: self.live.pop(thread_id, None)
+        queries.delete_draft(DB, thread_id, wait=False)
+
+    def get_live(self, thread_id):
+        """(name, avatar, job, time, text) 或 None；多进程时只读副本从 drafts 表读 leader 的草稿。"""
+        live = self.live.get(thread_id)
+        if live is not None: return live.name, live.avatar, live.job, live.time, live.text
+        if config.MULTI_PROCESS and not self.is_leader: return queries.load_draft(DB, thread_id)
+        return None
+
+    def is_streaming(self, thread_id):
+        """该帖是否有楼层正在生成或辩论未结束；只读副本看不到 leader 的辩论，只能看有没有草稿。"""
+        if thread_id in self.live: return True
+        if any(d.thread_id == thread_id for d in self.debates.active()): return True
+        if config.MULTI_PROCESS and not self.is_leader: return queries.load_draft(DB, thread_id) is not None
+        return False
+
+    def _bump(self, thread_id):
+        # 调用方需持有 self.lock
+        self.version += 1
+        self.thread_versions[thread_id] = self.version
+
+    def thread_version(self, thread_id):
+        return self.thread_versions.get(thread_id, 0)
+
+    def get_context(self, thread):
+        with self.lock:
+            ctx = self.contexts.get(thread.id)
+            if ctx is not None: return ctx
+            current = self.threads.get(thread.id) or thread
+        # 冷帖要回库读评论，不能占着锁
+        comments = self.thread_comments(current)
+        with self.lock:
+            ctx = self.contexts.get(thread.id)
+            if ctx is None:
+                ctx = ThreadContext.from_comments(current, comments, keep_last=config.CONTEXT_KEEP_LAST, recent_budget=config.CONTEXT_TOKEN_BUDGET)
+                self.contexts[thread.id] = ctx
+        return ctx
+
+    def trigger_delayed_replies(self, thread):
+        # 按帖子内容挑人设最相关的辩手，各职业轮流出人，扰动让同职业的分析师轮换出场；相关度最高的压轴做总结
+        target_count = config.DEBATE_TURNS
+        selected = self.agents.relevant(f"{thread.title} {thread.content}", target_count, exclude_name=thread.author, jitter=config.REPLIER_JITTER, spread_jobs=True)
+        if not selected: return None
+        selected = selected[1:] + selected[:1]
+
+        turns = []
+        for i, r in enumerate(selected):
+            # 人数不足 DEBATE_TURNS（分析师少、排除了作者）时也要由最后一位做总结
+            is_last_person = (i == len(selected) - 1)
+            role_type = "critic" if i % 2 == 0 else "supporter"
+            if is_last_person: role_type = "judge"
+            turns.append({"agent": r, "role_type": role_type, "task": "summary" if is_last_person else "reply"})
+
+        # 预取阶段：与上一轮 LLM 调用并行，提前拿限流令牌、组装静态上下文
+        def _prepare_turn(turn, debate):
+            reserved = self.llm_limiter.acquire(cancel_event=debate.cancel_event)
+            context_base = {"title": thread.title, "content": thread.content, "role_type": turn['role_type']}
+            return dict(turn, context=context_base, reserved=reserved)
+
+        # 执行阶段：按轮次顺序，拿到最新楼层后发起调用
+        def _run_turn(prepared, debate):
+            if self.meter.exhausted(): return False
+
+            r = prepared['agent']
+            context_full = dict(prepared['context'], history=self.get_context(thread).history())
+            # 边生成边显示：增量写进实时楼层，完成后再转成正式评论
+            live = self.start_live(thread.id, r)
+            try:
+                reply = ai_brain_worker(r, prepared['task'], context_full, reserved=prepared['reserved'], thread_id=thread.id,
+                                        on_delta=lambda delta: self.on_live_delta(thread.id, live, delta))
+                if "ERROR" not in reply:
+                    comm_data = Comment(r['name'], r['avatar'], r['job'], reply, live.time)
+                    self.add_comment(thread.id, comm_data)
+            finally:
+                self.end_live(thread.id)
+
+            if "ERROR" not in reply and prepared['task'] == "summary":
+                self.log(f"🏆 {r['name']}：最终决策报告已发布")
+            return True
+
+        self.log(f"🧠 [深度辩论] {len(selected)}位专家已就位，开始辩论...")
+        return self.debates.submit(thread.id, thread.title, turns, _prepare_turn, _run_turn)
+
+    def trigger_new_user_event(self, new_agent):
+        self.log(f"🎉 分析师 {new_agent['name']} 加盟！")
+
+# ==========================================
+# 发帖 / 复盘 / 调用 LLM
+# ==========================================
+
+def parse_thread_content(raw_text):
+    lines = [l.strip() for l in raw_text.split('\n') if l.strip()]
+    if not lines:
+        return "AI生成异常", "内容为空，请稍后刷新..."
+
+    title = ""
+    content = ""
+
+    first_line = lines[0]
+    if "标题" in first_line or "Title" in first_line:
+        title = first_line.replace("标题", "").replace("Title", "").replace(":", "").replace("：", "").strip()
+        if len(lines) > 1:
+            content = "\n".join(lines[1:])
+    else:
+        title = first_line
+        if len(lines) > 1:
+            content = "\n".join(lines[1:])
+
+    if content.startswith("内容") or content.startswith("Content"):
+        parts = content.split("：", 1) if "：" in content else content.split(":", 1)
+        if len(parts) > 1:
+            content = parts[1].strip()
+
+    if not title: title = "无题"
+    if not content: content = "（AI未生成正文内容，但根据上下文进行了分析）"
+
+    return title, content
+
+def build_messages(agent, task_type, context=""):
+    # 【V20.6 核心】 强制注入当前准确日期
+    current_date_str = datetime.now(config.BJ_TZ).strftime("%Y年%m月%d日")
+    
+    sys_prompt = f"""
+    你的身份：{agent['name']}，A股顶级分析师。
+    **今天的真实日期是：{current_date_str}**。
+    
+    【最高指令 - 时效性死刑】：
+    1. 你必须检查搜索结果中的日期。如果搜索结果是“2024年”、“1年前”的旧闻，**立刻忽略**，严禁使用！
+    2. 如果找不到今天的相关新闻，请直接说“今日暂无重大相关消息”，不要编造。
+    3. 你的分析必须基于【今天或昨天】发生的真实事件。
+    """
+
+    if task_type == "create_post":
+        # context 包含 topic 和 period
+        topic_info = context.get('topic', '随机板块')
+        period = context.get('period', '早盘')
+        
+        # 搜索时已经把日期加进去了，所以这里主要告诉AI怎么写
+        user_prompt = f"""
+        任务：发布一篇【{period}】行业研讨。
+        核心议题：{topic_info}
+        
+        要求：
+        1. 文章开头必须注明：**“数据截止：{current_date_str}”**。
+        2. 引用数据必须是【最近24小时内】的（如昨晚收盘价、今早公告）。
+        3. 抛出宏观逻辑，结尾抛出争议。
+        
+        格式：
+        标题：【{period}】{topic_info}...
+        内容：...
+        """
+        
+    elif task_type == "summary":
+        thread_title = context.get('title', '')
+        thread_content = context.get('content', '')  
+        history = context.get('history', '') 
+        
+        user_prompt = f"""
+        任务：作为【首席投资官】，做最终决策。
+        
+        【楼主】：{thread_content[:500]}
+        【辩论】：{history}
+        
+        【你的绝对命令】：
+        1. **字数限制**：300字以内！
+        2. **强制推票**：必须列出 **3只具体股票**。
+        3. **操作建议**：必须给出买卖点。
+        4. **时效检查**：确认大家讨论的是{current_date_str}的行情，不是旧闻。
+        
+        **格式要求**：
+        **[最终判决]** (50字内)
+        **[精选金股]**
+        1. 股票(代码)：理由... 建议...
+        ...
+        """
+        
+    elif task_type == "review":
+        thread_title = context.get('title', '')
+        summary = context.get('summary', '') 
+        
+        user_prompt = f"""
+        任务：冷酷审计员。
+        帖子《{thread_title}》发布于5天前。
+        当时结论：{summary}
+        
+        请联网查询这5天的真实表现。
+        输出：[T+5 复盘报告]...
+        """
+
+    elif task_type == "review_batch":
+        # context["items"]: [(编号, 标题, 当时结论)]，编号用 T1、T2…，比 uuid 省 token 也不易抄错
+        listing = "\n".join(f"[{key}]《{title}》\n当时结论：{summary}" for key, title, summary in context.get('items', []))
+        user_prompt = f"""
+        任务：冷酷审计员，一次复盘以下多篇帖子（均发布于5天前）。
+        {listing}
+        
+        请联网查询这5天的真实表现，逐篇审计。
+        只输出一个 JSON 对象，不要有任何其他文字：
+        {{"reviews": [{{"id": "T1", "report": "[T+5 复盘报告]..."}}]}}
+        id 必须与上面的编号一致，每篇 report 200字以内。
+        """
+
+    else: 
+        thread_title = context.get('title', '')
+        thread_content = context.get('content', '')
+        history = context.get('history', '暂无评论')
+        role_type = context.get('role_type', 'supporter')
+        
+        instruction = ""
+        if role_type == "critic":
+            instruction = "你是【质疑者】。**先检查时效！** 如果楼主引用了旧闻，直接揭穿他！如果时效没问题，再反驳逻辑。"
+        else:
+            instruction = "你是【补充者】。引用今天的最新公告来支持。"
+
+        user_prompt = f"""
+        任务：参与《{thread_title}》的辩论。
+        
+        【楼主】：{thread_content[:300]}...
+        【前序发言】：{history}
+        
+        【你的指令】：{instruction}
+        
+        要求：
+        1. 必须针对【上一楼】互动。
+        2. **必须包含事实依据（拒绝旧闻）**。
+        3. 200字左右。
+        """
+
+    return [{"role": "system", "content": sys_prompt}, {"role": "user", "content": user_prompt}]
+
+def ai_brain_worker(agent, task_type, context="", reserved=False, on_delta=None, thread_id=None):
+    with REGISTRY.histogram("llm_call_seconds", "ai_brain_worker 耗时（含限流等待）", task=task_type).time():
+        return _ai_brain_worker(agent, task_type, context, reserved, on_delta, thread_id)
+
+def _ai_brain_worker(agent, task_type, context, reserved, on_delta, thread_id):
+    ticket = None
+    try:
+        messages = build_messages(agent, task_type, context)
+
+        # 缓存命中不花钱也不占限流令牌，放在预算检查之前
+        params = dict({"temperature": config.LLM_TEMPERATURE, "max_tokens": config.LLM_MAX_TOKENS}, **config.LLM_TASK_PARAMS.get(task_type, {}))
+        cache, cache_key = STORE.llm_cache, None
+        if cache is not None and cache.cacheable(task_type):
+            cache_key = cache.key(STORE.llm.model, messages, params["temperature"], task_type)
+            cached = cache.get(cache_key, task_type)
+            if cached is not None:
+                if on_delta: on_delta(cached)
+                return cached
+            if cache.mode == "replay": return f"ERROR: [replay_miss] 回放缓存里没有 {task_type} 的录制结果"
+
+        # 发请求前按最坏情况预占预算，当日额度不够就不发
+        ticket = STORE.meter.reserve(messages, params["max_tokens"])
+        if ticket is None: return "ERROR: [budget] 今日预算已用完"
+
+        # 调度器预取阶段已经拿过令牌的不再重复限流
+        if not reserved: STORE.llm_limiter.acquire()
+
+        if on_delta: result = STORE.llm.stream_sync(messages, on_delta, **params)
+        else: result = STORE.llm.complete_sync(messages, **params)
+        STORE.meter.settle(ticket, result, task_type, agent['name'], thread_id)
+        ticket = None
+        if not result.ok:
+            return f"ERROR: [{result.error_kind}] {result.error}"
+        if cache_key: cache.put(cache_key, task_type, STORE.llm.model, result.content, result.usage)
+        return result.content
+    except Exception as e:
+        return f"ERROR: {str(e)}"
+    finally:
+        if ticket is not None: STORE.meter.release(ticket)
+
+# 【V20.6 核心修复】 话题在发帖前已由 TopicProvider 按“日期 + 关键词”预取好，这里直接取缓存
+def get_fresh_topic():
+    return STORE.topics.get_topic()
+
+REVIEWER_AGENT = {"name": "回测机器", "job": "审计系统", "avatar": "🤖", "prompt": "客观公正"}
+
+def parse_review_batch(raw_text, keys):
+    """从批量复盘的回复里取 {编号: 报告}；不认识的编号、空报告直接丢弃，缺的由调用方逐篇补做。"""
+    text = raw_text.strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start: return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    items = data.get("reviews", []) if isinstance(data, dict) else []
+    reports = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict): continue
+        key, report = str(item.get("id", "")).strip("[] "), item.get("report")
+        if key in keys and isinstance(report, str) and report.strip(): reports[key] = report.strip()
+    return reports
+
+def _publish_review(t, review_content):
+    comm_data = Comment(
+        name="回测机器", 
+        avatar="📝", 
+        job="系统审计", 
+        content=review_content, 
+        time=datetime.now(config.BJ_TZ).strftime("%H:%M")
+    )
+    STORE.add_comment(t.id, comm_data)
+    mark_reviewed_in_db(t.id)
+
+def _claim_reviews(items):
+    """items: [(帖子, 当时结论)]，返回认领成功的；正被别的进程复盘的，等认领过期再排队看一眼。"""
+    by_id = {t.id: (t, last_comment) for t, last_comment in items}
+    claimed, busy = queries.claim_reviews(DB, list(by_id), config.REVIEW_CLAIM_TTL)
+    for t_id in busy: STORE.reviews.retry(t_id, after=config.REVIEW_CLAIM_TTL)
+    return [by_id[t_id] for t_id in claimed]
+
+def _review_one(t, last_comment):
+    if not _claim_reviews([(t, last_comment)]): return
+    STORE.log(f"🕵️‍♂️ 正在对 5 天前的帖子《{t.title}》进行回测复盘...")
+    review_content = ai_brain_worker(REVIEWER_AGENT, "review", {"title": t.title, "summary": last_comment}, thread_id=t.id)
+    if "ERROR" not in review_content:
+        _publish_review(t, review_content)
+    else:
+        queries.release_review(DB, t.id)
+        STORE.reviews.retry(t.id)
+    time.sleep(config.REVIEW_GAP)
+
+def _review_batch(batch):
+    """一次调用审计一批帖子，返回没拿到结果、需要逐篇补做的条目（认领已交还）。"""
+    batch = _claim_reviews(batch)
+    if not batch: return []
+    keyed = {f"T{i}": item for i, item in enumerate(batch, start=1)}
+    items = [(key, t.title, last_comment[:config.REVIEW_SUMMARY_CHARS]) for key, (t, last_comment) in keyed.items()]
+    STORE.log(f"🕵️‍♂️ 正在批量复盘 {len(batch)} 篇 5 天前的帖子...")
+    raw = ai_brain_worker(REVIEWER_AGENT, "review_batch", {"items": items})
+    time.sleep(config.REVIEW_GAP)
+    reports = {} if raw.startswith("ERROR") else parse_review_batch(raw, keyed)
+    for key, report in reports.items(): _publish_review(keyed[key][0], report)
+    missing = [item for key, item in keyed.items() if key not in reports]
+    for t, _ in missing: queries.release_review(DB, t.id)
+    if missing: STORE.log(f"⚠️ 批量复盘有 {len(missing)}/{len(batch)} 篇没有结果，改为逐篇复盘")
+    return missing
+
+def _review_batches(items):
+    # 按发帖日期（北京时间）分组，同一天的帖子行情背景相同，再按 REVIEW_BATCH_SIZE 切块
+    by_day = {}
+    for t, last_comment in items:
+        by_day.setdefault(datetime.fromtimestamp(t.timestamp, config.BJ_TZ).date(), []).append((t, last_comment))
+    size = config.REVIEW_BATCH_SIZE
+    return [group[i:i + size] for _, group in sorted(by_day.items()) for i in range(0, len(group), size)]
+
+@REGISTRY.timed("review_run_seconds", "一次复盘任务的耗时")
+def check_and_run_reviews():
+    # 只取已到期的条目；锁内只做内存查找，被挤出内存的老帖在锁外回库读取
+    due_ids = STORE.reviews.pop_due()
+    if not due_ids: return
+    
+    with STORE.lock:
+        candidates = [(t_id, STORE.threads.get(t_id)) for t_id in due_ids]
+    
+    items = []
+    for t_id, t in candidates:
+        if t is None: t = queries.load_thread(DB, t_id)
+        if t is None: continue
+        comments = STORE.thread_comments(t)
+        items.append((t, comments[-1].content if comments else "无结论"))
+
+    # 积压时同一天的帖子合并成一次调用；整批失败或缺篇的退回逐篇复盘。每次调用前才认领，不预先占住整个积压
+    singles = items
+    if config.REVIEW_BATCH_SIZE > 1 and len(items) > 1:
+        singles = []
+        for batch in _review_batches(items):
+            singles += _review_batch(batch) if len(batch) > 1 else batch
+    for t, last_comment in singles: _review_one(t, last_comment)
+
+@REGISTRY.timed("archive_run_seconds", "一次归档压缩任务的耗时")
+def compact_archive():
+    """把 ARCHIVE_AFTER_DAYS 天前的帖子分批压进 archive 表，返回归档的帖子数。"""
+    cutoff = time.time() - config.ARCHIVE_AFTER_DAYS * 86400
+    total = 0
+    while True:
+        n = queries.archive_threads(DB, cutoff, config.ARCHIVE_BATCH)
+        total += n
+        if n < config.ARCHIVE_BATCH: break
+    if total: STORE.log(f"🗄️ 已压缩归档 {total} 个 {config.ARCHIVE_AFTER_DAYS} 天前的帖子")
+    return total
+
+def publish_post(agent, topic, period, style_key=None):
+    img_url = get_dynamic_image(style_key or period)
+    context = {"topic": topic, "period": period}
+    raw = ai_brain_worker(agent, "create_post", context)
+    
+    if "ERROR" in raw:
+        STORE.log(f"❌ 发帖失败：{raw[:80]}")
+        return None
+    t, c = parse_thread_content(raw)
+    new_thread = Thread(
+        id=str(uuid.uuid4()), 
+        title=t, 
+        content=c, 
+        image_url=img_url,
+        author=agent['name'], 
+        avatar=agent['avatar'], 
+        job=agent['job'], 
+        comments=[], 
+        time=datetime.now(config.BJ_TZ).strftime("%H:%M"),
+        timestamp=time.time()
+    )
+    STORE.add_thread(new_thread)
+    STORE.trigger_delayed_replies(new_thread)
+    return new_thread
+
+def run_scheduled_post(target_period):
+    if not STORE.auto_run:
+        STORE.log(f"⏸️ 自动发帖已暂停，跳过【{target_period}】")
+        return
+    
+    pool = STORE.agents.leaders or STORE.agents
+    agent = random.choice(pool)
+    
+    # 【V20.6】 这里获取到的 topic 已经包含了当天的日期
+    topic = get_fresh_topic()
+    
+    STORE.log(f"⏰ 时间到！正在发布【{target_period}】：{topic}")
+    publish_post(agent, topic, target_period)
@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from email.utils import format_datetime
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+from forum import config, queries
+from forum.cache import SizedLRU
+from forum.metrics import REGISTRY
+
+# ==========================================
+# 只读 HTTP 接口：给看板和爬虫用，不经过 Streamlit 的 rerun
+# ==========================================
+# - GET /api/threads?limit=20&offset=0   帖子头列表（新 → 旧，不含评论正文）
+# - GET /api/threads/<id>                单帖 + 全部评论；内存里没有的老帖/归档帖回库读取
+# - GET /rss.xml                         最近 FEED_RSS_ITEMS 篇帖子的 RSS 2.0
+# 由 forum.bootstrap 在 FEED_PORT > 0 时随论坛进程一起启动，数据直接取 GlobalStore 的内存快照。
+
+
+# ==========================================
+# 预先算好的响应：正文、gzip 正文、ETag 一起缓存
+# ==========================================
+# 每个缓存项记下生成时的版本号：列表与 RSS 对应 STORE.version，单帖对应 thread_versions[id]。
+# add_thread/add_comment（含多进程同步进来的）都会 bump 版本号，版本对不上就重新生成，不用另外通知。
+# 启动时载入、之后没变过的帖子在 thread_versions 里没有条目，版本记 0，同样缓存。
+# 内存里没有的老帖/归档帖变化不会 bump 版本，改按 FEED_DB_TTL 秒分桶当版本，最多旧这么久。
+
+
+class Response:
+    __slots__ = ("version", "body", "gzipped", "etag", "content_type")
+
+    def __init__(self, version, body, content_type):
+        self.version = version
+        self.body = body
+        self.content_type = content_type
+        self.etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        # 太短的不压，gzip 头尾比省下的还多
+        self.gzipped = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= config.FEED_GZIP_MIN else None
+
+    @property
+    def nbytes(self):
+        return len(self.body) + len(self.gzipped or b"") + 200
+
+
+class FeedCache:
+    """路径 -> Response。列表页数少，单帖按字节数 LRU。"""
+
+    def __init__(self, store, db, max_bytes=None):
+        self.store = store
+        self.db = db
+        self.threads = SizedLRU(max_bytes or config.FEED_CACHE_BYTES)   # thread_id -> Response
+        self.pages = {}                      # (limit, offset) / "rss" -> Response，全局版本一变整体作废
+        self.built = 0
+        self._lock = threading.Lock()
+
+    def _page(self, key, build):
+        with self.store.lock: version = self.store.version
+        resp = self.pages.get(key)
+        if resp is not None and resp.version == version: return resp
+        resp = build(version)
+        with self._lock:
+            # 全局版本变了，旧页一起清掉，避免翻页参数五花八门时越攒越多
+            if any(r.version != resp.version for r in self.pages.values()): self.pages = {}
+            if len(self.pages) < config.FEED_MAX_PAGES: self.pages[key] = resp
+            self.built += 1
+        return resp
+
+    def _snapshot(self, limit, offset=0):
+        with self.store.lock:
+            return [t.to_dict(with_comments=False) for t in islice(self.store.threads, offset, offset + limit)]
+
+    def thread_list(self, limit, offset):
+        def build(version):
+            items = self._snapshot(limit, offset)
+            return Response(version, _json({"version": version, "offset": offset, "threads": items}), "application/json; charset=utf-8")
+        return self._page((limit, offset), build)
+
+    def rss(self):
+        return self._page("rss", lambda version: Response(version, render_rss(self._snapshot(config.FEED_RSS_ITEMS)), "application/rss+xml; charset=utf-8"))
+
+    def thread(self, thread_id):
+        with self.store.lock:
+            t = self.store.threads.get(thread_id)
+            version = self.store.thread_version(thread_id) if t is not None else ("db", int(time.time() // config.FEED_DB_TTL))
+        resp = self.threads.get(thread_id)
+        if resp is not None and resp.version == version: return resp
+        if t is not None:
+            comments = list(self.store.thread_comments(t))
+        else:
+            with REGISTRY.histogram("db_helper_seconds", op="feed_load_thread").time():
+                t = queries.load_thread(self.db, thread_id)
+            if t is None: return None
+            comments = t.comments if t.comments is not None else queries.load_comments(self.db, thread_id)
+        payload = dict(t.to_dict(with_comments=False), comments=[c.to_dict() for c in comments], comment_count=len(comments))
+        resp = Response(version, _json(payload), "application/json; charset=utf-8")
+        self.threads.put(thread_id, resp, resp.nbytes)
+        with self._lock: self.built += 1
+        return resp
+
+    def stats(self):
+        return dict(self.threads.stats(), pages=len(self.pages), built=self.built)
+
+
+def _json(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_rss(threads):
+    link = config.FEED_PUBLIC_URL.rstrip("/")
+    items = []
+    for t in threads:
+        pub = format_datetime(datetime.fromtimestamp(t["timestamp"] or 0, config.BJ_TZ))
+        # RSS 2.0 的 <author> 要求是邮箱，作者显示名放 Dublin Core 的 dc:creator
+        items.append(
+            f"<item><title>{escape(t['title'] or '')}</title><link>{escape(link)}/api/threads/{escape(t['id'])}</link>"
+            f"<guid isPermaLink=\"false\">{escape(t['id'])}</guid><dc:creator>{escape(t['author'] or '')}</dc:creator>"
+            f"<pubDate>{pub}</pubDate><description>{escape(t['content'] or '')}</description></item>"
+        )
+    built = format_datetime(datetime.fromtimestamp(threads[0]["timestamp"] or 0, config.BJ_TZ)) if threads else format_datetime(datetime.now(config.BJ_TZ))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+        f"<title>{escape(config.FEED_TITLE)}</title><link>{escape(link)}/rss.xml</link><description>{escape(config.FEED_TITLE)}</description>"
+        f"<lastBuildDate>{built}</lastBuildDate>{''.join(items)}</channel></rss>"
+    ).encode("utf-8")
+
+
+def _etag_matches(header, etag):
+    if not header: return False
+    if header.strip() == "*": return True
+    # 弱比较：W/ 前缀不参与比较
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def _int_arg(query, name, default, upper):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        return default
+    return max(0, min(value, upper))
+
+
+# ==========================================
+# HTTP：ThreadingHTTPServer，与 /metrics 同一套写法
+# ==========================================
+def _make_handler(cache):
+    from http.server import BaseHTTPRequestHandler
+
+    requests = {status: REGISTRY.counter("feed_requests_total", "只读接口请求数", status=str(status)) for status in (200, 304, 404)}
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive，轮询的客户端不用每次重新握手
+        disable_nagle_algorithm = True  # 响应头和正文分两次写，不关 Nagle 会被延迟 ACK 卡 40ms
+
+        def do_GET(self):
+            self._serve(head=False)
+
+        def do_HEAD(self):
+            self._serve(head=True)
+
+        def _route(self):
+            url = urlsplit(self.path)
+            path = url.path.rstrip("/")
+            if path == "/api/threads":
+                query = parse_qs(url.query)
+                limit = _int_arg(query, "limit", config.FEED_PAGE_SIZE, config.FEED_PAGE_MAX) or config.FEED_PAGE_SIZE
+                return cache.thread_list(limit, _int_arg(query, "offset", 0, config.THREAD_CACHE_SIZE))
+            if path.startswith("/api/threads/"): return cache.thread(path[len("/api/threads/"):])
+            if path in ("/rss.xml", "/feed"): return cache.rss()
+            return None
+
+        def _serve(self, head):
+            resp = self._route()
+            if resp is None:
+                requests[404].inc()
+                body = b'{"error":"not found"}'
+                self.send_response(404)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head: self.wfile.write(body)
+                return
+            if _etag_matches(self.headers.get("If-None-Match"), resp.etag):
+                requests[304].inc()
+                self.send_response(304)
+                self._common_headers(resp)
+                self.end_headers()
+                return
+            requests[200].inc()
+            body = resp.body
+            use_gzip = resp.gzipped is not None and "gzip" in (self.headers.get("Accept-Encoding") or "")
+            if use_gzip: body = resp.gzipped
+            self.send_response(200)
+            self._common_headers(resp)
+            self.send_header("Content-Type", resp.content_type)
+            if use_gzip: self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not head: self.wfile.write(body)
+
+        def _common_headers(self, resp):
+            self.send_header("ETag", resp.etag)
+            self.send_header("Cache-Control", f"public, max-age={config.FEED_MAX_AGE}")
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Access-Control-Allow-Origin", "*")
+
+        def log_message(self, format, *args):
+            pass
+    return FeedHandler
+
+
+def serve(port, store, db, host=None):
+    """在后台线程里起只读接口，返回 server；端口被占用时抛 OSError。"""
+    from http.server import ThreadingHTTPServer
+    cache = FeedCache(store, db)
+    server = ThreadingHTTPServer((host or config.FEED_HOST, port), _make_handler(cache))
+    server.daemon_threads = True
+    server.cache = cache
+    REGISTRY.gauge("feed_cache", cache.stats, "只读接口响应缓存（条目数/字节/命中/未命中/生成次数）")
+    threading.Thread(target=server.serve_forever, name="Feed_HTTP", daemon=True).start()
+    return server
@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from forum import config
+from forum.cache import TTLCache
+
+# ==========================================
+# 配图：确定性种子 + 本地磁盘缓存（大图/缩略图）+ 离线占位图
+# ==========================================
+# 帖子里的 image_url 仍是远程地址，本地缓存以 URL 的哈希为键，所以老帖子的随机种子 URL 也能缓存。
+# 界面层只读本地文件：没缓存时立刻返回占位图、在后台线程下载，渲染永远不等网络。
+# 每张图只下载一次，有 Pillow 时本地裁剪出各尺寸；没有时按尺寸分别向 picsum 请求。
+
+PICSUM_URL = re.compile(r"^(https://picsum\.photos/seed/[^/]+)/\d+/\d+$")
+VARIANTS = {"full": config.IMAGE_FULL_SIZE, "thumb": config.IMAGE_THUMB_SIZE}
+MIME_TYPES = {".jpg": "image/jpeg", ".svg": "image/svg+xml"}
+
+
+def seed_for(style_key, day=None):
+    """同一风格同一天取同一个种子，每个风格在 IMAGE_SEEDS_PER_STYLE 个种子里按天轮换。"""
+    keyword = config.STYLE_TO_KEYWORD.get(style_key, style_key)
+    slug = "-".join(re.findall(r"[0-9a-zA-Z]+", keyword)) or hashlib.md5(keyword.encode("utf-8")).hexdigest()[:8]
+    day = day or datetime.now(config.BJ_TZ).date()
+    return f"{slug}-{day.toordinal() % config.IMAGE_SEEDS_PER_STYLE}"
+
+
+def image_url(style_key, day=None):
+    width, height = config.IMAGE_FULL_SIZE
+    return f"https://picsum.photos/seed/{seed_for(style_key, day)}/{width}/{height}"
+
+
+def placeholder_svg(seed, width, height):
+    """由种子确定的渐变色块，不依赖网络和 Pillow。"""
+    h = hashlib.md5(seed.encode("utf-8")).digest()
+    # 颜色压暗一些，白色文字背景下不刺眼
+    c1 = "#%02x%02x%02x" % (h[0] // 2 + 32, h[1] // 2 + 32, h[2] // 2 + 64)
+    c2 = "#%02x%02x%02x" % (h[3] // 2 + 16, h[4] // 2 + 48, h[5] // 2 + 32)
+    circles = "".join(
+        f'<circle cx="{h[6 + i] * width // 255}" cy="{h[9 + i] * height // 255}" r="{(h[12 + i] % 40 + 20) * height // 100}" fill="#fff" fill-opacity="0.08"/>'
+        for i in range(3))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<defs><linearGradient id="g" x1="0" y1="0" x2="1" y2="1"><stop offset="0" stop-color="{c1}"/><stop offset="1" stop-color="{c2}"/></linearGradient></defs>'
+            f'<rect width="{width}" height="{height}" fill="url(#g)"/>{circles}</svg>')
+
+
+def data_uri(path):
+    """文件转 data URI；文件刚好被淘汰时返回 None。"""
+    try:
+        with open(path, "rb") as f:
+            payload = base64.b64encode(f.read()).decode("ascii")
+    except OSError:
+        return None
+    return f"data:{MIME_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream')};base64,{payload}"
+
+
+class ImageCache:
+    """磁盘上的配图缓存：<key>.<variant>.jpg 与占位图 <key>.svg。总大小超过 max_bytes 时按最近使用时间淘汰。"""
+
+    def __init__(self, directory, max_bytes, fetch=True, timeout=10, retry_after=600, workers=2, log=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.timeout = timeout
+        self.log = log or (lambda msg: None)
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "downloads": 0, "failures": 0, "evictions": 0}
+        self._files = {}      # 文件名 -> [字节数, 最近使用时间]
+        self._pending = set()
+        self._failed = TTLCache(maxsize=1024, ttl=retry_after)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImageFetch")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                st = entry.stat()
+                self._files[entry.name] = [st.st_size, st.st_mtime]
+                self.nbytes += st.st_size
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+
+    def _touch(self, name):
+        # 调用方需持有 self._lock
+        item = self._files.get(name)
+        if item is None: return None
+        item[1] = time.time()
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f: f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._files.get(name)
+            if old is not None: self.nbytes -= old[0]
+            self._files[name] = [len(data), time.time()]
+            self.nbytes += len(data)
+            self._evict(keep=name)
+        return path
+
+    def _evict(self, keep):
+        # 调用方需持有 self._lock；文件数在几千以内，线性找最久未用的足够
+        while self.nbytes > self.max_bytes and len(self._files) > 1:
+            name = min((n for n in self._files if n != keep), key=lambda n: self._files[n][1])
+            size, _ = self._files.pop(name)
+            self.nbytes -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def cached(self, url, variant):
+        """已缓存的本地文件路径，没有返回 None；不触发下载。"""
+        with self._lock: return self._touch(f"{self.key(url)}.{variant}.jpg")
+
+    def placeholder(self, url):
+        """由 URL 确定的占位 SVG，大图与缩略图共用（矢量图随意缩放）。"""
+        name = f"{self.key(url)}.svg"
+        with self._lock: path = self._touch(name)
+        if path: return path
+        width, height = VARIANTS["full"]
+        return self._write(name, placeholder_svg(url, width, height).encode("utf-8"))
+
+    def get(self, url, variant="full"):
+        """本地文件路径：命中直接返回；否则排队后台下载，先给占位图。"""
+        path = self.cached(url, variant)
+        if path:
+            self.stats["hits"] += 1
+            return path
+        self.stats["misses"] += 1
+        self.prefetch(url)
+        return self.placeholder(url)
+
+    def prefetch(self, url):
+        """后台下载一次并生成全部尺寸；已缓存、正在下载或最近失败过的直接跳过。"""
+        if not url or not self.fetch or self._failed.get(url): return False
+        with self._lock:
+            if url in self._pending or f"{self.key(url)}.full.jpg" in self._files: return False
+            self._pending.add(url)
+        self._pool.submit(self._fetch, url)
+        return True
+
+    def _download(self, url):
+        import urllib.request   # 连带 http.client/ssl，冷启动时不加载
+        req = urllib.request.Request(url, headers={"User-Agent": "cyber-forum"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return resp.read()
+
+    def _fetch(self, url):
+        key = self.key(url)
+        try:
+            if config.HAS_PIL:
+                from PIL import Image, ImageOps
+                img = Image.open(io.BytesIO(self._download(url))).convert("RGB")
+                for variant, size in VARIANTS.items():
+                    buf = io.BytesIO()
+                    ImageOps.fit(img, size).save(buf, "JPEG", quality=85 if variant == "full" else 75, optimize=True)
+                    self._write(f"{key}.{variant}.jpg", buf.getvalue())
+            else:
+                # 没有 Pillow：picsum 可以按尺寸出图，其他地址只能原图兼作缩略图
+                m = PICSUM_URL.match(url)
+                full = self._download(url)
+                thumb = self._download(f"{m.group(1)}/{VARIANTS['thumb'][0]}/{VARIANTS['thumb'][1]}") if m else full
+                self._write(f"{key}.thumb.jpg", thumb)
+                self._write(f"{key}.full.jpg", full)
+            self.stats["downloads"] += 1
+        except Exception as e:
+            self.stats["failures"] += 1
+            self._failed.put(url, True)
+            self.log(f"⚠️ 配图下载失败，先用占位图：{type(e).__name__}")
+        finally:
+            with self._lock: self._pending.discard(url)
+
+    def usage(self):
+        return dict(self.stats, files=len(self._files), bytes=self.nbytes, pending=len(self._pending))
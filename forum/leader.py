@@ -0,0 +1,46 @@
+import os
+import socket
+import time
+import uuid
+
+# ==========================================
+# 多进程部署：基于 SQLite 租约的选主
+# ==========================================
+# 多个 Streamlit 进程共用同一个库时，只有持有 leases 行的进程跑定时发帖、复盘和辩论。
+# 租约带过期时间，leader 定期续约；leader 挂掉后，过期的租约会被其他进程抢到。
+
+
+class LeaderLease:
+    def __init__(self, db, name="background", ttl=30):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+
+    def try_acquire(self):
+        """抢占或续约，返回当前是否为 leader。租约仍由别人持有且未过期时失败。"""
+        now = time.time()
+
+        def _do(conn):
+            cur = conn.execute(
+                """INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                   WHERE leases.holder = excluded.holder OR leases.expires_at < ?""",
+                (self.name, self.holder, now + self.ttl, now))
+            return cur.rowcount == 1
+        try:
+            self.is_leader = self.db.transaction(_do)
+        except Exception:
+            self.is_leader = False
+        return self.is_leader
+
+    def release(self):
+        if not self.is_leader: return
+        self.db.execute("UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?", (self.name, self.holder))
+        self.is_leader = False
+
+    def current_holder(self):
+        row = self.db.query_one("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,))
+        if row is None or row[1] < time.time(): return None
+        return row[0]
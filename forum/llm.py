@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+# ==========================================
+# 异步 LLM 网关（AsyncOpenAI + 长连接池）
+# ==========================================
+# - 独立事件循环线程，所有请求复用同一个 httpx 连接池（keep-alive）
+# - Semaphore 控制并发；可重试错误走带抖动的指数退避
+# - 相同参数的在途请求合并成一次调用
+# - 返回 LLMResult，不再把异常揉成 "ERROR: ..." 字符串；同步调用方用 complete_sync
+# - stream / stream_sync 逐段回调增量文本，用于辩论楼层的实时显示
+
+RETRYABLE = {"timeout", "connection", "rate_limit", "server"}
+
+
+class LLMResult:
+    __slots__ = ("content", "error_kind", "error", "usage", "attempts", "latency", "coalesced")
+
+    def __init__(self, content=None, error_kind=None, error=None, usage=None, attempts=0, latency=0.0, coalesced=False):
+        self.content = content
+        self.error_kind = error_kind    # None / timeout / connection / rate_limit / server / auth / bad_request / unknown
+        self.error = error
+        self.usage = usage              # {"prompt_tokens": .., "completion_tokens": ..}
+        self.attempts = attempts
+        self.latency = latency
+        self.coalesced = coalesced
+
+    @property
+    def ok(self):
+        return self.error_kind is None
+
+    def __repr__(self):
+        if self.ok: return f"LLMResult(ok, {len(self.content or '')} chars, {self.attempts} attempt(s))"
+        return f"LLMResult({self.error_kind}: {self.error})"
+
+
+def classify_error(exc):
+    import openai
+    if isinstance(exc, (openai.APITimeoutError, asyncio.TimeoutError)): return "timeout"
+    if isinstance(exc, openai.APIConnectionError): return "connection"
+    if isinstance(exc, openai.RateLimitError): return "rate_limit"
+    if isinstance(exc, (openai.AuthenticationError, openai.PermissionDeniedError)): return "auth"
+    if isinstance(exc, (openai.BadRequestError, openai.NotFoundError, openai.UnprocessableEntityError)): return "bad_request"
+    if isinstance(exc, openai.APIStatusError) and exc.status_code >= 500: return "server"
+    return "unknown"
+
+
+class LLMGateway:
+    def __init__(self, api_key, base_url, model="deepseek-chat", concurrency=4, timeout=60.0,
+                 max_retries=3, backoff_base=1.0, backoff_max=20.0, coalesce=True):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.coalesce = coalesce
+
+        self.stats = {"requests": 0, "calls": 0, "coalesced": 0, "retries": 0, "errors": 0}
+        self._loop = None
+        self._client = None
+        self._sem = None
+        self._inflight = {}
+        self._start_lock = threading.Lock()
+
+    # --- 事件循环线程 ---
+    def _ensure_loop(self):
+        if self._loop is not None: return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    self._sem = asyncio.Semaphore(self.concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=_run, name="LLM_Loop", daemon=True).start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency, keepalive_expiry=120),
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+            )
+            # 重试由网关自己做，关闭 SDK 内置重试
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+        return self._client
+
+    # --- 异步接口 ---
+    def _key(self, messages, params):
+        raw = json.dumps([self.model, messages, sorted(params.items())], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def complete(self, messages, **params):
+        """params 透传给 chat.completions.create（temperature / max_tokens ...）。"""
+        self.stats["requests"] += 1
+        if not self.coalesce:
+            return await self._complete(messages, params)
+
+        key = self._key(messages, params)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            res = await asyncio.shield(task)
+            return LLMResult(res.content, res.error_kind, res.error, res.usage, res.attempts, res.latency, coalesced=True)
+
+        task = asyncio.ensure_future(self._complete(messages, params))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _complete(self, messages, params):
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._sem:
+                    self.stats["calls"] += 1
+                    res = await self._get_client().chat.completions.create(model=self.model, messages=messages, **params)
+                usage = None
+                if getattr(res, "usage", None) is not None:
+                    usage = {"prompt_tokens": res.usage.prompt_tokens, "completion_tokens": res.usage.completion_tokens}
+                content = (res.choices[0].message.content or "").strip()
+                return LLMResult(content, usage=usage, attempts=attempt, latency=time.perf_counter() - start)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                kind = classify_error(e)
+                if kind not in RETRYABLE or attempt > self.max_retries:
+                    self.stats["errors"] += 1
+                    return LLMResult(error_kind=kind, error=str(e), attempts=attempt, latency=time.perf_counter() - start)
+                self.stats["retries"] += 1
+                # full jitter：在 [0, base * 2^n] 里随机取，避免大家同时重试
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                await asyncio.sleep(random.uniform(0, delay))
+
+    async def stream(self, messages, on_delta, **params):
+        """流式调用：每收到一段文本就 on_delta(text)（在事件循环线程里调用，不能阻塞）。流式请求不合并。"""
+        self.stats["requests"] += 1
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            parts = []
+            try:
+                async with self._sem:
+                    self.stats["calls"] += 1
+                    chunks = await self._get_client().chat.completions.create(
+                        model=self.model, messages=messages, stream=True, stream_options={"include_usage": True}, **params)
+                    usage = None
+                    async for chunk in chunks:
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = {"prompt_tokens": chunk.usage.prompt_tokens, "completion_tokens": chunk.usage.completion_tokens}
+                        if not chunk.choices: continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            on_delta(delta)
+                return LLMResult("".join(parts).strip(), usage=usage, attempts=attempt, latency=time.perf_counter() - start)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                kind = classify_error(e)
+                # 已经吐出部分内容的不再重试，否则界面上会出现重复文本
+                if parts or kind not in RETRYABLE or attempt > self.max_retries:
+                    self.stats["errors"] += 1
+                    return LLMResult(error_kind=kind, error=str(e), attempts=attempt, latency=time.perf_counter() - start)
+                self.stats["retries"] += 1
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                await asyncio.sleep(random.uniform(0, delay))
+
+    # --- 同步适配 ---
+    def submit(self, messages, **params):
+        """线程安全，立即返回 concurrent.futures.Future[LLMResult]。"""
+        return asyncio.run_coroutine_threadsafe(self.complete(messages, **params), self._ensure_loop())
+
+    def complete_sync(self, messages, **params):
+        return self.submit(messages, **params).result()
+
+    def stream_sync(self, messages, on_delta, **params):
+        return asyncio.run_coroutine_threadsafe(self.stream(messages, on_delta, **params), self._ensure_loop()).result()
+
+    def close(self):
+        if self._loop is None: return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import re
+import threading
+import time
+
+# ==========================================
+# LLM 响应磁盘缓存（按内容寻址，独立的 SQLite 文件）
+# ==========================================
+# key = sha256(模型, messages, temperature, 任务类型)，只缓存成功的结果。
+# - on：按任务类型的 TTL 读写；TTL 为 0 的任务（高温采样的辩论发言）不缓存
+# - record：照常调用接口，但每个任务的结果都存下来且永不过期，供 replay 使用
+# - replay：只读缓存、不访问网络；完全相同的 prompt 没录到时，按任务类型轮流取一条录过的结果
+# prompt 里写死了当天日期，record/replay 计算 key 前把日期抹掉，隔天也能回放。
+# 总大小超过 max_bytes 时按最近使用时间淘汰。
+
+MODES = ("on", "record", "replay")
+
+_DATE = re.compile(r"\d{4}年\d{1,2}月\d{1,2}日")
+_EVICT_BATCH = 64
+
+
+class ResponseCache:
+    def __init__(self, db, max_bytes, ttls, mode="on"):
+        """db 为 forum.storage.Storage；ttls: 任务类型 -> 秒，0 或缺省表示该任务不缓存。"""
+        if mode not in MODES: raise ValueError(f"未知的 LLM 缓存模式：{mode}")
+        self.db = db
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0, "replay_fallbacks": 0}
+        self._replay_cursor = {}   # task -> 回放轮转位置
+        self._lock = threading.Lock()
+        db.transaction(self._create)
+        self.nbytes = db.query_one("SELECT IFNULL(SUM(nbytes), 0) FROM llm_cache")[0]
+
+    @staticmethod
+    def _create(conn):
+        conn.execute("""CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, task TEXT, model TEXT, response TEXT, usage TEXT,
+                        nbytes INTEGER, created_at REAL, expires_at REAL, last_used REAL, hits INTEGER DEFAULT 0)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_lru ON llm_cache(last_used)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_task ON llm_cache(task, created_at)")
+
+    def cacheable(self, task):
+        return self.mode != "on" or self.ttls.get(task, 0) > 0
+
+    def key(self, model, messages, temperature, task):
+        if self.mode != "on": messages = [dict(m, content=_DATE.sub("<date>", m.get("content") or "")) for m in messages]
+        raw = json.dumps([model, messages, temperature, task], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key, task):
+        """命中返回响应文本，否则 None。replay 模式下未命中改取同任务的录制结果。"""
+        if self.mode == "record": return None
+        row = self.db.query_one("SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,))
+        now = time.time()
+        if row is not None and (self.mode == "replay" or row[1] is None or row[1] > now):
+            self.stats["hits"] += 1
+            self.db.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key), wait=False)
+            return row[0]
+        if row is not None:
+            self.stats["expired"] += 1
+            self._delete(key)
+        self.stats["misses"] += 1
+        if self.mode == "replay": return self._replay_fallback(task)
+        return None
+
+    def _replay_fallback(self, task):
+        with self._lock:
+            n = self._replay_cursor.get(task, 0)
+            self._replay_cursor[task] = n + 1
+        count = self.db.query_one("SELECT COUNT(*) FROM llm_cache WHERE task = ?", (task,))[0]
+        if not count: return None
+        self.stats["replay_fallbacks"] += 1
+        return self.db.query_one("SELECT response FROM llm_cache WHERE task = ? ORDER BY created_at, key LIMIT 1 OFFSET ?", (task, n % count))[0]
+
+    def put(self, key, task, model, content, usage=None):
+        if self.mode == "replay" or not self.cacheable(task): return False
+        now = time.time()
+        ttl = self.ttls.get(task, 0)
+        expires_at = None if self.mode == "record" else now + ttl
+        nbytes = len(content.encode("utf-8")) + len(key)
+        def _run(conn):
+            old = conn.execute("SELECT nbytes FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO llm_cache (key, task, model, response, usage, nbytes, created_at, expires_at, last_used, hits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                         (key, task, model, content, json.dumps(usage) if usage else None, nbytes, now, expires_at, now))
+            return nbytes - (old[0] if old else 0)
+        delta = self.db.transaction(_run)
+        with self._lock: self.nbytes += delta
+        self.stats["stores"] += 1
+        if self.nbytes > self.max_bytes: self._evict()
+        return True
+
+    def _delete(self, key):
+        def _run(conn):
+            row = conn.execute("SELECT nbytes FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return row[0] if row else 0
+        freed = self.db.transaction(_run)
+        with self._lock: self.nbytes -= freed
+
+    def _evict(self):
+        # 过期的先删，再按 last_used 从旧到新成批删，直到回到上限以内
+        def _run(conn):
+            now = time.time()
+            freed, evicted = conn.execute("SELECT IFNULL(SUM(nbytes), 0), COUNT(*) FROM llm_cache WHERE expires_at < ?", (now,)).fetchone()
+            conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+            while self.nbytes - freed > self.max_bytes:
+                rows = conn.execute("SELECT key, nbytes FROM llm_cache ORDER BY last_used LIMIT ?", (_EVICT_BATCH,)).fetchall()
+                if not rows: break
+                victims = []
+                for key, size in rows:
+                    if self.nbytes - freed <= self.max_bytes: break
+                    victims.append((key,))
+                    freed += size
+                conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+                evicted += len(victims)
+            return freed, evicted
+        freed, evicted = self.db.transaction(_run)
+        with self._lock: self.nbytes -= freed
+        self.stats["evictions"] += evicted
+
+    def usage(self):
+        return dict(self.stats, bytes=self.nbytes)
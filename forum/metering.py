@@ -0,0 +1,139 @@
+import itertools
+import threading
+import time
+from datetime import datetime
+
+from forum.context import estimate_tokens
+
+# ==========================================
+# 计量台账：按调用记录 token 与费用，发请求前做预算检查
+# ==========================================
+# - 每次调用按 res.usage 记一行 usage_ledger（日期、任务类型、分析师、帖子、输入/输出 token、费用）
+# - 当日累计在内存里维护、锁内原子更新；启动、接管 leader 和每次多进程增量同步时从台账重新汇总
+# - 发请求前按“估算输入 + max_tokens 输出”的最坏情况预占额度，超出当日预算直接拒绝；
+#   返回后按实际用量结算并释放预占
+# - 按北京时间换日，零点后自动从 0 开始
+
+
+class Reservation:
+    __slots__ = ("id", "day", "amount", "prompt_tokens")
+
+    def __init__(self, id, day, amount, prompt_tokens):
+        self.id = id
+        self.day = day
+        self.amount = amount
+        self.prompt_tokens = prompt_tokens   # 估算值，接口没返回 usage 时用它记账
+
+
+class Meter:
+    def __init__(self, db, tz, budget, price_input, price_output, log=None):
+        """price_* 为每百万 token 的价格，与 budget 同一货币单位。"""
+        self.db = db
+        self.tz = tz
+        self.budget = budget
+        self.price_input = price_input
+        self.price_output = price_output
+        self.log = log or (lambda msg: None)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._reserved = {}     # reservation id -> amount
+        self.refresh()
+
+    def _today(self):
+        return datetime.now(self.tz).strftime("%Y-%m-%d")
+
+    def cost(self, prompt_tokens, completion_tokens):
+        return (prompt_tokens * self.price_input + completion_tokens * self.price_output) / 1_000_000
+
+    def refresh(self):
+        """从台账重新汇总当日用量（启动、接管 leader、多进程增量同步时调用）。"""
+        day = self._today()
+        # 与 settle 同锁：settle 在锁内先写台账再加内存，汇总时不会漏掉刚结算、还没落库的那笔，也不会重复计入
+        with self._lock:
+            rows = self.db.query(
+                "SELECT task, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) FROM usage_ledger WHERE day = ? GROUP BY task", (day,))
+            by_task = {r[0]: [r[1], r[2] or 0, r[3] or 0, r[4] or 0.0] for r in rows}
+            self.day = day
+            self.by_task = by_task
+            self.spent = sum(v[3] for v in by_task.values())
+
+    def _roll_day(self):
+        # 调用方需持有 self._lock
+        day = self._today()
+        if day != self.day:
+            self.day = day
+            self.by_task = {}
+            self.spent = 0.0
+
+    # --- 预占 / 结算 ---
+    def reserve(self, messages, max_tokens):
+        """预算够则返回 Reservation，否则返回 None（不要发请求）。"""
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        amount = self.cost(prompt_tokens, max_tokens)
+        with self._lock:
+            self._roll_day()
+            if self.spent + sum(self._reserved.values()) + amount > self.budget: return None
+            res = Reservation(next(self._ids), self.day, amount, prompt_tokens)
+            self._reserved[res.id] = amount
+        return res
+
+    def settle(self, res, result, task, agent_name, thread_id=None):
+        """按实际用量记账并释放预占。result 为 LLMResult；失败且没有 usage 的调用记 0。"""
+        # 合并到别人在途请求上的结果只释放预占：这次 API 调用已由发起请求的那一方记过账
+        if result.coalesced:
+            self.release(res)
+            return 0.0
+        usage = result.usage
+        if usage is None and result.ok:
+            usage = {"prompt_tokens": res.prompt_tokens, "completion_tokens": estimate_tokens(result.content or "")}
+        prompt_tokens = usage["prompt_tokens"] if usage else 0
+        completion_tokens = usage["completion_tokens"] if usage else 0
+        cost = self.cost(prompt_tokens, completion_tokens)
+        with self._lock:
+            # 等台账落库再改内存（见 refresh）；写线程批量提交，一次几毫秒
+            self.db.execute(
+                "INSERT INTO usage_ledger (ts, day, task, agent, thread_id, prompt_tokens, completion_tokens, cost, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), res.day, task, agent_name, thread_id, prompt_tokens, completion_tokens, cost, "ok" if result.ok else result.error_kind))
+            self._reserved.pop(res.id, None)
+            self._roll_day()
+            if res.day == self.day:
+                stats = self.by_task.setdefault(task, [0, 0, 0, 0.0])
+                stats[0] += 1
+                stats[1] += prompt_tokens
+                stats[2] += completion_tokens
+                stats[3] += cost
+                self.spent += cost
+        return cost
+
+    def release(self, res):
+        with self._lock:
+            self._reserved.pop(res.id, None)
+
+    # --- 查询 ---
+    def exhausted(self):
+        with self._lock:
+            self._roll_day()
+            return self.spent >= self.budget
+
+    def today(self):
+        """{"spent", "budget", "reserved", "prompt_tokens", "completion_tokens", "calls", "by_task"}"""
+        with self._lock:
+            self._roll_day()
+            by_task = {k: list(v) for k, v in self.by_task.items()}
+            return {
+                "spent": self.spent, "budget": self.budget, "reserved": sum(self._reserved.values()),
+                "calls": sum(v[0] for v in by_task.values()),
+                "prompt_tokens": sum(v[1] for v in by_task.values()),
+                "completion_tokens": sum(v[2] for v in by_task.values()),
+                "by_task": by_task,
+            }
+
+    def thread_cost(self, thread_id):
+        row = self.db.query_one("SELECT IFNULL(SUM(cost), 0), IFNULL(SUM(prompt_tokens + completion_tokens), 0) FROM usage_ledger WHERE thread_id = ?", (thread_id,))
+        return row[0], row[1]
+
+    def agent_costs(self, day=None, limit=10):
+        """[(agent, calls, tokens, cost)]，按费用降序。"""
+        return self.db.query(
+            "SELECT agent, COUNT(*), SUM(prompt_tokens + completion_tokens), SUM(cost) FROM usage_ledger WHERE day = ? GROUP BY agent ORDER BY 4 DESC LIMIT ?",
+            (day or self._today(), limit))
@@ -0,0 +1,266 @@
+import bisect
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# ==========================================
+# 热路径埋点：计时直方图 / 计数器 / 回调型 gauge
+# ==========================================
+# - 进程内一个全局 REGISTRY，observe 只是一次 bisect + 加法，开销可以忽略
+# - 导出 Prometheus 文本或 JSON：本地 HTTP 端口（/metrics、/metrics.json）或定期写文件
+# - Profiler：可选的 cProfile 模式，按次累加后 dump 成 .prof，用 snakeviz / pstats 查看；
+#   各后台线程都有固定名字，py-spy dump/record 时能直接认出来
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _fmt_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items: return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最后一格是 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max: self.max = value
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def quantile(self, q):
+        """按桶线性插值估算分位数。"""
+        with self._lock:
+            counts, total, top = list(self.counts), self.count, self.max
+        if not total: return 0.0
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if seen + c >= rank and c:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else top
+                return min(top, lo + (hi - lo) * (rank - seen) / c)
+            seen += c
+        return top
+
+    def snapshot(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "avg": self.sum / self.count if self.count else 0.0,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99), "max": self.max}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}   # name -> {"type", "help", "children": {label_key: metric}}
+        self._gauges = {}    # name -> (help, fn)；fn() 返回数值或 {key: 数值}
+
+    def _child(self, kind, factory, name, help, labels):
+        key = _label_key(labels)
+        family = self._metrics.get(name)
+        if family is None:
+            with self._lock:
+                family = self._metrics.setdefault(name, {"type": kind, "help": help, "children": {}})
+        child = family["children"].get(key)
+        if child is None:
+            with self._lock:
+                child = family["children"].setdefault(key, factory())
+        return child
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._child("histogram", lambda: Histogram(buckets), name, help, labels)
+
+    def counter(self, name, help="", **labels):
+        return self._child("counter", Counter, name, help, labels)
+
+    def gauge(self, name, fn, help=""):
+        """回调型 gauge，导出时才取值，热路径上零开销。"""
+        self._gauges[name] = (help, fn)
+
+    def timed(self, name, help="", **labels):
+        """装饰器：每次调用耗时记入 name 直方图。"""
+        def deco(fn):
+            hist = self.histogram(name, help, **labels)
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    hist.observe(time.perf_counter() - t0)
+            return wrapper
+        return deco
+
+    def _gauge_values(self):
+        for name, (help, fn) in list(self._gauges.items()):
+            try:
+                yield name, help, fn()
+            except Exception:
+                continue
+
+    # --- 导出 ---
+    def to_json(self):
+        out = {}
+        for name, family in list(self._metrics.items()):
+            rows = []
+            for key, m in list(family["children"].items()):
+                data = m.snapshot() if isinstance(m, Histogram) else {"value": m.value}
+                rows.append(dict(labels=dict(key), **data))
+            out[name] = {"type": family["type"], "series": rows}
+        for name, help, value in self._gauge_values():
+            out[name] = {"type": "gauge", "value": value}
+        return out
+
+    def to_prometheus(self):
+        lines = []
+        for name, family in sorted(self._metrics.items()):
+            if family["help"]: lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, m in sorted(family["children"].items()):
+                if isinstance(m, Histogram):
+                    with m._lock:
+                        counts, count, total = list(m.counts), m.count, m.sum
+                    cum = 0
+                    for bound, c in zip(list(m.buckets) + ["+Inf"], counts):
+                        cum += c
+                        lines.append(f"{name}_bucket{_fmt_labels(key, [('le', bound)])} {cum}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {total}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {count}")
+                else:
+                    lines.append(f"{name}{_fmt_labels(key)} {m.value}")
+        for name, help, value in self._gauge_values():
+            if help: lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                # 只导出数值项，字符串之类的状态字段 Prometheus 解析不了
+                for label, v in sorted(value.items()):
+                    if isinstance(v, (int, float)): lines.append(f'{name}{{key="{label}"}} {v}')
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """写 JSON（.json）或 Prometheus 文本（其他后缀），先写临时文件再改名，读取方不会读到半截。"""
+        body = json.dumps(self.to_json(), ensure_ascii=False, indent=1) if path.endswith(".json") else self.to_prometheus()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+
+
+def _make_handler(registry):
+    # http.server 只在真正开端口时才导入，不拖慢冷启动
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(registry.to_json(), ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+            elif self.path.startswith("/metrics"):
+                body, ctype = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return MetricsHandler
+
+
+def serve(port, host="127.0.0.1", registry=REGISTRY):
+    """在后台线程里起 /metrics 与 /metrics.json，返回 server；端口被占用时抛 OSError。"""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _make_handler(registry))
+    threading.Thread(target=server.serve_forever, name="Metrics_HTTP", daemon=True).start()
+    return server
+
+
+class Profiler:
+    """可选的 cProfile：start/stop 之间的代码累加到同一份统计，每 dump_every 次写一次 .prof。
+
+    同一时间只有一个线程在采样。Streamlit 脚本可能被 st.rerun / st.stop 打断而走不到 stop()，
+    所以下一次 start() 时如果持有者是当前线程就接着采样，持有者线程已退出就直接接管。
+    """
+
+    def __init__(self, path, dump_every=20):
+        self.path = path
+        self.dump_every = dump_every
+        self._prof = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._owner = None
+        self._runs = 0
+
+    def start(self):
+        """开始采样；返回 False 表示别的线程正在采样，本次跳过。"""
+        me = threading.current_thread()
+        with self._lock:
+            if self._owner is me: return True
+            if self._owner is not None:
+                if self._owner.is_alive(): return False
+                self._prof.disable()
+            self._owner = me
+            self._prof.enable()
+        return True
+
+    def stop(self):
+        with self._lock:
+            if self._owner is not threading.current_thread(): return
+            self._prof.disable()
+            self._owner = None
+            self._runs += 1
+            if self._runs % self.dump_every == 0: self._prof.dump_stats(self.path)
+
+    @contextmanager
+    def profile(self):
+        started = self.start()
+        try:
+            yield
+        finally:
+            if started: self.stop()
+
+    def dump(self):
+        with self._lock:
+            if self._owner is None: self._prof.dump_stats(self.path)
@@ -0,0 +1,441 @@
+import json
+import re
+import time
+import zlib
+
+from forum.schema import ARCHIVE_FTS_SHIFT, BIGRAM_BACKFILL, FTS_BACKFILL, index_archived, unindex_archived
+from forum.store import Thread, Comment
+
+# ==========================================
+# 业务 SQL：公民 / 帖子 / 评论
+# ==========================================
+
+HISTORY_LIMIT = 100
+
+# 批量导入/导出的列顺序（bulk_* 接收的元组与 iter_rows 产出的元组都按这个顺序）
+CITIZEN_COLUMNS = ("name", "job", "avatar", "prompt", "is_custom")
+THREAD_COLUMNS = ("id", "title", "content", "image_url", "author_name", "author_avatar", "author_job", "created_at", "timestamp", "reviewed_at")
+COMMENT_COLUMNS = ("thread_id", "author_name", "author_avatar", "author_job", "content", "created_at")
+TABLE_COLUMNS = {"citizens": CITIZEN_COLUMNS, "threads": THREAD_COLUMNS, "comments": COMMENT_COLUMNS}
+EXPORT_ORDER = {"citizens": "id", "threads": "timestamp, rowid", "comments": "id"}
+
+# 一次查询取回最近 N 个帖子及其全部评论：子查询走 idx_threads_timestamp，
+# LEFT JOIN 走 idx_comments_thread，没有评论的帖子也会返回一行（评论列为 NULL）
+HISTORY_SQL = """
+WITH recent AS (
+    SELECT id, title, content, image_url, author_name, author_avatar, author_job, created_at, timestamp
+    FROM threads ORDER BY timestamp DESC LIMIT ?
+)
+SELECT r.id, r.title, r.content, r.image_url, r.author_name, r.author_avatar, r.author_job, r.created_at, r.timestamp,
+       c.id, c.author_name, c.author_avatar, c.author_job, c.content, c.created_at
+FROM recent r LEFT JOIN comments c ON c.thread_id = r.id
+ORDER BY r.timestamp DESC, r.id, c.id
+"""
+
+# 只取帖子头与评论条数（冷帖）：条数走 idx_comments_thread 覆盖索引，不读评论正文
+HEADERS_SQL = """
+SELECT t.id, t.title, t.content, t.image_url, t.author_name, t.author_avatar, t.author_job, t.created_at, t.timestamp,
+       (SELECT COUNT(*) FROM comments c WHERE c.thread_id = t.id)
+FROM threads t ORDER BY t.timestamp DESC LIMIT ?
+"""
+
+
+def add_citizen(db, name, job, avatar, prompt, is_custom=False):
+    db.execute("INSERT INTO citizens (name, job, avatar, prompt, is_custom) VALUES (?, ?, ?, ?, ?)", (name, job, avatar, prompt, is_custom))
+
+
+def get_all_citizens(db):
+    rows = db.query("SELECT id, name, job, avatar, prompt, is_custom FROM citizens")
+    return [{"db_id": r[0], "name": r[1], "job": r[2], "avatar": r[3], "prompt": r[4], "is_custom": bool(r[5])} for r in rows]
+
+
+def iter_citizens(db, batch=5000):
+    """流式产出 (id, name, job, avatar, prompt, is_custom)，人设 prompt 用完即弃，不整表驻留内存。"""
+    with db.read() as conn:
+        cursor = conn.execute("SELECT id, name, job, avatar, prompt, is_custom FROM citizens ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows: return
+            yield from rows
+
+
+def save_thread(db, thread):
+    return db.execute("INSERT INTO threads (id, title, content, image_url, author_name, author_avatar, author_job, created_at, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (thread.id, thread.title, thread.content, thread.image_url, thread.author, thread.avatar, thread.job, thread.time, time.time()))
+
+
+def save_comment(db, thread_id, comment):
+    return db.execute("INSERT INTO comments (thread_id, author_name, author_avatar, author_job, content, created_at) VALUES (?, ?, ?, ?, ?, ?)", (thread_id, comment.name, comment.avatar, comment.job, comment.content, comment.time))
+
+
+# --- 批量写：一次 executemany、一个事务、一次提交 ---
+# rows 可以是生成器，在写线程里边读边插，百万行也不用先全部放进内存
+
+def _insert_sql(table, verb="INSERT"):
+    columns = TABLE_COLUMNS[table]
+    return f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def _bulk_insert(db, table, rows, verb="INSERT", rebuild_indexes=False):
+    sql = _insert_sql(table, verb)
+    if not rebuild_indexes: return db.executemany(sql, rows)
+
+    def _run(conn):
+        # 大批量导入：先删掉二级索引和全文索引触发器，插完再整体重建索引、一次性把新行补进 FTS
+        # （排序建索引、批量写 FTS 都比逐行维护快得多），同一事务内完成
+        objects = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL", (table,)).fetchall()
+        watermark = conn.execute(f"SELECT IFNULL(MAX(rowid), 0) FROM {table}").fetchone()[0]
+        for kind, name, _ in objects: conn.execute(f"DROP {kind.upper()} {name}")
+        count = conn.executemany(sql, rows).rowcount
+        if table in FTS_BACKFILL: conn.execute(FTS_BACKFILL[table], (watermark,))
+        if table in BIGRAM_BACKFILL: conn.execute(BIGRAM_BACKFILL[table], (watermark,))
+        for _, _, create_sql in objects: conn.execute(create_sql)
+        return count
+    return db.transaction(_run)
+
+
+def bulk_add_citizens(db, rows, rebuild_indexes=False):
+    return _bulk_insert(db, "citizens", rows, rebuild_indexes=rebuild_indexes)
+
+
+def bulk_save_threads(db, rows, rebuild_indexes=False):
+    # 帖子 id 是主键，重复导入同一份归档时跳过已存在的
+    return _bulk_insert(db, "threads", rows, "INSERT OR IGNORE", rebuild_indexes)
+
+
+def bulk_save_comments(db, rows, rebuild_indexes=False):
+    return _bulk_insert(db, "comments", rows, rebuild_indexes=rebuild_indexes)
+
+
+def iter_rows(db, table, batch=5000):
+    """按 TABLE_COLUMNS 的列顺序流式读出整张表，fetchmany 分批，不一次性载入。帖子与评论先产出已归档的老数据。"""
+    if table in ("threads", "comments"): yield from iter_archived(db, table, batch)
+    sql = f"SELECT {', '.join(TABLE_COLUMNS[table])} FROM {table} ORDER BY {EXPORT_ORDER[table]}"
+    with db.read() as conn:
+        cursor = conn.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows: return
+            yield from rows
+
+
+# --- 全文检索 ---
+# snippet 高亮用控制字符做标记，界面层转义后再换成 <mark>，避免正文里的尖括号被当成标签
+MARK_OPEN, MARK_CLOSE = "\x02", "\x03"
+SEARCH_MIN_TERM = 3        # trigram 只能索引 >= 3 个字的词，两个汉字的词走 *_bigrams，其余短词退回 LIKE
+SEARCH_LIKE_WINDOW = 50000 # 全是走不了索引的短词（单字、英文缩写）时，只 LIKE 扫最近这么多条帖子/评论
+SEARCH_CANDIDATES = 2000   # 只在最近这么多条命中里按相关度排序，常见词在百万级库上也是毫秒级
+SNIPPET_TOKENS = 24
+
+# 帖子已归档、评论还在 comments 里（归档后才写入的评论）时，帖子标题和时间戳回 archive 取
+_COMMENT_THREAD_JOIN = "LEFT JOIN threads t ON t.id = c.thread_id LEFT JOIN archive a ON t.id IS NULL AND a.id = c.thread_id"
+_COMMENT_THREAD_COLUMNS = "IFNULL(t.title, a.title), c.author_name, c.created_at, IFNULL(t.timestamp, a.timestamp)"
+_ARCHIVE_JOIN = f"JOIN archive a ON a.rowid = f.rowid >> {ARCHIVE_FTS_SHIFT}"
+_ARCHIVE_KIND = f"CASE WHEN f.rowid & {(1 << ARCHIVE_FTS_SHIFT) - 1} THEN 'comment' ELSE 'thread' END"
+
+# 每张 FTS 表：(bm25 表达式, 短词过滤列, 回表取详情的 SQL)；详情列依次为
+# rowid, thread_id, 帖子标题, 作者, 发帖/评论时间, 帖子时间戳, snippet, kind
+_FTS_TABLES = {
+    "threads_fts": ("bm25(threads_fts, 0.0, 5.0, 1.0)", ("title", "content"), f"""
+        SELECT f.rowid, f.thread_id, t.title, t.author_name, t.created_at, t.timestamp, snippet(threads_fts, -1, ?, ?, '…', {SNIPPET_TOKENS}), 'thread'
+        FROM threads_fts f JOIN threads t ON t.id = f.thread_id WHERE threads_fts MATCH ? AND f.rowid IN ({{}})"""),
+    "comments_fts": ("bm25(comments_fts)", ("content",), f"""
+        SELECT f.rowid, c.thread_id, {_COMMENT_THREAD_COLUMNS}, snippet(comments_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}), 'comment'
+        FROM comments_fts f JOIN comments c ON c.id = f.rowid {_COMMENT_THREAD_JOIN}
+        WHERE comments_fts MATCH ? AND f.rowid IN ({{}}) AND IFNULL(t.id, a.id) IS NOT NULL"""),
+    "archive_fts": ("bm25(archive_fts, 0.0, 0.0, 5.0, 1.0)", ("title", "content"), f"""
+        SELECT f.rowid, a.id, a.title, f.author, f.created_at, a.timestamp, snippet(archive_fts, -1, ?, ?, '…', {SNIPPET_TOKENS}), {_ARCHIVE_KIND}
+        FROM archive_fts f {_ARCHIVE_JOIN} WHERE archive_fts MATCH ? AND f.rowid IN ({{}})"""),
+}
+
+_BIGRAM_TERM = re.compile(r"[\u4e00-\u9fff]{2}")
+
+# 全是短词时每张表的取数 SQL：(走二元组索引, 只扫最近 SEARCH_LIKE_WINDOW 行, LIKE 过滤列)，{} 处拼 LIKE 条件；
+# 列依次为 thread_id, 帖子标题, 作者, 时间, 帖子时间戳, 正文, kind, 排序分。归档内容都早于最近窗口，只走索引
+_SHORT_SQL = {
+    "threads": ("""SELECT t.id, t.title, t.author_name, t.created_at, t.timestamp, t.content, 'thread', -t.timestamp
+                   FROM threads_bigrams b JOIN threads t ON t.rowid = b.rowid WHERE threads_bigrams MATCH ?{} ORDER BY b.rowid DESC LIMIT ?""",
+                """SELECT t.id, t.title, t.author_name, t.created_at, t.timestamp, t.content, 'thread', -t.timestamp
+                   FROM threads t WHERE t.rowid > (SELECT IFNULL(MAX(rowid), 0) FROM threads) - ?{} ORDER BY t.rowid DESC LIMIT ?""",
+                ("t.title", "t.content")),
+    "comments": (f"""SELECT c.thread_id, {_COMMENT_THREAD_COLUMNS}, c.content, 'comment', -IFNULL(t.timestamp, a.timestamp)
+                     FROM comments_bigrams b JOIN comments c ON c.id = b.rowid {_COMMENT_THREAD_JOIN}
+                     WHERE comments_bigrams MATCH ? AND IFNULL(t.id, a.id) IS NOT NULL{{}} ORDER BY b.rowid DESC LIMIT ?""",
+                 f"""SELECT c.thread_id, {_COMMENT_THREAD_COLUMNS}, c.content, 'comment', -IFNULL(t.timestamp, a.timestamp)
+                     FROM comments c {_COMMENT_THREAD_JOIN}
+                     WHERE c.id > (SELECT IFNULL(MAX(id), 0) FROM comments) - ? AND IFNULL(t.id, a.id) IS NOT NULL{{}} ORDER BY c.id DESC LIMIT ?""",
+                 ("c.content",)),
+    "archive": (f"""SELECT a.id, a.title, f.author, f.created_at, a.timestamp, f.content, {_ARCHIVE_KIND}, -a.timestamp
+                    FROM archive_bigrams b JOIN archive_fts f ON f.rowid = b.rowid {_ARCHIVE_JOIN}
+                    WHERE archive_bigrams MATCH ?{{}} ORDER BY b.rowid DESC LIMIT ?""",
+                None,
+                ("f.title", "f.content")),
+}
+
+
+def like_only_terms(text):
+    """检索词里既没有 >= 3 个字的词、也没有两字汉语词时返回这些短词，此时只查最近 SEARCH_LIKE_WINDOW 条。"""
+    terms = text.split()
+    if any(len(t) >= SEARCH_MIN_TERM or _BIGRAM_TERM.fullmatch(t) for t in terms): return []
+    return terms
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _like_clause(columns):
+    return "(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns) + ")"
+
+
+def _like_snippet(text, terms, width=40, fallback=None):
+    """LIKE 命中没有 FTS 的 snippet()，自己截一段并加标记；正文里一个词都没有时改截 fallback（帖子标题）。"""
+    text = text or ""
+    if fallback and not any(t in text for t in terms): text = fallback
+    pos = min((p for p in (text.find(t) for t in terms) if p >= 0), default=0)
+    start = max(0, pos - width // 2)
+    piece = text[start:start + width]
+    for t in terms: piece = piece.replace(t, MARK_OPEN + t + MARK_CLOSE)
+    return ("…" if start else "") + piece + ("…" if start + width < len(text) else "")
+
+
+def _fts_hits(db, table, match, likes, n):
+    score_expr, like_columns, detail_sql = _FTS_TABLES[table]
+    # 第一步：沿 rowid 倒序取最近的候选并只算 bm25；第二步只给最终的 n 条取 snippet 和帖子信息
+    like_filter = "".join(" AND " + _like_clause(like_columns) for _ in likes)
+    ranked = db.query(
+        f"""SELECT rowid, score FROM (SELECT rowid, {score_expr} AS score FROM {table} WHERE {table} MATCH ?{like_filter} ORDER BY rowid DESC LIMIT ?)
+            ORDER BY score LIMIT ?""",
+        (match, *[p for p in likes for _ in like_columns], SEARCH_CANDIDATES, n))
+    if not ranked: return []
+    details = {r[0]: r[1:] for r in db.query(detail_sql.format(", ".join("?" * len(ranked))), (MARK_OPEN, MARK_CLOSE, match, *[r[0] for r in ranked]))}
+    return [details[rowid] + (score,) for rowid, score in ranked if rowid in details]
+
+
+def _short_hits(db, table, bigrams, short_terms, n):
+    # 按 rowid 倒序拿够 n 条即停；两字词在索引里 MATCH，其余短词作为 LIKE 附加过滤
+    indexed_sql, window_sql, like_columns = _SHORT_SQL[table]
+    sql = indexed_sql if bigrams else window_sql
+    if sql is None: return []
+    likes = [_like_pattern(t) for t in short_terms if t not in bigrams]
+    key = " ".join(_fts_phrase(t) for t in bigrams) if bigrams else SEARCH_LIKE_WINDOW
+    rows = db.query(sql.format("".join(" AND " + _like_clause(like_columns) for _ in likes)), (key, *[p for p in likes for _ in like_columns], n))
+    return [r[:5] + (_like_snippet(r[5], short_terms, fallback=r[1] if r[6] == "thread" else None),) + r[6:] for r in rows]
+
+
+def search(db, text, limit=10, offset=0):
+    """按相关度检索帖子与评论，返回命中列表（每条一个 dict）；多个词之间是 AND。
+
+    >= 3 个字的词走 FTS5 MATCH，在最近 SEARCH_CANDIDATES 条命中里按 bm25 排序，更短的词作为 LIKE 附加过滤；
+    全部是短词时按时间倒序拿够即停：有两字汉语词就走二元组索引，否则只扫最近 SEARCH_LIKE_WINDOW 条。
+    帖子、评论、归档三处各取 offset+limit 条再归并。
+    """
+    terms = text.split()
+    if not terms: return []
+    long_terms = [t for t in terms if len(t) >= SEARCH_MIN_TERM]
+    short_terms = [t for t in terms if len(t) < SEARCH_MIN_TERM]
+    n = offset + limit
+    likes = [_like_pattern(t) for t in short_terms]
+
+    if long_terms:
+        match = " ".join(_fts_phrase(t) for t in long_terms)
+        rows = [r for table in _FTS_TABLES for r in _fts_hits(db, table, match, likes, n)]
+    else:
+        bigrams = [t for t in short_terms if _BIGRAM_TERM.fullmatch(t)]
+        rows = [r for table in _SHORT_SQL for r in _short_hits(db, table, bigrams, short_terms, n)]
+
+    hits = [{"thread_id": r[0], "title": r[1], "author": r[2], "time": r[3], "timestamp": r[4], "snippet": r[5], "kind": r[6], "score": r[7]} for r in rows]
+    hits.sort(key=lambda h: h["score"])
+    return hits[offset:offset + limit]
+
+
+def load_history(db, limit=HISTORY_LIMIT):
+    return _build_history(db.query(HISTORY_SQL, (limit,)))
+
+
+def load_history_snapshot(db, limit=HISTORY_LIMIT, hot=None):
+    """在同一个读事务里取历史和增量同步水位 (threads 最大 rowid, comments 最大 id)，两者一致。
+    只有最新的 hot 个帖子带评论，其余为只有评论条数的冷帖。"""
+    hot = limit if hot is None else min(hot, limit)
+    with db.read() as conn:
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(HEADERS_SQL, (limit,)).fetchall()
+            hot_ids = [r[0] for r in rows[:hot]]
+            comment_rows = conn.execute(f"SELECT thread_id, author_name, author_avatar, author_job, content, created_at FROM comments WHERE thread_id IN ({', '.join('?' * len(hot_ids))}) ORDER BY id", hot_ids).fetchall() if hot_ids else []
+            marks = conn.execute("SELECT (SELECT IFNULL(MAX(rowid), 0) FROM threads), (SELECT IFNULL(MAX(id), 0) FROM comments)").fetchone()
+        finally:
+            conn.execute("COMMIT")
+    threads = [Thread(r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], float(r[8]) if r[8] is not None else time.time(), comment_count=None if i < hot else r[9])
+               for i, r in enumerate(rows)]
+    by_id = {t.id: t for t in threads[:hot]}
+    for r in comment_rows: by_id[r[0]].comments.append(Comment(r[1], r[2], r[3], r[4], r[5]))
+    return threads, tuple(marks)
+
+
+def load_changes(db, thread_rowid, comment_id):
+    """水位之后其他进程写入的帖子与评论：([(rowid, Thread)], [(id, thread_id, Comment)])。"""
+    thread_rows = db.query("SELECT rowid, id, title, content, image_url, author_name, author_avatar, author_job, created_at, timestamp FROM threads WHERE rowid > ? ORDER BY rowid", (thread_rowid,))
+    comment_rows = db.query("SELECT id, thread_id, author_name, author_avatar, author_job, content, created_at FROM comments WHERE id > ? ORDER BY id", (comment_id,))
+    threads = [(r[0], Thread(r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], float(r[9]) if r[9] is not None else time.time())) for r in thread_rows]
+    comments = [(r[0], r[1], Comment(r[2], r[3], r[4], r[5], r[6])) for r in comment_rows]
+    return threads, comments
+
+
+def _build_history(rows):
+    threads = []
+    current = None
+    for r in rows:
+        if current is None or current.id != r[0]:
+            ts = float(r[8]) if r[8] is not None else time.time()
+            current = Thread(r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], ts)
+            threads.append(current)
+        if r[9] is not None:
+            current.comments.append(Comment(r[10], r[11], r[12], r[13], r[14]))
+    return threads
+
+
+def load_thread(db, thread_id):
+    rows = db.query("""SELECT t.id, t.title, t.content, t.image_url, t.author_name, t.author_avatar, t.author_job, t.created_at, t.timestamp,
+                              c.id, c.author_name, c.author_avatar, c.author_job, c.content, c.created_at
+                       FROM threads t LEFT JOIN comments c ON c.thread_id = t.id
+                       WHERE t.id = ? ORDER BY c.id""", (thread_id,))
+    if not rows: return _with_live_comments(db, load_archived(db, thread_id))
+    r = rows[0]
+    thread = Thread(r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], float(r[8]) if r[8] is not None else time.time())
+    thread.comments = [Comment(r[10], r[11], r[12], r[13], r[14]) for r in rows if r[9] is not None]
+    return thread
+
+
+def _live_comments(db, thread_id):
+    rows = db.query("SELECT author_name, author_avatar, author_job, content, created_at FROM comments WHERE thread_id = ? ORDER BY id", (thread_id,))
+    return [Comment(r[0], r[1], r[2], r[3], r[4]) for r in rows]
+
+
+def _with_live_comments(db, archived):
+    # 归档之后才写进来的评论（比如归档前已发出的复盘）还在 comments 表里，接在压缩包里的评论后面
+    if archived is not None: archived.comments += _live_comments(db, archived.id)
+    return archived
+
+
+def load_comments(db, thread_id):
+    """冷帖打开时按需读取评论；已归档的帖子从压缩包里解出来，再接上归档后新写入的评论。"""
+    archived = load_archived(db, thread_id)
+    if archived is None: return _live_comments(db, thread_id)
+    return _with_live_comments(db, archived).comments
+
+
+# --- 冷存储归档 ---
+# payload = zlib(JSON {"thread": THREAD_COLUMNS 行, "comments": [COMMENT_COLUMNS 行]})，导出时原样还原成两张表的行
+
+def _pack(thread_row, comment_rows):
+    return zlib.compress(json.dumps({"thread": thread_row, "comments": comment_rows}, ensure_ascii=False).encode("utf-8"))
+
+
+def _unpack(payload):
+    data = json.loads(zlib.decompress(payload))
+    return data["thread"], data["comments"]
+
+
+def archive_threads(db, cutoff, batch=200):
+    """把 timestamp 早于 cutoff 的最老 batch 个帖子连同评论压进 archive 表，并从 threads/comments 删除。
+    还没做 T+5 复盘的跳过，等复盘写完再归档。一批一个事务：触发器清掉 *_fts/*_bigrams 里的行，
+    同时写进 archive_fts/archive_bigrams，归档后照样搜得到。返回本批归档的帖子数。"""
+    thread_sql = f"SELECT {', '.join(THREAD_COLUMNS)} FROM threads WHERE timestamp < ? AND reviewed_at IS NOT NULL ORDER BY timestamp LIMIT ?"
+    comment_sql = f"SELECT {', '.join(COMMENT_COLUMNS)} FROM comments WHERE thread_id = ? ORDER BY id"
+    def _run(conn):
+        rows = conn.execute(thread_sql, (cutoff, batch)).fetchall()
+        now = time.time()
+        for row in rows:
+            comments = conn.execute(comment_sql, (row[0],)).fetchall()
+            # 导入后再次归档的帖子：先删掉上一份归档的索引
+            old = conn.execute("SELECT rowid FROM archive WHERE id = ?", (row[0],)).fetchone()
+            if old: unindex_archived(conn, old[0])
+            archive_rowid = conn.execute("INSERT OR REPLACE INTO archive (id, title, author_name, author_avatar, author_job, created_at, timestamp, comment_count, archived_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                         (row[0], row[1], row[4], row[5], row[6], row[7], row[8], len(comments), now, _pack(row, comments))).lastrowid
+            index_archived(conn, archive_rowid, row, comments)
+            conn.execute("DELETE FROM comments WHERE thread_id = ?", (row[0],))
+            conn.execute("DELETE FROM threads WHERE id = ?", (row[0],))
+        return len(rows)
+    return db.transaction(_run)
+
+
+def load_archived(db, thread_id):
+    row = db.query_one("SELECT payload FROM archive WHERE id = ?", (thread_id,))
+    if row is None: return None
+    t, comments = _unpack(row[0])
+    thread = Thread(t[0], t[1], t[2], t[3], t[4], t[5], t[6], t[7], t[8] if t[8] is not None else time.time())
+    thread.comments = [Comment(c[1], c[2], c[3], c[4], c[5]) for c in comments]
+    return thread
+
+
+def iter_archived(db, table, batch=500):
+    """把归档包还原成 threads 或 comments 的行（TABLE_COLUMNS 顺序），按帖子时间从老到新。"""
+    with db.read() as conn:
+        cursor = conn.execute("SELECT payload FROM archive ORDER BY timestamp, id")
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows: return
+            for (payload,) in rows:
+                thread_row, comment_rows = _unpack(payload)
+                if table == "threads": yield tuple(thread_row)
+                else: yield from (tuple(c) for c in comment_rows)
+
+
+def archive_stats(db):
+    """(归档帖子数, 评论数, 压缩包总字节数)。"""
+    return db.query_one("SELECT COUNT(*), IFNULL(SUM(comment_count), 0), IFNULL(SUM(LENGTH(payload)), 0) FROM archive")
+
+
+def load_unreviewed(db, limit=HISTORY_LIMIT):
+    """最近 limit 个帖子里还没做 T+5 复盘的 (id, timestamp)。"""
+    return db.query("SELECT id, timestamp FROM threads WHERE reviewed_at IS NULL AND id IN (SELECT id FROM threads ORDER BY timestamp DESC LIMIT ?)", (limit,))
+
+
+def save_draft(db, thread_id, live, wait=True):
+    return db.execute(
+        """INSERT INTO drafts (thread_id, author_name, author_avatar, author_job, content, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(thread_id) DO UPDATE SET author_name = excluded.author_name, author_avatar = excluded.author_avatar,
+           author_job = excluded.author_job, content = excluded.content, created_at = excluded.created_at, updated_at = excluded.updated_at""",
+        (thread_id, live.name, live.avatar, live.job, live.text, live.time, time.time()), wait=wait)
+
+
+def load_draft(db, thread_id):
+    """(name, avatar, job, time, content) 或 None。"""
+    return db.query_one("SELECT author_name, author_avatar, author_job, created_at, content FROM drafts WHERE thread_id = ?", (thread_id,))
+
+
+def delete_draft(db, thread_id, wait=True):
+    return db.execute("DELETE FROM drafts WHERE thread_id = ?", (thread_id,), wait=wait)
+
+
+def clear_drafts(db):
+    # 上次进程中途退出留下的草稿
+    return db.execute("DELETE FROM drafts")
+
+
+def mark_reviewed(db, thread_id, reviewed_at=None):
+    db.execute("UPDATE threads SET reviewed_at = ?, review_claimed_at = NULL WHERE id = ?", (reviewed_at or time.time(), thread_id))
+
+
+def claim_reviews(db, thread_ids, ttl):
+    """调 LLM 前在库里认领：未复盘、且没有 ttl 秒内的认领才成功，新旧 leader 交接时不会重复复盘。
+    返回 (认领到的 id, 正被别处认领着的 id)；已复盘或已归档的两边都不在。认领过期自动作废，崩溃的进程不会把帖子卡死。"""
+    now = time.time()
+    def _do(conn):
+        claimed, busy = [], []
+        for t_id in thread_ids:
+            cur = conn.execute("UPDATE threads SET review_claimed_at = ? WHERE id = ? AND reviewed_at IS NULL AND (review_claimed_at IS NULL OR review_claimed_at < ?)",
+                               (now, t_id, now - ttl))
+            if cur.rowcount == 1: claimed.append(t_id)
+            elif conn.execute("SELECT 1 FROM threads WHERE id = ? AND reviewed_at IS NULL", (t_id,)).fetchone(): busy.append(t_id)
+        return claimed, busy
+    return db.transaction(_do)
+
+
+def release_review(db, thread_id):
+    # 复盘失败，交还认领，稍后重试
+    db.execute("UPDATE threads SET review_claimed_at = NULL WHERE id = ?", (thread_id,))
@@ -0,0 +1,48 @@
+import threading
+import time
+
+# ==========================================
+# 令牌桶限流（DeepSeek API 调用共用）
+# ==========================================
+
+
+class TokenBucket:
+    """rate 个令牌/秒，最多攒 capacity 个。acquire 阻塞直到拿到令牌或超时。"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._cond:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None, cancel_event=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: return False
+                    wait = min(wait, remaining)
+                if cancel_event is not None:
+                    if cancel_event.is_set(): return False
+                    wait = min(wait, 0.5)
+                self._cond.wait(wait)
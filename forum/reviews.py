@@ -0,0 +1,50 @@
+import heapq
+import threading
+import time
+
+# ==========================================
+# T+5 复盘队列：按到期时间排序的小顶堆
+# ==========================================
+# 启动时从 threads.reviewed_at 台账里载入一次未复盘的帖子，之后只在发帖时 push。
+# 后台循环每次只 pop 已到期的条目：不扫全表、不查库、不占 STORE.lock。
+
+REVIEW_DELAY = 5 * 24 * 3600
+RETRY_DELAY = 10 * 60
+
+
+class ReviewQueue:
+    def __init__(self, delay=REVIEW_DELAY):
+        self.delay = delay
+        self._heap = []          # (due_ts, thread_id)
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def push(self, thread_id, timestamp):
+        """按发帖时间入队，到期时间 = timestamp + delay。"""
+        self._push_at(thread_id, timestamp + self.delay)
+
+    def retry(self, thread_id, after=RETRY_DELAY):
+        self._push_at(thread_id, time.time() + after)
+
+    def _push_at(self, thread_id, due):
+        with self._lock:
+            if thread_id in self._queued: return
+            self._queued.add(thread_id)
+            heapq.heappush(self._heap, (due, thread_id))
+
+    def pop_due(self, now=None, limit=None):
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+                _, thread_id = heapq.heappop(self._heap)
+                self._queued.discard(thread_id)
+                due.append(thread_id)
+        return due
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        return len(self._heap)
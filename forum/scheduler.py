@@ -0,0 +1,233 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+# ==========================================
+# 事件驱动的任务调度器
+# ==========================================
+# - cron 风格定时（分 时 日 月 周），按指定时区计算下一次触发时间
+# - 线程直接睡到最近一个任务到期，没有固定间隔轮询
+# - 每个定时任务的上一次触发时刻存在 job_runs 表里，运行前先在库里“认领”该时刻，
+#   重启或多进程都不会重复发帖
+# - 错过的触发按 catchup 策略处理：
+#     skip   —— 只补 grace 秒内刚错过的那一次（默认，等价于原来 09:15~09:30 的窗口）
+#     latest —— 不管错过多久，补最近的一次
+#     all    —— 逐个补齐所有错过的触发
+
+CATCHUP_SKIP = "skip"
+CATCHUP_LATEST = "latest"
+CATCHUP_ALL = "all"
+
+MAX_SLEEP = 3600           # 最长睡一小时，防止系统时间跳变后睡过头
+LOOKBACK = 31 * 24 * 3600  # 计算“最近一次错过的触发”时最多往回看 31 天
+
+
+def _parse_field(field, lo, hi):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_s = part.split("/", 1)
+            step = int(step_s)
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start_s, end_s = part.split("-", 1)
+            start, end = int(start_s), int(end_s)
+        else:
+            start = end = int(part)
+            if step > 1: end = hi
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"cron 字段越界: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSpec:
+    """五段式 cron：'分 时 日 月 周'，周 0=周日。"""
+
+    def __init__(self, expr, tz):
+        parts = expr.split()
+        if len(parts) != 5: raise ValueError(f"cron 表达式必须是 5 段: {expr!r}")
+        self.expr = expr
+        self.tz = tz
+        self.minutes = _parse_field(parts[0], 0, 59)
+        self.hours = _parse_field(parts[1], 0, 23)
+        self.days = _parse_field(parts[2], 1, 31)
+        self.months = _parse_field(parts[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_field(parts[4], 0, 7)}
+        self._any_day = parts[2] == "*"
+        self._any_weekday = parts[4] == "*"
+
+    def _day_matches(self, dt):
+        dom = dt.day in self.days
+        dow = (dt.isoweekday() % 7) in self.weekdays
+        if self._any_day: return dow
+        if self._any_weekday: return dom
+        return dom or dow  # 与 cron 一致：日、周都指定时满足其一即可
+
+    def next_after(self, ts):
+        """严格晚于 ts 的下一次触发时间（时间戳）。"""
+        dt = datetime.fromtimestamp(ts, self.tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(100000):
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt.timestamp()
+        raise ValueError(f"cron 表达式永远不会触发: {self.expr!r}")
+
+    def latest_at_or_before(self, ts, since):
+        """(since, ts] 区间内最后一次触发时间，没有则返回 None。"""
+        latest = None
+        fire = self.next_after(max(since, ts - LOOKBACK))
+        while fire <= ts:
+            latest = fire
+            fire = self.next_after(fire)
+        return latest
+
+
+class Job:
+    def __init__(self, name, fn, spec=None, next_fire_fn=None, catchup=CATCHUP_SKIP, grace=15 * 60):
+        self.name = name
+        self.fn = fn
+        self.spec = spec                   # CronSpec：持久化的定时任务
+        self.next_fire_fn = next_fire_fn   # 动态任务：返回下次触发时间戳或 None，不持久化
+        self.catchup = catchup
+        self.grace = grace
+        self.last_fire = None
+        self.last_run = None               # 实际开始执行的时间
+        self.next_fire = None
+        self.last_status = None
+
+    @property
+    def persistent(self):
+        return self.spec is not None
+
+    def compute_next(self, now):
+        if not self.persistent:
+            return self.next_fire_fn(now)
+        last = self.last_fire if self.last_fire is not None else now - self.grace
+        nxt = self.spec.next_after(last)
+        if nxt > now or self.catchup == CATCHUP_ALL:
+            return nxt
+        latest = self.spec.latest_at_or_before(now, last)
+        if latest is not None and (self.catchup == CATCHUP_LATEST or now - latest <= self.grace):
+            return latest
+        return self.spec.next_after(now)
+
+
+class Scheduler:
+    def __init__(self, db, tz, log=None):
+        self.db = db
+        self.tz = tz
+        self.log = log or (lambda msg: None)
+        self.jobs = {}   # 多进程时租约线程会增删任务，遍历一律先拷贝成 list
+        self._wake = threading.Event()
+        self._stopped = False
+
+    # --- 注册 ---
+    def add_cron(self, name, expr, fn, catchup=CATCHUP_SKIP, grace=15 * 60):
+        job = Job(name, fn, spec=CronSpec(expr, self.tz), catchup=catchup, grace=grace)
+        row = self.db.query_one("SELECT last_fire, last_status FROM job_runs WHERE name = ?", (name,))
+        if row is None:
+            self.db.execute("INSERT OR IGNORE INTO job_runs (name, last_fire, last_status, updated_at) VALUES (?, NULL, NULL, ?)", (name, time.time()))
+        else:
+            job.last_fire, job.last_status = row
+        return self._register(job)
+
+    def add_dynamic(self, name, next_fire_fn, fn):
+        return self._register(Job(name, fn, next_fire_fn=next_fire_fn))
+
+    def add_interval(self, name, seconds, fn):
+        """注册后立即执行一次，之后每隔 seconds 秒执行（以上次开始时间计）。"""
+        job = Job(name, fn)
+        job.next_fire_fn = lambda now: (job.last_run or 0) + seconds
+        return self._register(job)
+
+    def remove(self, name):
+        if self.jobs.pop(name, None) is not None: self.wake()
+
+    def _register(self, job):
+        job.next_fire = job.compute_next(time.time())
+        self.jobs[job.name] = job
+        self.wake()
+        return job
+
+    def wake(self):
+        """有新任务或外部状态变化（如复盘队列变更）时叫醒调度线程重新计算。"""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self.wake()
+
+    # --- 执行 ---
+    def _claim(self, job, fire):
+        # 条件更新：只有库里的 last_fire 还早于本次触发时刻才算认领成功
+        def _do(conn):
+            cur = conn.execute(
+                "UPDATE job_runs SET last_fire = ?, last_status = 'running', updated_at = ? WHERE name = ? AND (last_fire IS NULL OR last_fire < ?)",
+                (fire, time.time(), job.name, fire))
+            return cur.rowcount == 1
+        return self.db.transaction(_do)
+
+    def _finish(self, job, status):
+        job.last_status = status
+        self.db.execute("UPDATE job_runs SET last_status = ?, updated_at = ? WHERE name = ?", (status, time.time(), job.name))
+
+    def _run(self, job, fire):
+        if job.persistent:
+            if not self._claim(job, fire):
+                # 其他进程/上一次运行已经处理过这个时刻
+                row = self.db.query_one("SELECT last_fire FROM job_runs WHERE name = ?", (job.name,))
+                job.last_fire = row[0] if row else fire
+                return
+            job.last_fire = fire
+        job.last_run = time.time()
+        try:
+            job.fn()
+            status = "ok"
+        except Exception as e:
+            status = f"error: {e}"
+            self.log(f"Error[{job.name}]: {e}")
+        if job.persistent: self._finish(job, status)
+        else: job.last_status = status
+
+    def run_due(self, now=None):
+        now = time.time() if now is None else now
+        due = sorted((j for j in list(self.jobs.values()) if j.next_fire is not None and j.next_fire <= now), key=lambda j: j.next_fire)
+        for job in due:
+            if self.jobs.get(job.name) is not job: continue  # 前一个任务执行时被移除了
+            self._run(job, job.next_fire)
+            job.next_fire = job.compute_next(time.time())
+        return len(due)
+
+    def seconds_until_next(self, now=None):
+        now = time.time() if now is None else now
+        fires = [j.next_fire for j in list(self.jobs.values()) if j.next_fire is not None]
+        if not fires: return MAX_SLEEP
+        return max(0.0, min(min(fires) - now, MAX_SLEEP))
+
+    def run_forever(self):
+        while not self._stopped:
+            self.run_due()
+            self._wake.wait(self.seconds_until_next())
+            self._wake.clear()
+            # 动态任务依赖外部状态（复盘队列、其他任务的下次触发），每次醒来都重新计算
+            now = time.time()
+            for job in list(self.jobs.values()):
+                if not job.persistent: job.next_fire = job.compute_next(now)
+
+    def upcoming(self):
+        """[(name, next_fire_datetime)]，按时间排序，供 UI 展示。"""
+        items = [(j.name, datetime.fromtimestamp(j.next_fire, self.tz)) for j in list(self.jobs.values()) if j.next_fire is not None]
+        return sorted(items, key=lambda x: x[1])
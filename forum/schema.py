@@ -0,0 +1,228 @@
+import json
+import re
+import sqlite3
+import time
+import zlib
+
+# ==========================================
+# 版本化 schema 迁移（PRAGMA user_version）
+# ==========================================
+# 每个迁移只执行一次，按版本号顺序在写线程的同一个事务里完成。
+# 新增表结构/索引时，在 MIGRATIONS 末尾追加函数即可，不要修改已发布的迁移。
+
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _v1_base_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS citizens (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, job TEXT, avatar TEXT, prompt TEXT, is_custom BOOLEAN DEFAULT 0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS threads (id TEXT PRIMARY KEY, title TEXT, content TEXT, image_url TEXT, author_name TEXT, author_avatar TEXT, author_job TEXT, created_at TEXT, timestamp REAL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS comments (id INTEGER PRIMARY KEY AUTOINCREMENT, thread_id TEXT, author_name TEXT, author_avatar TEXT, author_job TEXT, content TEXT, created_at TEXT, FOREIGN KEY(thread_id) REFERENCES threads(id))''')
+    # 兼容 V16 之前没有 timestamp 列的老库
+    if "timestamp" not in _columns(conn, "threads"):
+        conn.execute("ALTER TABLE threads ADD COLUMN timestamp REAL")
+        conn.execute("UPDATE threads SET timestamp = ?", (time.time(),))
+
+
+def _v2_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_thread ON comments(thread_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_author ON comments(author_name, thread_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_threads_timestamp ON threads(timestamp)")
+
+
+def _v3_review_ledger(conn):
+    # T+5 复盘台账：reviewed_at 非空即已复盘，老数据按是否有回测机器的评论回填
+    if "reviewed_at" not in _columns(conn, "threads"):
+        conn.execute("ALTER TABLE threads ADD COLUMN reviewed_at REAL")
+    conn.execute("""UPDATE threads SET reviewed_at = timestamp
+                    WHERE reviewed_at IS NULL AND id IN (SELECT thread_id FROM comments WHERE author_name = '回测机器')""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_threads_unreviewed ON threads(timestamp) WHERE reviewed_at IS NULL")
+
+
+def _v4_job_runs(conn):
+    # 定时任务台账：last_fire 是已认领的最近一次计划触发时刻
+    conn.execute("CREATE TABLE IF NOT EXISTS job_runs (name TEXT PRIMARY KEY, last_fire REAL, last_status TEXT, updated_at REAL)")
+
+
+def _v5_leases(conn):
+    # 多进程部署的选主租约
+    conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT, expires_at REAL)")
+
+
+def _v6_drafts(conn):
+    # 流式生成中的评论草稿，每帖最多一条；完成后转正为 comments 并删除
+    conn.execute("CREATE TABLE IF NOT EXISTS drafts (thread_id TEXT PRIMARY KEY, author_name TEXT, author_avatar TEXT, author_job TEXT, content TEXT, created_at TEXT, updated_at REAL)")
+
+
+def _v7_usage_ledger(conn):
+    # LLM 计量台账：每次调用一行
+    conn.execute('''CREATE TABLE IF NOT EXISTS usage_ledger (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, day TEXT, task TEXT, agent TEXT, thread_id TEXT,
+                    prompt_tokens INTEGER, completion_tokens INTEGER, cost REAL, status TEXT)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_day ON usage_ledger(day, task)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_thread ON usage_ledger(thread_id)")
+
+
+def _fts_tokenizer(conn):
+    # trigram（SQLite >= 3.34）能做中文子串匹配；老版本退回 unicode61，只能按整词命中
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._fts_probe")
+        return "trigram"
+    except sqlite3.OperationalError:
+        return "unicode61"
+
+
+# 把 rowid 大于水位的行补进全文索引：迁移回填与批量导入（先停触发器、插完一次性补）共用
+FTS_BACKFILL = {
+    "threads": "INSERT INTO threads_fts (rowid, thread_id, title, content) SELECT rowid, id, title, content FROM threads WHERE rowid > ?",
+    "comments": "INSERT INTO comments_fts (rowid, content) SELECT id, content FROM comments WHERE id > ?",
+}
+
+
+# 两个字的中文词（芯片、光伏、茅台）trigram 索引不了，另建一张按汉字二元组分词的无内容 FTS。
+# cjk_bigrams() 在 storage.connect 里注册为 SQL 函数，触发器和回填都靠它切词；
+# 用不带这个函数的 sqlite3 命令行直接增删帖子/评论会报 no such function。
+_CJK_RUN = re.compile(r"[\u4e00-\u9fff]{2,}")
+
+
+def cjk_bigrams(text):
+    return " ".join(run[i:i + 2] for run in _CJK_RUN.findall(text or "") for i in range(len(run) - 1))
+
+
+BIGRAM_BACKFILL = {
+    "threads": "INSERT INTO threads_bigrams (rowid, title, content) SELECT rowid, cjk_bigrams(title), cjk_bigrams(content) FROM threads WHERE rowid > ?",
+    "comments": "INSERT INTO comments_bigrams (rowid, content) SELECT id, cjk_bigrams(content) FROM comments WHERE id > ?",
+}
+
+
+def _v8_search_index(conn):
+    # 全文检索：帖子表小，FTS 自带一份 (thread_id, title, content)；评论量大，用外部内容表只存索引。
+    # 由触发器保持同步，UPDATE reviewed_at 之类不涉及文本的列不会触发重建。
+    # threads_fts 按 threads.rowid 对齐（load_changes 也依赖它），整库 VACUUM 会重排 rowid，不要做
+    tokenize = _fts_tokenizer(conn)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS threads_fts USING fts5(thread_id UNINDEXED, title, content, tokenize='{tokenize}')")
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(content, content='comments', content_rowid='id', tokenize='{tokenize}')")
+    triggers = [
+        """CREATE TRIGGER IF NOT EXISTS threads_fts_ai AFTER INSERT ON threads BEGIN
+               INSERT INTO threads_fts (rowid, thread_id, title, content) VALUES (new.rowid, new.id, new.title, new.content);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS threads_fts_ad AFTER DELETE ON threads BEGIN
+               DELETE FROM threads_fts WHERE rowid = old.rowid;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS threads_fts_au AFTER UPDATE OF id, title, content ON threads BEGIN
+               DELETE FROM threads_fts WHERE rowid = old.rowid;
+               INSERT INTO threads_fts (rowid, thread_id, title, content) VALUES (new.rowid, new.id, new.title, new.content);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS comments_fts_ai AFTER INSERT ON comments BEGIN
+               INSERT INTO comments_fts (rowid, content) VALUES (new.id, new.content);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS comments_fts_ad AFTER DELETE ON comments BEGIN
+               INSERT INTO comments_fts (comments_fts, rowid, content) VALUES ('delete', old.id, old.content);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS comments_fts_au AFTER UPDATE OF content ON comments BEGIN
+               INSERT INTO comments_fts (comments_fts, rowid, content) VALUES ('delete', old.id, old.content);
+               INSERT INTO comments_fts (rowid, content) VALUES (new.id, new.content);
+           END""",
+    ]
+    # 不用 executescript：它会先提交写线程当前的事务
+    for sql in triggers: conn.execute(sql)
+    for sql in FTS_BACKFILL.values(): conn.execute(sql, (0,))
+
+
+def _v9_archive(conn):
+    # 冷存储：很老的帖子连同评论压成一个 zlib(JSON) 包，从 threads/comments 与全文索引里移走。
+    # 帖子头单独成列，按 id 回取、按时间列举都不用解包；payload 里是 THREAD_COLUMNS / COMMENT_COLUMNS 顺序的原始行
+    conn.execute('''CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY, title TEXT, author_name TEXT, author_avatar TEXT, author_job TEXT,
+                    created_at TEXT, timestamp REAL, comment_count INTEGER, archived_at REAL, payload BLOB)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_timestamp ON archive(timestamp)")
+
+
+def _v10_review_claims(conn):
+    # 复盘认领标记：调 LLM 前写入，过期作废；reviewed_at 只在复盘真正发出后才写，进程中途退出不会留下“已复盘但没有报告”的帖子
+    if "review_claimed_at" not in _columns(conn, "threads"):
+        conn.execute("ALTER TABLE threads ADD COLUMN review_claimed_at REAL")
+
+
+def _v11_bigram_index(conn):
+    # content='' 只存倒排索引，rowid 与 threads.rowid / comments.id 对齐；删除时要按原文重新切词交给 'delete' 命令
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS threads_bigrams USING fts5(title, content, content='', tokenize='unicode61')")
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS comments_bigrams USING fts5(content, content='', tokenize='unicode61')")
+    thread_delete = "INSERT INTO threads_bigrams (threads_bigrams, rowid, title, content) VALUES ('delete', old.rowid, cjk_bigrams(old.title), cjk_bigrams(old.content));"
+    thread_insert = "INSERT INTO threads_bigrams (rowid, title, content) VALUES (new.rowid, cjk_bigrams(new.title), cjk_bigrams(new.content));"
+    comment_delete = "INSERT INTO comments_bigrams (comments_bigrams, rowid, content) VALUES ('delete', old.id, cjk_bigrams(old.content));"
+    comment_insert = "INSERT INTO comments_bigrams (rowid, content) VALUES (new.id, cjk_bigrams(new.content));"
+    triggers = [
+        f"CREATE TRIGGER IF NOT EXISTS threads_bigrams_ai AFTER INSERT ON threads BEGIN {thread_insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS threads_bigrams_ad AFTER DELETE ON threads BEGIN {thread_delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS threads_bigrams_au AFTER UPDATE OF title, content ON threads BEGIN {thread_delete} {thread_insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS comments_bigrams_ai AFTER INSERT ON comments BEGIN {comment_insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS comments_bigrams_ad AFTER DELETE ON comments BEGIN {comment_delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS comments_bigrams_au AFTER UPDATE OF content ON comments BEGIN {comment_delete} {comment_insert} END",
+    ]
+    for sql in triggers: conn.execute(sql)
+    for sql in BIGRAM_BACKFILL.values(): conn.execute(sql, (0,))
+
+
+# 归档帖子的全文索引：archive 里只有压缩包，正文和评论在 archive_fts 另存一份（自带内容，snippet 可用），
+# archive_bigrams 是它的两字词索引。rowid = archive.rowid << ARCHIVE_FTS_SHIFT | 序号，序号 0 是帖子本身、1.. 是评论，
+# 按 rowid 区间就能整帖删掉，也能反查 archive 行
+ARCHIVE_FTS_SHIFT = 20
+
+
+def index_archived(conn, archive_rowid, thread_row, comment_rows):
+    """把一个归档包（THREAD_COLUMNS / COMMENT_COLUMNS 顺序的原始行）写进归档索引。"""
+    base = archive_rowid << ARCHIVE_FTS_SHIFT
+    rows = [(base, thread_row[4], thread_row[7], thread_row[1], thread_row[2])]
+    rows += [(base + i, c[1], c[5], None, c[4]) for i, c in enumerate(comment_rows, start=1)]
+    conn.executemany("INSERT INTO archive_fts (rowid, author, created_at, title, content) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO archive_bigrams (rowid, title, content) VALUES (?, ?, ?)", [(r[0], cjk_bigrams(r[3]), cjk_bigrams(r[4])) for r in rows])
+
+
+def unindex_archived(conn, archive_rowid):
+    lo = archive_rowid << ARCHIVE_FTS_SHIFT
+    hi = lo + (1 << ARCHIVE_FTS_SHIFT) - 1
+    rows = conn.execute("SELECT rowid, title, content FROM archive_fts WHERE rowid BETWEEN ? AND ?", (lo, hi)).fetchall()
+    conn.executemany("INSERT INTO archive_bigrams (archive_bigrams, rowid, title, content) VALUES ('delete', ?, ?, ?)", [(r[0], cjk_bigrams(r[1]), cjk_bigrams(r[2])) for r in rows])
+    conn.execute("DELETE FROM archive_fts WHERE rowid BETWEEN ? AND ?", (lo, hi))
+
+
+def _v12_archive_search(conn):
+    # 归档时触发器会把帖子/评论从 *_fts、*_bigrams 里删掉，这里给已归档的内容补一份索引，老帖照样搜得到
+    tokenize = _fts_tokenizer(conn)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5(author UNINDEXED, created_at UNINDEXED, title, content, tokenize='{tokenize}')")
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS archive_bigrams USING fts5(title, content, content='', tokenize='unicode61')")
+    for archive_rowid, payload in conn.execute("SELECT rowid, payload FROM archive"):
+        data = json.loads(zlib.decompress(payload))
+        index_archived(conn, archive_rowid, data["thread"], data["comments"])
+
+
+MIGRATIONS = [
+    _v1_base_tables,
+    _v2_indexes,
+    _v3_review_ledger,
+    _v4_job_runs,
+    _v5_leases,
+    _v6_drafts,
+    _v7_usage_ledger,
+    _v8_search_index,
+    _v9_archive,
+    _v10_review_claims,
+    _v11_bigram_index,
+    _v12_archive_search,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db):
+    """把数据库升级到 SCHEMA_VERSION，返回升级前的版本号。"""
+    def _run(conn):
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, step in enumerate(MIGRATIONS, start=1):
+            if version <= current: continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        if current < SCHEMA_VERSION: conn.execute("ANALYZE")
+        return current
+    return db.transaction(_run)
@@ -0,0 +1,230 @@
+import sqlite3
+import threading
+import queue
+import atexit
+import os
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from forum.metrics import REGISTRY
+from forum.schema import cjk_bigrams
+
+# ==========================================
+# SQLite 持久层：读连接池 + 单写线程批量提交
+# ==========================================
+# - 所有连接统一开启 WAL，读写互不阻塞
+# - 写操作全部排队交给唯一的写线程，一批操作只 commit 一次（group commit）
+# - 调用方默认等待本批提交完成再返回，语义与原来的 connect/commit/close 一致
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),      # WAL 下 NORMAL 已保证崩溃一致性，省掉每次提交的 fsync
+    ("busy_timeout", 5000),
+    ("temp_store", "MEMORY"),
+    ("cache_size", -16000),         # 约 16MB 页缓存
+    ("mmap_size", 64 * 1024 * 1024),
+)
+
+POOL_SIZE = 4
+WRITE_BATCH_MAX = 256
+
+_READ_SECONDS = REGISTRY.histogram("db_read_seconds", "单条读查询耗时")
+_WRITE_WAIT_SECONDS = REGISTRY.histogram("db_write_wait_seconds", "同步写从排队到提交完成的耗时")
+_COMMIT_SECONDS = REGISTRY.histogram("db_commit_seconds", "写线程处理一批（含 COMMIT）的耗时")
+_BATCH_SIZE = REGISTRY.histogram("db_write_batch_size", "每次 group commit 的操作数", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+    for key, value in PRAGMAS:
+        conn.execute(f"PRAGMA {key}={value}")
+    # 二元组索引的触发器要用到（见 schema._v11_bigram_index），写连接和读连接一样注册
+    conn.create_function("cjk_bigrams", 1, cjk_bigrams, deterministic=True)
+    return conn
+
+
+class ConnectionPool:
+    """线程安全的只读连接池，连接按需创建，最多 size 个。"""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create: self._created += 1
+        if not can_create:
+            return self._idle.get()
+        try:
+            return connect(self.path)
+        except Exception:
+            with self._lock: self._created -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction: conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class WriteQueue:
+    """唯一写线程。每个操作在自己的 SAVEPOINT 中执行，失败只回滚该操作，整批共用一次 COMMIT。"""
+
+    _STOP = object()
+
+    def __init__(self, path, max_batch=WRITE_BATCH_MAX):
+        self.path = path
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="SQLite_Writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op):
+        fut = Future()
+        self._queue.put((op, fut))
+        return fut
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(item is self._STOP for item in batch)
+            batch = [item for item in batch if item is not self._STOP]
+            if batch: self._apply(conn, batch)
+            if stop:
+                conn.close()
+                return
+
+    def _apply(self, conn, batch):
+        _BATCH_SIZE.observe(len(batch))
+        with _COMMIT_SECONDS.time():
+            self._apply_batch(conn, batch)
+
+    def _apply_batch(self, conn, batch):
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            for _, fut in batch: fut.set_exception(e)
+            return
+
+        for op, fut in batch:
+            try:
+                conn.execute("SAVEPOINT op")
+                result = op(conn)
+                conn.execute("RELEASE op")
+                done.append((fut, result))
+            except Exception as e:
+                conn.execute("ROLLBACK TO op")
+                conn.execute("RELEASE op")
+                fut.set_exception(e)
+
+        try:
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            for fut, _ in done: fut.set_exception(e)
+            return
+        for fut, result in done: fut.set_result(result)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout=10)
+
+
+class Storage:
+    def __init__(self, path, pool_size=POOL_SIZE):
+        self.path = path
+        self.writer = WriteQueue(path)
+        # 先让写连接把库切到 WAL，再开读连接
+        self.transaction(lambda conn: None)
+        self.pool = ConnectionPool(path, pool_size)
+        REGISTRY.gauge("db_write_queue_depth", self.writer.depth, "写线程排队中的操作数")
+
+    # --- 读 ---
+    def read(self):
+        return self.pool.connection()
+
+    def query(self, sql, params=()):
+        with _READ_SECONDS.time(), self.read() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with _READ_SECONDS.time(), self.read() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    # --- 写 ---
+    def transaction(self, fn, wait=True):
+        """fn(conn) 在写线程中原子执行；wait=True 时阻塞到提交完成并返回 fn 的结果。"""
+        if not wait: return self.writer.submit(fn)
+        t0 = time.perf_counter()
+        try:
+            return self.writer.submit(fn).result()
+        finally:
+            _WRITE_WAIT_SECONDS.observe(time.perf_counter() - t0)
+
+    def execute(self, sql, params=(), wait=True):
+        return self.transaction(lambda conn: conn.execute(sql, params).lastrowid, wait=wait)
+
+    def executemany(self, sql, seq, wait=True):
+        return self.transaction(lambda conn: conn.executemany(sql, seq).rowcount, wait=wait)
+
+    def close(self):
+        self.writer.close()
+        self.pool.close()
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_storage(path):
+    """按文件路径返回进程内唯一的 Storage（Streamlit 每次 rerun 都会拿到同一个实例）。"""
+    key = os.path.abspath(path)
+    with _instances_lock:
+        db = _instances.get(key)
+        if db is None:
+            db = _instances[key] = Storage(path)
+        return db
+
+
+@atexit.register
+def _close_all():
+    with _instances_lock:
+        for db in _instances.values(): db.close()
+        _instances.clear()
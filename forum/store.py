@@ -0,0 +1,185 @@
+import sys
+import threading
+import time
+from collections import deque
+
+# ==========================================
+# 内存帖子存储：id 索引 + 按新旧排序的 deque
+# ==========================================
+# 帖子与评论用 __slots__ 记录代替 dict，省内存也省属性查找。
+# ThreadStore 本身不加锁，由 GlobalStore.lock（TimedLock）统一保护。
+# 分两层：最新的 hot 个帖子带完整评论；更早的只留帖子头和评论条数（冷帖），评论正文按需回库读取。
+
+
+class Comment:
+    __slots__ = ("name", "avatar", "job", "content", "time")
+
+    def __init__(self, name, avatar, job, content, time):
+        self.name = name
+        self.avatar = avatar
+        self.job = job
+        self.content = content
+        self.time = time
+
+    def to_dict(self):
+        return {"name": self.name, "avatar": self.avatar, "job": self.job, "content": self.content, "time": self.time}
+
+
+class Thread:
+    __slots__ = ("id", "title", "content", "image_url", "author", "avatar", "job", "time", "timestamp", "comments", "_comment_count")
+
+    def __init__(self, id, title, content, image_url, author, avatar, job, time, timestamp, comments=None, comment_count=None):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.image_url = image_url
+        self.author = author
+        self.avatar = avatar
+        self.job = job
+        self.time = time
+        self.timestamp = timestamp
+        # comment_count 不为 None 表示冷帖：comments 为 None，只记条数
+        self.comments = None if comment_count is not None else (comments if comments is not None else [])
+        self._comment_count = comment_count or 0
+
+    @property
+    def is_cold(self):
+        return self.comments is None
+
+    @property
+    def comment_count(self):
+        return len(self.comments) if self.comments is not None else self._comment_count
+
+    def add_comment(self, comment):
+        if self.comments is not None: self.comments.append(comment)
+        else: self._comment_count += 1
+
+    def demote(self):
+        """丢掉评论正文，只留条数。"""
+        if self.comments is None: return
+        self._comment_count = len(self.comments)
+        self.comments = None
+
+    def to_dict(self, with_comments=True):
+        d = {"id": self.id, "title": self.title, "content": self.content, "image_url": self.image_url,
+             "author": self.author, "avatar": self.avatar, "job": self.job, "time": self.time, "timestamp": self.timestamp,
+             "comment_count": self.comment_count}
+        if with_comments and self.comments is not None: d["comments"] = [c.to_dict() for c in self.comments]
+        return d
+
+
+def comments_nbytes(comments):
+    """评论列表大致占用的内存，给 LRU 的内存上限记账。"""
+    return sys.getsizeof(comments) + sum(Comment.__basicsize__ + sys.getsizeof(c.content) for c in comments)
+
+
+class LiveComment:
+    """流式生成中的评论：LLM 回调不断 append，UI 读 text 渲染。每条只有一个写入者，不加锁。"""
+    __slots__ = ("name", "avatar", "job", "time", "flushed_at", "_parts")
+
+    def __init__(self, name, avatar, job, time):
+        self.name = name
+        self.avatar = avatar
+        self.job = job
+        self.time = time
+        self.flushed_at = 0.0   # 上次写入 drafts 表的时间
+        self._parts = []
+
+    def append(self, delta):
+        self._parts.append(delta)
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+
+class ThreadStore:
+    """最近 capacity 个帖子，其中最新的 hot 个带评论正文。get/add/淘汰均为 O(1)，迭代顺序为新 → 旧。"""
+
+    def __init__(self, capacity=100, threads=(), hot=None):
+        self.capacity = capacity
+        self.hot = capacity if hot is None else min(hot, capacity)
+        self._by_id = {}
+        self._order = deque()
+        for t in threads: self._append_oldest(t)
+
+    def _append_oldest(self, thread):
+        if thread.id in self._by_id or len(self._order) >= self.capacity: return
+        if len(self._order) >= self.hot: thread.demote()
+        self._by_id[thread.id] = thread
+        self._order.append(thread)
+
+    def add(self, thread):
+        """插到最前面，第 hot+1 个帖子降为冷帖；超出容量时返回被淘汰的最旧帖子。"""
+        self._by_id[thread.id] = thread
+        self._order.appendleft(thread)
+        if len(self._order) > self.hot: self._order[self.hot].demote()
+        if len(self._order) > self.capacity:
+            evicted = self._order.pop()
+            del self._by_id[evicted.id]
+            return evicted
+        return None
+
+    def get(self, thread_id):
+        return self._by_id.get(thread_id)
+
+    def __contains__(self, thread_id):
+        return thread_id in self._by_id
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __bool__(self):
+        return bool(self._order)
+
+
+class TimedLock:
+    """threading.Lock 的包装，统计等待时间与持有时间，用于观察 STORE.lock 的争用。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+        self.acquisitions = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        t0 = time.perf_counter()
+        ok = self._lock.acquire(blocking, timeout)
+        if ok:
+            now = time.perf_counter()
+            waited = now - t0
+            self._acquired_at = now
+            self.acquisitions += 1
+            self.wait_total += waited
+            if waited > self.wait_max: self.wait_max = waited
+        return ok
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self.hold_total += held
+        if held > self.hold_max: self.hold_max = held
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        n = self.acquisitions or 1
+        return {
+            "acquisitions": self.acquisitions,
+            "wait_ms_avg": self.wait_total / n * 1000, "wait_ms_max": self.wait_max * 1000,
+            "hold_ms_avg": self.hold_total / n * 1000, "hold_ms_max": self.hold_max * 1000,
+        }
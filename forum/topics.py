@@ -0,0 +1,123 @@
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from forum.cache import TTLCache
+
+# ==========================================
+# 话题提供者：后台预取新闻标题 + TTL/LRU 缓存
+# ==========================================
+# 发帖时刻直接从缓存里取一个没用过的标题，不再临时去搜索。
+# 搜索后端可插拔：线上用 DuckDuckGo，测试/压测用本地 fixture 文件。
+
+BASE_QUERIES = ["A股 资金流向", "行业 研报", "上市公司 公告", "涨停板 复盘"]
+
+
+class DDGSBackend:
+    def __init__(self, region="cn-zh", timelimit="d"):
+        self.region = region
+        self.timelimit = timelimit
+
+    def search(self, query, max_results):
+        from duckduckgo_search import DDGS
+        with DDGS() as ddgs:
+            return [r['title'] for r in ddgs.news(query, region=self.region, timelimit=self.timelimit, max_results=max_results) if r.get('title')]
+
+
+class FixtureBackend:
+    """从本地文件读标题：JSON 数组或 JSONL，每条 {"query": "...", "title": "..."}（query 可省略，表示匹配任意查询）。"""
+
+    def __init__(self, path, latency=0.0):
+        self.path = path
+        self.latency = latency
+        with open(path, encoding="utf-8") as f:
+            text = f.read().strip()
+        if text.startswith("["):
+            self.items = json.loads(text)
+        else:
+            self.items = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def search(self, query, max_results):
+        if self.latency: time.sleep(self.latency)
+        hits = [it['title'] for it in self.items if not it.get('query') or it['query'] in query]
+        return hits[:max_results]
+
+
+class TopicProvider:
+    def __init__(self, backend, tz, queries=BASE_QUERIES, max_results=5, cache=None, used_titles=None, log=None, served_limit=512):
+        self.backend = backend
+        self.tz = tz
+        self.queries = list(queries)
+        self.max_results = max_results
+        self.cache = cache or TTLCache()
+        self.used_titles = used_titles or (lambda: [])   # 返回最近帖子标题，用于去重
+        self.log = log or (lambda msg: None)
+        self.prefetched_for = None
+        self.served_limit = served_limit
+        self._served = OrderedDict()   # 发出去过的标题，只记最近 served_limit 个，旧的早已过期
+        self._prefetching = False
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0, "errors": 0}
+
+    def _today(self):
+        return datetime.now(self.tz).strftime("%Y-%m-%d")
+
+    def prefetch(self, for_fire=None):
+        """为今天的每个种子查询拉一批候选标题，已缓存且未过期的跳过。"""
+        if for_fire is not None: self.prefetched_for = for_fire
+        if self.backend is None: return 0
+        today = self._today()
+        fetched = 0
+        for seed in self.queries:
+            key = (today, seed)
+            if self.cache.get(key) is not None: continue
+            # 【V20.6】 将日期硬编码进搜索词，搜出来的大概率是当天新闻
+            try:
+                titles = self.backend.search(f"{today} {seed}", self.max_results)
+                self.stats["fetches"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.log(f"⚠️ 话题预取失败[{seed}]：{e}")
+                continue
+            # 空结果不缓存：一次搜索抽风不该让当天的话题断档到 TTL 过期
+            if not titles: continue
+            self.cache.put(key, titles)
+            fetched += len(titles)
+        return fetched
+
+    def prefetch_async(self, for_fire=None):
+        with self._lock:
+            if self._prefetching: return
+            self._prefetching = True
+
+        def _run():
+            try:
+                self.prefetch(for_fire)
+            finally:
+                self._prefetching = False
+        threading.Thread(target=_run, name="TopicPrefetch", daemon=True).start()
+
+    def _is_used(self, title, recent_titles):
+        if title in self._served: return True
+        return any(title in t for t in recent_titles)
+
+    def get_topic(self):
+        """立即返回一个今天还没用过的标题；缓存为空时返回兜底话题并在后台补货。"""
+        today = self._today()
+        recent_titles = self.used_titles()
+        seeds = self.queries[:]
+        random.shuffle(seeds)
+        with self._lock:
+            for seed in seeds:
+                for title in self.cache.get((today, seed)) or ():
+                    if not self._is_used(title, recent_titles):
+                        self._served[title] = None
+                        if len(self._served) > self.served_limit: self._served.popitem(last=False)
+                        self.stats["hits"] += 1
+                        return title
+        self.stats["misses"] += 1
+        if self.backend is not None: self.prefetch_async()
+        return f"{today} 市场热点挖掘"
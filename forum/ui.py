@@ -0,0 +1,322 @@
+import html
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from forum import bootstrap, config, engine, queries
+from forum.cache import TTLCache
+from forum.images import data_uri
+from forum.metrics import REGISTRY, Profiler
+
+# --- 引入自动刷新库 ---
+try:
+    from streamlit_autorefresh import st_autorefresh
+    HAS_AUTOREFRESH = True
+except ImportError:
+    HAS_AUTOREFRESH = False
+
+# ==========================================
+# 5. UI 渲染层
+# ==========================================
+# 本模块只在进程里导入一次；Streamlit 每次 rerun 只重新执行 main()。
+
+STORE = None  # main() 里由 bootstrap.start() 赋值，fragment/dialog 直接读取
+
+
+@st.cache_resource
+def get_profiler():
+    return Profiler(config.PROFILE_FILE) if config.PROFILE_FILE else None
+
+
+def close_dialog_callback():
+    st.session_state.active_thread_id = None
+def open_dialog_callback(t_id):
+    st.session_state.active_thread_id = t_id
+def goto_page_callback(page):
+    st.session_state.home_page = page
+def reset_search_callback():
+    st.session_state.search_page = 0
+def goto_search_page_callback(page):
+    st.session_state.search_page = page
+
+# --- 按需刷新：只有论坛真的有变化才整页重跑 ---
+# 轻量的 fragment 定时只比较版本号；没有 st.fragment 的老版本退回 st_autorefresh
+HAS_FRAGMENT = hasattr(st, "fragment")
+
+if HAS_FRAGMENT:
+    @st.fragment(run_every=config.REFRESH_INTERVAL_HOME / 1000)
+    def home_change_watcher():
+        if STORE.version != st.session_state.get("seen_version"): st.rerun()
+
+    @st.fragment(run_every=config.REFRESH_INTERVAL_DIALOG / 1000)
+    def thread_change_watcher(thread_id):
+        if STORE.thread_version(thread_id) != st.session_state.get("seen_thread_version"): st.rerun()
+        # 有辩论开始了，整页重跑一次把实时楼层挂上
+        if STORE.is_streaming(thread_id) != st.session_state.get("seen_streaming"): st.rerun()
+
+def render_live_comment(thread_id):
+    live = STORE.get_live(thread_id)
+    if live is None:
+        # 辩论结束后整页重跑一次，卸掉这个 0.5 秒一跑的 fragment
+        if HAS_FRAGMENT and not STORE.is_streaming(thread_id): st.rerun()
+        return
+    name, avatar, job, t, text = live
+    with st.chat_message(name, avatar=avatar):
+        st.markdown((text or "") + " ▌")
+        st.caption(f"{t} · {job} · 正在输入...")
+
+if HAS_FRAGMENT:
+    # 只重跑这一小块，流式楼层亚秒级更新，不触发整页重跑；只在有楼层生成时挂载，空闲的对话框不轮询
+    live_comment_slot = st.fragment(run_every=config.LIVE_REFRESH_INTERVAL)(render_live_comment)
+else:
+    live_comment_slot = render_live_comment
+
+@st.dialog("📖 深度研讨会", width="large")
+def view_thread_dialog(target):
+    # 和 seen_thread_version 一样，必须在挂载 watcher 之前记下，否则整页运行时 fragment 内联执行会误判为有变化而无限重跑
+    streaming = STORE.is_streaming(target.id)
+    st.session_state.seen_streaming = streaming
+    if HAS_FRAGMENT:
+        thread_change_watcher(target.id)
+    elif HAS_AUTOREFRESH:
+        st_autorefresh(interval=config.REFRESH_INTERVAL_DIALOG, limit=None, key="dialog_counter")
+
+    st.markdown("""<style>[data-testid="stDialog"] button[aria-label="Close"] {display: none;}</style>""", unsafe_allow_html=True)
+    c1, c2 = st.columns([0.85, 0.15])
+    with c1:
+        st.markdown(f"## {target.title.replace('标题：', '').replace('标题:', '')}")
+        st.caption(f"{target.author} · {target.job} | {target.time}")
+    with c2:
+        if st.button("❌ 关闭", key="close_top", type="primary", on_click=close_dialog_callback): st.rerun()
+
+    clean_content = target.content.replace("内容：", "").replace("内容:", "")
+    st.write(clean_content) 
+    
+    if target.image_url:
+        st.image(engine.IMAGES.get(target.image_url, "full"), width="stretch")
+    
+    st.divider()
+    # 冷帖的评论正文不在内存里，打开时才从库（或归档）里读，读过的进 LRU
+    comments = STORE.thread_comments(target)
+    st.markdown(f"#### 💬 专家辩论 ({len(comments)})")
+    
+    for comment in comments:
+        with st.chat_message(comment.name, avatar=comment.avatar):
+            st.markdown(comment.content)
+            st.caption(f"{comment.time} · {comment.job}")
+    if streaming: live_comment_slot(target.id)
+    
+    st.divider()
+    if st.button("🚪 关闭并返回", key="close_bottom", type="primary", width="stretch", on_click=close_dialog_callback): st.rerun()
+
+# --- 帖子卡片：整张卡片是一段缓存好的 HTML，按 (帖子id, 评论数, 缩略图文件) 失效 ---
+@st.cache_resource
+def get_card_cache():
+    return TTLCache(maxsize=config.CARD_CACHE_SIZE, ttl=None)
+
+CARD_CSS = """<style>
+.forum-card {display: flex; gap: 0.8rem; align-items: center;}
+.forum-card-avatar {font-size: 2rem; width: 3rem; text-align: center;}
+.forum-card-body {flex: 1; min-width: 0;}
+.forum-card-meta {color: #888; font-size: 0.8rem; margin: 0.2rem 0;}
+.forum-card-preview {font-size: 0.9rem; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;}
+.forum-card-thumb {width: 160px; height: 90px; object-fit: cover; border-radius: 6px;}
+</style>"""
+
+def thumb_src(path):
+    if config.IMAGE_STATIC_PREFIX: return f"{config.IMAGE_STATIC_PREFIX}/{os.path.basename(path)}"
+    return data_uri(path)
+
+def render_card_markup(thread, comment_count):
+    # 缩略图下载好之前是占位图，文件一变卡片就重新生成
+    thumb_path = engine.IMAGES.get(thread.image_url, "thumb") if thread.image_url else None
+    key = (thread.id, comment_count, thumb_path)
+    cache = get_card_cache()
+    markup = cache.get(key)
+    if markup is None:
+        preview = thread.content.replace("内容：", "").replace("内容:", "")[:60] + "..."
+        src = thumb_src(thumb_path) if thumb_path else None
+        thumb = f'<img class="forum-card-thumb" src="{html.escape(src)}" loading="lazy">' if src else ""
+        markup = (
+            f'<div class="forum-card"><div class="forum-card-avatar">{html.escape(thread.avatar or "")}</div>'
+            f'<div class="forum-card-body"><b>{html.escape(thread.title)}</b>'
+            f'<div class="forum-card-meta">{html.escape(thread.time or "")} | {html.escape(thread.author or "")} | 💬 {comment_count}</div>'
+            f'<div class="forum-card-preview">{html.escape(preview)}</div></div>{thumb}</div>'
+        )
+        cache.put(key, markup)
+    return markup
+
+
+def render_hit_markup(hit):
+    # 先整体转义，再把 snippet 的标记换成 <mark>
+    snippet = html.escape(hit["snippet"] or "").replace(queries.MARK_OPEN, "<mark>").replace(queries.MARK_CLOSE, "</mark>")
+    kind = "📄 帖子" if hit["kind"] == "thread" else f"💬 {html.escape(hit['author'] or '')}"
+    return (f'<b>{html.escape(hit["title"] or "")}</b>'
+            f'<div class="forum-card-meta">{kind} · {html.escape(hit["time"] or "")}</div>'
+            f'<div style="font-size: 0.85rem">{snippet}</div>')
+
+
+def render_search():
+    with st.expander("🔍 检索历史研讨", expanded=bool(st.session_state.get("search_query"))):
+        query = st.text_input("关键词（空格分隔，需同时命中）", key="search_query", placeholder="例如：光刻机 国产替代", on_change=reset_search_callback)
+        if not query.strip(): return
+        page = st.session_state.search_page
+        hits, has_more = engine.search_history(query, page)
+        if queries.like_only_terms(query): st.caption(f"单字、英文缩写等短词走不了索引，只在最近 {queries.SEARCH_LIKE_WINDOW} 条帖子/评论里查找")
+        if not hits:
+            st.caption("没有找到相关内容")
+            return
+        for i, hit in enumerate(hits):
+            st.markdown(render_hit_markup(hit), unsafe_allow_html=True)
+            st.button("打开", key=f"hit_{page}_{i}", on_click=open_dialog_callback, args=(hit["thread_id"],))
+        p1, p2, p3 = st.columns([0.3, 0.4, 0.3])
+        p1.button("◀", key="search_prev", disabled=page == 0, on_click=goto_search_page_callback, args=(page - 1,))
+        p2.caption(f"第 {page + 1} 页")
+        p3.button("▶", key="search_next", disabled=not has_more, on_click=goto_search_page_callback, args=(page + 1,))
+
+
+def render_sidebar():
+    with st.sidebar:
+        st.title("🌐 AI 闭环投研")
+        st.info("🕒 发帖时刻：09:15 / 12:30 / 20:00")
+        if STORE.scheduler:
+            post_names = {name for name, _, _ in config.POST_SCHEDULE}
+            upcoming = [(name, dt) for name, dt in STORE.scheduler.upcoming() if name in post_names]
+            if upcoming: st.caption(f"⏭️ 下一次发帖：{upcoming[0][1].strftime('%m-%d %H:%M')}")
+        if config.MULTI_PROCESS:
+            st.caption("👑 本进程为后台 leader" if STORE.is_leader else f"👥 只读副本，leader：{STORE.lease.current_holder() or '选举中'}")
+        render_search()
+    
+        with st.expander("⚡ 强制发帖测试", expanded=True):
+            custom_topic = st.text_input("输入研讨主题 (留空则随机)", placeholder="例如：低空经济产业链...")
+            # 发帖会触发辩论，多进程时只允许 leader 发起
+            if st.button("🚀 立即发起", type="primary", disabled=not STORE.is_leader):
+                agent = random.choice(STORE.agents)
+
+                # 搜索 + LLM 生成放到后台线程，不阻塞本次脚本运行
+                def _manual_post(custom_topic=custom_topic, agent=agent):
+                    # 【V20.6】 手动测试时，如果用户留空，也会调用带日期的 get_fresh_topic
+                    if custom_topic:
+                        # 如果用户输入了主题，我们帮他加上日期，确保万无一失
+                        today_str = datetime.now(config.BJ_TZ).strftime("%Y-%m-%d")
+                        actual_topic = f"{today_str} {custom_topic}"
+                    else:
+                        actual_topic = engine.get_fresh_topic()
+                    STORE.log(f"⚡ 强制发起：{actual_topic}")
+                    engine.publish_post(agent, actual_topic, "特别研讨", style_key="早盘策略")
+
+                threading.Thread(target=_manual_post, daemon=True).start()
+                st.success("已发起！生成完成后会出现在列表中。")
+
+        active_debates = STORE.debates.active()
+        if active_debates:
+            st.caption("🧠 进行中的辩论")
+            for d in active_debates:
+                status = "排队中" if d.state == "queued" else f"{d.done}/{d.total}"
+                cost, tokens = STORE.meter.thread_cost(d.thread_id)
+                if tokens: status += f" · ¥{cost:.4f}"
+                st.progress(d.progress, text=f"《{d.title[:16]}》 {status}")
+                if st.button("⏹ 取消", key=f"cancel_{d.id}"): d.cancel()
+
+        usage = STORE.meter.today()
+        st.caption(f"💰 今日花费 ¥{usage['spent']:.4f} / ¥{usage['budget']:.0f} · {usage['calls']} 次调用 · "
+                   f"{usage['prompt_tokens']:,} 入 / {usage['completion_tokens']:,} 出 token")
+        if usage['by_task']:
+            with st.expander("📒 分项计量"):
+                for task, (calls, p_tok, c_tok, cost) in sorted(usage['by_task'].items(), key=lambda x: -x[1][3]):
+                    st.caption(f"{task}: {calls} 次 · {p_tok + c_tok:,} token · ¥{cost:.4f}")
+                for agent_name, calls, tokens, cost in STORE.meter.agent_costs(limit=5):
+                    st.caption(f"👤 {agent_name}: {calls} 次 · {tokens:,} token · ¥{cost:.4f}")
+
+        st.divider()
+        if os.path.exists("pay.png"):
+            st.image("pay.png", caption="投喂算力 (支持)", width="stretch")
+    
+        st.caption("🖥️ 运行日志")
+        for log in reversed(STORE.logs[-5:]): st.text(log)
+        lock_stats = STORE.lock.stats()
+        st.caption(f"🔒 STORE.lock 持有 avg {lock_stats['hold_ms_avg']:.2f}ms / max {lock_stats['hold_ms_max']:.1f}ms")
+
+
+def render_home():
+    c1, c2 = st.columns([0.8, 0.2])
+    c1.subheader("📡 投研复盘 (Live)")
+    if c2.button("🔄 刷新", width="stretch"):
+        st.session_state.active_thread_id = None
+        st.rerun()
+
+    if st.session_state.active_thread_id:
+        with STORE.lock:
+            active_thread = STORE.threads.get(st.session_state.active_thread_id)
+            st.session_state.seen_thread_version = STORE.thread_version(st.session_state.active_thread_id)
+        # 检索命中的老帖子不在内存缓存里，按需查库
+        if active_thread is None: active_thread = engine.load_thread_from_db(st.session_state.active_thread_id)
+        if active_thread: view_thread_dialog(active_thread)
+        else: st.session_state.active_thread_id = None; st.rerun()
+
+    with STORE.lock:
+        st.session_state.seen_version = STORE.version
+        threads_snapshot = list(STORE.threads)
+    # 必须在记录 seen_version 之后挂载，否则整页运行时就会误判为有变化
+    if HAS_FRAGMENT and st.session_state.active_thread_id is None: home_change_watcher()
+    if not threads_snapshot: st.info("🕸️ 正在等待开盘...")
+
+    total_pages = max(1, (len(threads_snapshot) + config.HOME_PAGE_SIZE - 1) // config.HOME_PAGE_SIZE)
+    page = min(st.session_state.home_page, total_pages - 1)
+    page_threads = threads_snapshot[page * config.HOME_PAGE_SIZE:(page + 1) * config.HOME_PAGE_SIZE]
+
+    st.markdown(CARD_CSS, unsafe_allow_html=True)
+    for thread in page_threads:
+        with st.container(border=True):
+            cols = st.columns([0.88, 0.12], vertical_alignment="center")
+            cols[0].markdown(render_card_markup(thread, thread.comment_count), unsafe_allow_html=True)
+            with cols[1]:
+                if st.button("👀", key=f"btn_{thread.id}", width="stretch", on_click=open_dialog_callback, args=(thread.id,)): pass
+
+    if total_pages > 1:
+        p1, p2, p3 = st.columns([0.2, 0.6, 0.2])
+        p1.button("◀ 上一页", disabled=page == 0, width="stretch", on_click=goto_page_callback, args=(page - 1,))
+        p2.caption(f"<div style='text-align:center'>第 {page + 1} / {total_pages} 页 · 共 {len(threads_snapshot)} 帖</div>", unsafe_allow_html=True)
+        p3.button("下一页 ▶", disabled=page >= total_pages - 1, width="stretch", on_click=goto_page_callback, args=(page + 1,))
+
+
+def main():
+    global STORE
+    st.set_page_config(page_title="AI 实时投研 V20.6", page_icon="📅", layout="wide")
+
+    st.warning("⚠️ **严正声明**：本站所有内容均为 AI 角色扮演生成的【模拟研讨】，**不具备真实投资参考价值**。请勿据此交易！")
+
+    api_key = config.API_KEY or st.secrets.get("DEEPSEEK_API_KEY", "")
+    if not api_key:
+        api_key = "sk-your-key-here" 
+
+    if not api_key or "here" in api_key:
+        st.error("🚨 请配置 API Key")
+        st.stop()
+
+    profiler = get_profiler()
+    render_t0 = time.perf_counter()
+    profiling = profiler.start() if profiler else False
+
+    STORE = bootstrap.start(api_key)
+
+    if "active_thread_id" not in st.session_state:
+        st.session_state.active_thread_id = None
+    if "home_page" not in st.session_state:
+        st.session_state.home_page = 0
+    if "search_page" not in st.session_state:
+        st.session_state.search_page = 0
+
+    if HAS_AUTOREFRESH and not HAS_FRAGMENT and st.session_state.active_thread_id is None:
+        st_autorefresh(interval=config.REFRESH_INTERVAL_HOME, limit=None, key="fizzbuzzcounter")
+
+    render_sidebar()
+    render_home()
+
+    # 被 st.rerun / st.stop 打断的运行不计入；profiler 在下次 start 时接管
+    if profiling: profiler.stop()
+    REGISTRY.histogram("page_render_seconds", "一次完整脚本运行的耗时").observe(time.perf_counter() - render_t0)